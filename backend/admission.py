@@ -0,0 +1,204 @@
+"""Admission control for write and compute routes.
+
+Each guarded route gets two limits, checked before the handler runs:
+
+* a global concurrency limit: when ``concurrency`` requests are already in
+  flight in this worker, new ones are shed at once with 503 + Retry-After
+  instead of piling up on the event loop;
+* a per-client token bucket: ``rate`` requests per second with bursts of up
+  to ``burst``; clients over their budget get 429 + Retry-After.
+
+The bucket is kept as a GCRA "theoretical arrival time", a single number per
+client that is equivalent to a token bucket. It lives in memory by default
+(per worker), or in Mongo with ``RATE_LIMIT_STORE=mongo`` so that every
+worker shares one budget per client; each check is then one atomic upsert.
+
+Limits are tuned per route with ``RATE_LIMIT_<ROUTE>_RATE``,
+``RATE_LIMIT_<ROUTE>_BURST`` and ``CONCURRENCY_LIMIT_<ROUTE>``, e.g.
+``RATE_LIMIT_SUBMIT_LEAD_RATE=0.1``. A value of 0 disables that limit.
+
+Clients are told apart by address, which takes knowing what sits in front
+of the app. ``RATE_LIMIT_TRUSTED_PROXIES`` is the number of reverse proxies
+that append to ``X-Forwarded-For``: with N, the client is the N-th address
+from the right, the one the outermost trusted proxy saw; with 0 the app is
+exposed directly and the peer address is used. Until it is set, every
+request behind an ingress would share the ingress's bucket, so the per-client
+rate limits stay off and only the concurrency limits apply.
+"""
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Mapping, Optional
+
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# route -> (rate per second per client, burst, concurrent requests per worker)
+DEFAULT_LIMITS = {
+    "submit_lead": (0.2, 10, 256),
+    "calculate_price": (5.0, 30, 512),
+    "calculate_price_batch": (0.5, 5, 32),
+    "calculate_price_sensitivity": (5.0, 30, 256),
+    "reserve_phone": (0.2, 5, 256),
+}
+
+
+class RouteLimits:
+    __slots__ = ("rate", "burst", "concurrency")
+
+    def __init__(self, rate: float, burst: int, concurrency: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.concurrency = concurrency
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"rate": self.rate, "burst": self.burst, "concurrency": self.concurrency}
+
+
+def route_limits(route: str, environ: Mapping[str, str]) -> RouteLimits:
+    rate, burst, concurrency = DEFAULT_LIMITS.get(route, (0.0, 1, 0))
+    prefix = route.upper()
+    return RouteLimits(
+        rate=float(environ.get(f"RATE_LIMIT_{prefix}_RATE", rate)),
+        burst=int(environ.get(f"RATE_LIMIT_{prefix}_BURST", burst)),
+        concurrency=int(environ.get(f"CONCURRENCY_LIMIT_{prefix}", concurrency)),
+    )
+
+
+class MemoryBucketStore:
+    """Per-worker buckets; the LRU bound keeps a flood of distinct clients from growing memory."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.arrivals = LRUCache(maxsize=maxsize)
+
+    async def acquire(self, key: str, interval: float, burst: int) -> float:
+        """0 when the request is admitted, else the seconds until it would be."""
+        now = time.monotonic()
+        arrival = max(self.arrivals.get(key, now, count=False), now) + interval
+        wait = arrival - now - burst * interval
+        if wait > 0:
+            return wait
+        self.arrivals.set(key, arrival)
+        return 0.0
+
+
+class MongoBucketStore:
+    """Buckets shared by every worker, one small document per client and route.
+
+    The filter only matches a bucket with room left, so a full bucket makes the
+    upsert collide on ``_id``; that duplicate-key error is the rejection.
+    Documents expire through a TTL index on ``expires_at``.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.errors = 0
+
+    async def acquire(self, key: str, interval: float, burst: int) -> float:
+        now = time.time()
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=burst * interval)
+        try:
+            await self.collection.find_one_and_update(
+                {"_id": key, "$or": [{"tat": {"$lte": now + (burst - 1) * interval}}, {"tat": {"$exists": False}}]},
+                [{"$set": {
+                    "tat": {"$add": [{"$max": ["$tat", now]}, interval]},
+                    "expires_at": {"$literal": expires_at},
+                }}],
+                {"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return 0.0
+        except DuplicateKeyError:
+            bucket = await self.collection.find_one({"_id": key}, {"tat": 1})
+            if bucket is None:
+                return interval
+            return max(interval, bucket["tat"] - now - (burst - 1) * interval)
+        except PyMongoError as e:
+            # Fail open: a limiter outage must not take the routes down with it.
+            self.errors += 1
+            logger.warning("Rate limit store unavailable, admitting request: %s", e)
+            return 0.0
+
+
+class AdmissionController:
+    def __init__(self, store, limits: Dict[str, RouteLimits], trusted_proxies: Optional[int] = None):
+        self.store = store
+        self.limits = limits
+        self.trusted_proxies = trusted_proxies
+        self.in_flight = {route: 0 for route in limits}
+        self.admitted = {route: 0 for route in limits}
+        self.throttled = {route: 0 for route in limits}
+        self.shed = {route: 0 for route in limits}
+
+    @property
+    def rate_limited(self) -> bool:
+        """Per-client rates need to know which address is the client's."""
+        return self.trusted_proxies is not None
+
+    def client_key(self, request: Request) -> str:
+        if self.trusted_proxies:
+            # Entries left of the outermost trusted proxy's are client-supplied.
+            hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+            if hops:
+                return hops[-min(self.trusted_proxies, len(hops))]
+        return request.client.host if request.client else "unknown"
+
+    def guard(self, route: str):
+        """FastAPI dependency enforcing ``route``'s limits around the handler."""
+        limits = self.limits[route]
+
+        async def admit(request: Request):
+            if limits.concurrency and self.in_flight[route] >= limits.concurrency:
+                self.shed[route] += 1
+                raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+            # Count the request before awaiting the bucket store, so requests
+            # waiting on it are held to the concurrency limit too.
+            self.in_flight[route] += 1
+            try:
+                if limits.rate > 0 and self.rate_limited:
+                    wait = await self.store.acquire(f"{route}:{self.client_key(request)}", 1 / limits.rate, limits.burst)
+                    if wait:
+                        self.throttled[route] += 1
+                        raise HTTPException(status_code=429, detail="Too many requests",
+                                            headers={"Retry-After": str(max(1, math.ceil(wait)))})
+                self.admitted[route] += 1
+                yield
+            finally:
+                self.in_flight[route] -= 1
+
+        return admit
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": type(self.store).__name__,
+            "store_errors": getattr(self.store, "errors", 0),
+            "trusted_proxies": self.trusted_proxies,
+            "rate_limited": self.rate_limited,
+            "routes": {
+                route: {
+                    **limits.as_dict(),
+                    "in_flight": self.in_flight[route],
+                    "admitted": self.admitted[route],
+                    "throttled": self.throttled[route],
+                    "shed": self.shed[route],
+                }
+                for route, limits in self.limits.items()
+            },
+        }
+
+
+def build_store(kind: str, db=None, maxsize: int = 100000):
+    if kind == "memory":
+        return MemoryBucketStore(maxsize)
+    if kind == "mongo":
+        if db is None:
+            raise ValueError("RATE_LIMIT_STORE=mongo needs the mongo repository backend")
+        return MongoBucketStore(db.rate_limits)
+    raise ValueError(f"Unknown rate limit store {kind!r}; expected memory or mongo")
@@ -0,0 +1,183 @@
+"""Process-local cache for the catalog collections (brands, phone_models, questions).
+
+The catalog is loaded in one go and served from memory. Freshness is checked
+against a single version document in ``catalog_meta``: every ``ttl`` seconds the
+cache reads that document (one indexed point read) and reloads only when the
+version has moved. ``max_age`` forces a full reload regardless of the version,
+as a safety net for writes that forget to bump it.
+
+Revalidation never holds readers hostage: while one request talks to Mongo
+the others keep getting the current snapshot, each Mongo round is bounded by
+``timeout``, and once ``breaker`` opens the last known good snapshot is served
+without trying Mongo at all. Only a process that has never loaded the catalog
+fails, with ``CatalogUnavailable``.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+from breaker import CircuitBreaker
+from http_cache import fingerprint
+from pricing import CompiledQuestionSet
+
+logger = logging.getLogger(__name__)
+
+CATALOG_META_ID = "catalog"
+
+
+class CatalogUnavailable(Exception):
+    """Mongo cannot be reached and there is no snapshot to fall back on."""
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog at one version. Do not mutate the documents."""
+
+    def __init__(self, brands: List[Dict[str, Any]], models: List[Dict[str, Any]],
+                 questions: List[Dict[str, Any]], version: int,
+                 pricing: Optional[CompiledQuestionSet] = None):
+        self.brands = brands
+        self.models = models
+        self.questions = questions
+        self.version = version
+        self.pricing = pricing if pricing is not None else CompiledQuestionSet(questions)
+        # Content hash, so ETags stay correct even if a write forgot to bump the version.
+        self.fingerprint = fingerprint([brands, models, questions])
+        self.loaded_at = time.monotonic()
+
+        self.models_by_id: Dict[str, Dict[str, Any]] = {m["id"]: m for m in models}
+        self.models_by_brand: Dict[str, List[Dict[str, Any]]] = {}
+        for model in models:
+            self.models_by_brand.setdefault(model["brand_id"], []).append(model)
+        self.questions_by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for question in questions:
+            self.questions_by_category.setdefault(question["category"], []).append(question)
+
+
+class CatalogCache:
+    def __init__(self, store, ttl: float = 30.0, max_age: float = 3600.0, timeout: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.store = store
+        self.ttl = ttl
+        self.max_age = max_age
+        self.timeout = timeout
+        self.breaker = breaker
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[[Optional[CatalogSnapshot], CatalogSnapshot], None]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.reloads = 0
+        self.failures = 0
+        self.stale_serves = 0
+
+    def _fresh(self, snapshot: Optional[CatalogSnapshot], now: float) -> bool:
+        return snapshot is not None and now - self._checked_at < self.ttl and now - snapshot.loaded_at < self.max_age
+
+    async def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if self._fresh(snapshot, time.monotonic()):
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        if snapshot is not None and self._lock.locked():
+            # Another request is already revalidating; don't queue behind it.
+            self.stale_serves += 1
+            return snapshot
+
+        async with self._lock:
+            # Another request may have refreshed while we were waiting for the lock.
+            snapshot = self._snapshot
+            now = time.monotonic()
+            if self._fresh(snapshot, now):
+                return snapshot
+
+            if self.breaker is not None and not self.breaker.allow():
+                return self._fallback(snapshot)
+            try:
+                version = await self._bounded(self.store.read_version(CATALOG_META_ID))
+                self.revalidations += 1
+                if snapshot is None or version != snapshot.version or now - snapshot.loaded_at >= self.max_age:
+                    snapshot = await self._bounded(self._load(version))
+            except (PyMongoError, asyncio.TimeoutError) as e:
+                self.failures += 1
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                logger.warning("Catalog revalidation failed (%r); serving the last loaded snapshot", e)
+                return self._fallback(self._snapshot, e)
+            except BaseException:
+                # Cancellation or a bug: still settle the breaker, or a half-open
+                # trial stays "in flight" and every later call short-circuits.
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                raise
+            if self.breaker is not None:
+                self.breaker.record_success()
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    async def _bounded(self, awaitable):
+        if self.timeout is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    def _fallback(self, snapshot: Optional[CatalogSnapshot], error: Optional[Exception] = None) -> CatalogSnapshot:
+        if snapshot is None:
+            raise CatalogUnavailable("Catalog has not been loaded and Mongo is unavailable") from error
+        self.stale_serves += 1
+        return snapshot
+
+    async def refresh(self, primary: bool = False) -> CatalogSnapshot:
+        """Reload unconditionally. Pass ``primary`` after this process changed the
+        catalog, so a lagging secondary cannot hand back the pre-write data."""
+        async with self._lock:
+            version = await self.store.read_version(CATALOG_META_ID, primary=primary)
+            snapshot = await self._load(version, primary)
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def add_listener(self, listener: Callable[[Optional["CatalogSnapshot"], "CatalogSnapshot"], None]):
+        """Call ``listener(previous, current)`` every time a new snapshot is loaded."""
+        self._listeners.append(listener)
+
+    async def _load(self, version: int, primary: bool = False) -> CatalogSnapshot:
+        brands, models, questions = await self.store.load(primary=primary)
+        # Only recompile the pricing engine when the question set itself changed.
+        previous = self._snapshot
+        pricing = previous.pricing if previous is not None and previous.questions == questions else None
+        snapshot = CatalogSnapshot(brands, models, questions, version, pricing)
+        self._snapshot = snapshot
+        self.reloads += 1
+        logger.info(
+            "Catalog loaded (version %s): %d brands, %d models, %d questions",
+            version, len(brands), len(models), len(questions),
+        )
+        for listener in self._listeners:
+            listener(previous, snapshot)
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "version": snapshot.version if snapshot else None,
+            "loaded": snapshot is not None,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 3) if snapshot else None,
+            "ttl": self.ttl,
+            "max_age": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "revalidations": self.revalidations,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "stale_serves": self.stale_serves,
+            "timeout": self.timeout,
+            "breaker": self.breaker.stats() if self.breaker is not None else None,
+        }
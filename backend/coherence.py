@@ -0,0 +1,208 @@
+"""Cross-worker cache coherence.
+
+Every uvicorn worker keeps its own in-memory copies of the catalog and of
+listing-derived data. ``CoherenceWatcher`` notices writes made by *any*
+process and calls the local invalidation handlers within a bounded delay:
+
+* ``change_stream`` - watch ``brands``, ``phone_models``, ``questions`` and
+  ``phones_for_sale`` with a database change stream. Needs a replica set; a
+  single-node one is enough for local testing::
+
+      mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval 'rs.initiate()'
+      MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0" COHERENCE_MODE=change_stream
+
+* ``poll`` - read the version documents in ``catalog_meta`` every
+  ``poll_interval`` seconds. Writers must call ``bump_version`` (see
+  ``MongoCatalogStore.bump_version``) after changing a watched collection.
+  Reservation holds bump their own ``listing_holds`` key, so a hold only
+  refreshes what depends on availability rather than every listing cache;
+  change streams see holds as ``phones_for_sale`` updates and never need it.
+* ``auto`` - try change streams and fall back to polling on a standalone server.
+* ``off`` - rely on the caches' own TTLs only.
+
+Events are coalesced for ``debounce`` seconds, so a bulk write triggers one
+reload rather than one per document. Handlers receive the list of change
+events, or ``None`` when the watcher only knows that something changed.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from catalog import CATALOG_META_ID
+
+logger = logging.getLogger(__name__)
+
+COHERENCE_MODES = ("auto", "change_stream", "poll", "off")
+
+LISTING_HOLDS_ID = "listing_holds"
+
+# Version key -> collections it covers. Poll-only keys cover none.
+SOURCES = {
+    CATALOG_META_ID: ("brands", "phone_models", "questions"),
+    "phones_for_sale": ("phones_for_sale",),
+    LISTING_HOLDS_ID: (),
+}
+
+# More events than this in one debounce window are reported as "everything changed".
+MAX_PENDING_EVENTS = 1000
+
+# Error code for "$changeStream stage is only supported on replica sets".
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+Handler = Callable[[Optional[List[Dict[str, Any]]]], Any]
+
+
+class CoherenceWatcher:
+    def __init__(self, db, mode: str = "auto", poll_interval: float = 2.0, debounce: float = 0.2):
+        if mode not in COHERENCE_MODES:
+            raise ValueError(f"Unknown coherence mode {mode!r}; expected one of {', '.join(COHERENCE_MODES)}")
+        self.db = db
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.active_mode: Optional[str] = None
+        self._handlers: Dict[str, List[Handler]] = {source: [] for source in SOURCES}
+        self._source_of = {collection: source for source, collections in SOURCES.items() for collection in collections}
+        self._pending: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._versions: Dict[str, int] = {}
+
+        self.events = 0
+        self.dispatches = {source: 0 for source in SOURCES}
+        self.errors = 0
+        self.last_change_at: Optional[float] = None
+
+    def on_change(self, source: str, handler: Handler):
+        if source not in SOURCES:
+            raise ValueError(f"Unknown coherence source {source!r}")
+        self._handlers[source].append(handler)
+
+    async def start(self):
+        if self.mode == "off" or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._dispatch_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._dispatch_task = None
+
+    async def _run(self):
+        try:
+            if self.mode in ("auto", "change_stream"):
+                try:
+                    await self._watch_change_stream()
+                    return
+                except OperationFailure as e:
+                    if e.code != CHANGE_STREAM_UNSUPPORTED or self.mode == "change_stream":
+                        raise
+                    logger.info("Change streams unavailable (standalone server); polling versions instead")
+            await self._poll_versions()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.active_mode = None
+            logger.exception("Coherence watcher stopped; local caches fall back to their TTLs")
+
+    async def _watch_change_stream(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self._source_of)}}}]
+        resume_token = None
+        backoff = 0.5
+        while True:
+            try:
+                async with self.db.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                    self.active_mode = "change_stream"
+                    backoff = 0.5
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        source = self._source_of.get(change["ns"]["coll"])
+                        if source is not None:
+                            self._record(source, change)
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                self._stream_failed(e)
+                resume_token = None
+            except PyMongoError as e:
+                self._stream_failed(e)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+
+    def _stream_failed(self, error: Exception):
+        # Events may have been missed while the stream was down: invalidate everything.
+        self.errors += 1
+        logger.warning("Change stream interrupted (%s); invalidating local caches", error)
+        for source, collections in SOURCES.items():
+            if collections:
+                self._record(source, None)
+
+    async def _poll_versions(self):
+        self.active_mode = "poll"
+        keys = list(SOURCES)
+        while True:
+            try:
+                docs = await self.db.catalog_meta.find({"_id": {"$in": keys}}, {"version": 1}).to_list(None)
+                versions = {doc["_id"]: doc.get("version", 0) for doc in docs}
+                for key in keys:
+                    version = versions.get(key, 0)
+                    # The first poll only records a baseline.
+                    if key in self._versions and self._versions[key] != version:
+                        self._record(key, None)
+                    self._versions[key] = version
+            except PyMongoError as e:
+                self.errors += 1
+                logger.warning("Version poll failed: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    def _record(self, source: str, event: Optional[Dict[str, Any]]):
+        self.events += 1
+        self.last_change_at = time.time()
+        if source in self._pending:
+            events = self._pending[source]
+            if events is not None and event is not None and len(events) < MAX_PENDING_EVENTS:
+                events.append(event)
+            else:
+                self._pending[source] = None
+        else:
+            self._pending[source] = [event] if event is not None else None
+        if self._dispatch_task is None or self._dispatch_task.done():
+            self._dispatch_task = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        # Events recorded while a handler is awaited find this task still
+        # running and schedule nothing, so keep going until none are left.
+        while self._pending:
+            await asyncio.sleep(self.debounce)
+            pending, self._pending = self._pending, {}
+            for source, events in pending.items():
+                self.dispatches[source] += 1
+                for handler in self._handlers[source]:
+                    try:
+                        result = handler(events)
+                        if inspect.isawaitable(result):
+                            await result
+                    except Exception:
+                        logger.exception("Coherence handler for %s failed", source)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "active_mode": self.active_mode,
+            "poll_interval": self.poll_interval,
+            "debounce": self.debounce,
+            "events": self.events,
+            "dispatches": dict(self.dispatches),
+            "errors": self.errors,
+            "last_change_at": self.last_change_at,
+        }
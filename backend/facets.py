@@ -0,0 +1,89 @@
+"""Filter-chip counts for the buy page.
+
+For the listings matching a filter, count them per brand, condition, RAM and
+storage (from ``specs``) and per price bucket. On Mongo this is one
+aggregation: a ``$match`` on the listing filter, then a ``$facet`` with one
+``$group`` per field and a ``$bucket`` over price. The in-memory backend
+counts the same groups in Python, and both go through ``shape_facets`` so
+the API sees identical output.
+
+Price buckets are ``[0, b1)``, ``[b1, b2)``, ... ``[bn, inf)`` for the
+boundaries ``b1 < ... < bn``; empty buckets are included with a zero count so
+the client can draw a stable set of chips.
+"""
+from bisect import bisect_right
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# response key -> listing field
+FACET_FIELDS = {
+    "brands": "brand",
+    "conditions": "condition",
+    "ram": "specs.RAM",
+    "storage": "specs.Storage",
+}
+
+DEFAULT_PRICE_BOUNDARIES = (10000, 20000, 30000, 40000, 50000)
+
+
+def price_boundaries(value: str) -> Tuple[int, ...]:
+    """Parse ``PRICE_FACET_BOUNDARIES`` ("10000,20000,...") into sorted, distinct bounds."""
+    boundaries = tuple(sorted({int(part) for part in value.split(",") if part.strip()}))
+    if not boundaries or boundaries[0] <= 0:
+        raise ValueError("Price facet boundaries must be one or more positive integers")
+    return boundaries
+
+
+def facet_stage(boundaries: Sequence[int]) -> Dict[str, Any]:
+    facets: Dict[str, List[Dict[str, Any]]] = {
+        name: [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+        for name, field in FACET_FIELDS.items()
+    }
+    facets["price"] = [{"$bucket": {
+        "groupBy": "$price",
+        "boundaries": [0, *boundaries],
+        # Everything from the last boundary up lands in the open-ended bucket.
+        "default": boundaries[-1],
+        "output": {"count": {"$sum": 1}},
+    }}]
+    return {"$facet": facets}
+
+
+def _field(doc: Dict[str, Any], field: str) -> Any:
+    for part in field.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def count_facets(docs: Iterable[Dict[str, Any]], boundaries: Sequence[int]) -> Dict[str, List[Dict[str, Any]]]:
+    """In-memory equivalent of ``facet_stage``, with the same output layout."""
+    lows = (0, *boundaries)
+    counters = {name: Counter() for name in (*FACET_FIELDS, "price")}
+    for doc in docs:
+        for name, field in FACET_FIELDS.items():
+            counters[name][_field(doc, field)] += 1
+        counters["price"][lows[bisect_right(boundaries, doc["price"])] if doc["price"] >= 0 else boundaries[-1]] += 1
+    return {
+        name: [{"_id": value, "count": count} for value, count in counter.items()]
+        for name, counter in counters.items()
+    }
+
+
+def shape_facets(groups: Dict[str, List[Dict[str, Any]]], boundaries: Sequence[int]) -> Dict[str, Any]:
+    facets: Dict[str, Any] = {
+        name: sorted(
+            ({"value": str(group["_id"]), "count": group["count"]} for group in groups.get(name, [])
+             if group["_id"] is not None),
+            key=lambda facet: (-facet["count"], facet["value"]),
+        )
+        for name in FACET_FIELDS
+    }
+    counts = {bucket["_id"]: bucket["count"] for bucket in groups.get("price", [])}
+    facets["price"] = [
+        {"min": low, "max": high, "count": counts.get(low, 0)}
+        for low, high in zip((0, *boundaries), (*boundaries, None))
+    ]
+    facets["total"] = sum(counts.values())
+    return facets
@@ -0,0 +1,164 @@
+"""Versioned seed data for a fresh deployment.
+
+``apply_fixtures`` runs at startup. It upserts each fixture document keyed on
+``id`` with ``$setOnInsert``, so documents that already exist are never
+touched (prices changed through the inventory import stay as they are), and a
+run that crashed halfway is completed by the next one. The applied
+``FIXTURES_VERSION`` is recorded in ``catalog_meta``; once it is current,
+startup skips seeding with a single read. Bump ``FIXTURES_VERSION`` after
+adding fixture documents so existing deployments pick them up.
+"""
+import asyncio
+
+FIXTURES_VERSION = 1
+FIXTURES_KEY = "fixtures"
+
+BRANDS = [
+    {"id": "samsung", "name": "Samsung", "logo": "/brands/samsung.png"},
+    {"id": "xiaomi", "name": "Xiaomi", "logo": "/brands/xiaomi.png"},
+    {"id": "oneplus", "name": "OnePlus", "logo": "/brands/oneplus.png"},
+    {"id": "realme", "name": "Realme", "logo": "/brands/realme.png"},
+    {"id": "vivo", "name": "Vivo", "logo": "/brands/vivo.png"},
+    {"id": "oppo", "name": "Oppo", "logo": "/brands/oppo.png"},
+]
+
+MODELS = [
+    {"id": "sam-s23", "brand_id": "samsung", "name": "Galaxy S23", "base_price": 45000, "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400"},
+    {"id": "sam-s22", "brand_id": "samsung", "name": "Galaxy S22", "base_price": 38000, "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400"},
+    {"id": "sam-a54", "brand_id": "samsung", "name": "Galaxy A54", "base_price": 28000, "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400"},
+    {"id": "xi-13pro", "brand_id": "xiaomi", "name": "13 Pro", "base_price": 42000, "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400"},
+    {"id": "xi-12", "brand_id": "xiaomi", "name": "12", "base_price": 32000, "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400"},
+    {"id": "xi-note12", "brand_id": "xiaomi", "name": "Redmi Note 12 Pro", "base_price": 22000, "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400"},
+    {"id": "op-11", "brand_id": "oneplus", "name": "11", "base_price": 48000, "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400"},
+    {"id": "op-nord3", "brand_id": "oneplus", "name": "Nord 3", "base_price": 28000, "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400"},
+    {"id": "real-11pro", "brand_id": "realme", "name": "11 Pro+", "base_price": 30000, "image": "https://images.unsplash.com/photo-1585060544812-6b45742d762f?w=400"},
+    {"id": "real-narzo", "brand_id": "realme", "name": "Narzo 60", "base_price": 18000, "image": "https://images.unsplash.com/photo-1585060544812-6b45742d762f?w=400"},
+]
+
+QUESTIONS = [
+    {"id": "q1", "text": "Does the phone turn ON?", "category": "Basic Functionality", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": False},
+    {"id": "q2", "text": "Does the phone charge properly?", "category": "Basic Functionality", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": False},
+    {"id": "q3", "text": "Is the touchscreen fully responsive?", "category": "Basic Functionality", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": False},
+    {"id": "q4", "text": "Are physical buttons working?", "category": "Basic Functionality", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
+    {"id": "q5", "text": "Is fingerprint sensor working?", "category": "Basic Functionality", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
+    {"id": "q6", "text": "Is face unlock working?", "category": "Basic Functionality", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
+    {"id": "q7", "text": "Are speakers functioning correctly?", "category": "Basic Functionality", "deduction_percentage": 4, "is_blocking": False, "yes_deducts": False},
+    {"id": "q8", "text": "Is microphone working?", "category": "Basic Functionality", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": False},
+    {"id": "q9", "text": "Is vibration motor working?", "category": "Basic Functionality", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
+    {"id": "q10", "text": "Is WiFi working?", "category": "Basic Functionality", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
+    {"id": "q11", "text": "Is Bluetooth working?", "category": "Basic Functionality", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
+    {"id": "q12", "text": "Is mobile network detected?", "category": "Basic Functionality", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": False},
+    {"id": "q13", "text": "Is GPS working?", "category": "Basic Functionality", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
+    {"id": "q14", "text": "Is the screen cracked or broken?", "category": "Display", "deduction_percentage": 20, "is_blocking": False, "yes_deducts": True},
+    {"id": "q15", "text": "Are there dead pixels or lines on screen?", "category": "Display", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": True},
+    {"id": "q16", "text": "Is there screen discoloration?", "category": "Display", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
+    {"id": "q17", "text": "Is there touch delay or ghost touch?", "category": "Display", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": True},
+    {"id": "q18", "text": "Is brightness normal?", "category": "Display", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
+    {"id": "q19", "text": "Has display been replaced before?", "category": "Display", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": True},
+    {"id": "q20", "text": "Is battery backup normal (lasts full day)?", "category": "Battery", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": False},
+    {"id": "q21", "text": "Does phone heat abnormally?", "category": "Battery", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
+    {"id": "q22", "text": "Is battery swelling?", "category": "Battery", "deduction_percentage": 25, "is_blocking": False, "yes_deducts": True},
+    {"id": "q23", "text": "Has battery been replaced before?", "category": "Battery", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": True},
+    {"id": "q24", "text": "Is fast charging working?", "category": "Battery", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
+    {"id": "q25", "text": "Is rear camera working?", "category": "Camera", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": False},
+    {"id": "q26", "text": "Is front camera working?", "category": "Camera", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": False},
+    {"id": "q27", "text": "Is there blurry or focus issue?", "category": "Camera", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
+    {"id": "q28", "text": "Is flash working?", "category": "Camera", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
+    {"id": "q29", "text": "Is camera glass cracked?", "category": "Camera", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": True},
+    {"id": "q30", "text": "Are there major dents or cracks on body?", "category": "Body", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": True},
+    {"id": "q31", "text": "Is back panel damaged?", "category": "Body", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": True},
+    {"id": "q32", "text": "Is frame bent?", "category": "Body", "deduction_percentage": 18, "is_blocking": False, "yes_deducts": True},
+    {"id": "q33", "text": "Are there water damage signs?", "category": "Water Damage", "deduction_percentage": 25, "is_blocking": False, "yes_deducts": True},
+    {"id": "q34", "text": "Is there rust or corrosion near ports?", "category": "Water Damage", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": True},
+    {"id": "q35", "text": "Has phone been exposed to water?", "category": "Water Damage", "deduction_percentage": 20, "is_blocking": False, "yes_deducts": True},
+    {"id": "q36", "text": "Are there moisture warnings?", "category": "Water Damage", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
+    {"id": "q37", "text": "Is Google account removed?", "category": "Security", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": False},
+    {"id": "q38", "text": "Is screen lock removed?", "category": "Security", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
+    {"id": "q39", "text": "Is IMEI valid?", "category": "Security", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": False},
+    {"id": "q40", "text": "Is device blacklisted?", "category": "Security", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": True},
+    {"id": "q41", "text": "Has any part been replaced?", "category": "Repair History", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": True},
+    {"id": "q42", "text": "Any third-party repairs done?", "category": "Repair History", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
+    {"id": "q43", "text": "Do you have charger?", "category": "Accessories", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
+    {"id": "q44", "text": "Do you have original box?", "category": "Accessories", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
+    {"id": "q45", "text": "Do you have purchase bill?", "category": "Accessories", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
+]
+
+PHONES_FOR_SALE = [
+    {
+        "id": "sale-1",
+        "brand": "Samsung",
+        "model": "Galaxy S22 Ultra",
+        "price": 42000,
+        "condition": "Excellent",
+        "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400",
+        "description": "Like new condition, barely used for 6 months. All original accessories included.",
+        "specs": {"RAM": "12GB", "Storage": "256GB", "Battery": "95% Health", "Warranty": "3 Months"},
+        "in_stock": True
+    },
+    {
+        "id": "sale-2",
+        "brand": "OnePlus",
+        "model": "10 Pro",
+        "price": 35000,
+        "condition": "Good",
+        "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400",
+        "description": "Well maintained, minor scratches on back. Works perfectly.",
+        "specs": {"RAM": "8GB", "Storage": "128GB", "Battery": "88% Health", "Warranty": "3 Months"},
+        "in_stock": True
+    },
+    {
+        "id": "sale-3",
+        "brand": "Xiaomi",
+        "model": "13 Pro",
+        "price": 38000,
+        "condition": "Excellent",
+        "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400",
+        "description": "Premium flagship in pristine condition. All accessories and box included.",
+        "specs": {"RAM": "12GB", "Storage": "256GB", "Battery": "92% Health", "Warranty": "6 Months"},
+        "in_stock": True
+    },
+    {
+        "id": "sale-4",
+        "brand": "Samsung",
+        "model": "Galaxy A54",
+        "price": 24000,
+        "condition": "Good",
+        "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400",
+        "description": "Mid-range champion, perfect for daily use. Camera is excellent.",
+        "specs": {"RAM": "8GB", "Storage": "128GB", "Battery": "90% Health", "Warranty": "3 Months"},
+        "in_stock": True
+    },
+    {
+        "id": "sale-5",
+        "brand": "Realme",
+        "model": "11 Pro+",
+        "price": 26000,
+        "condition": "Excellent",
+        "image": "https://images.unsplash.com/photo-1585060544812-6b45742d762f?w=400",
+        "description": "Fast charging beast with amazing display. Barely used.",
+        "specs": {"RAM": "12GB", "Storage": "256GB", "Battery": "94% Health", "Warranty": "6 Months"},
+        "in_stock": True
+    },
+    {
+        "id": "sale-6",
+        "brand": "OnePlus",
+        "model": "Nord 3",
+        "price": 24000,
+        "condition": "Good",
+        "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400",
+        "description": "Best value for money. Smooth performance and good camera.",
+        "specs": {"RAM": "8GB", "Storage": "128GB", "Battery": "87% Health", "Warranty": "3 Months"},
+        "in_stock": True
+    },
+]
+
+async def apply_fixtures(repository) -> bool:
+    """Insert whatever fixture documents are missing; False when this version was already applied."""
+    if await repository.catalog.read_version(FIXTURES_KEY) >= FIXTURES_VERSION:
+        return False
+    await asyncio.gather(
+        repository.catalog.seed(BRANDS, MODELS, QUESTIONS),
+        repository.listings.seed(PHONES_FOR_SALE),
+    )
+    await repository.catalog.set_version(FIXTURES_KEY, FIXTURES_VERSION)
+    return True
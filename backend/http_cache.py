@@ -0,0 +1,82 @@
+"""HTTP caching helpers: strong ETags, If-None-Match and per-route Cache-Control.
+
+Catalog ETags are derived from the catalog snapshot's content fingerprint
+plus the request parameters, so a conditional request is answered without
+touching Mongo or serializing anything. Cache-Control values can be tuned per
+route with ``CACHE_CONTROL_<ROUTE>`` environment variables, e.g.
+``CACHE_CONTROL_BRANDS="public, max-age=600"``.
+
+A gzipped body is a different representation from the identity one, so it
+carries its own strong ETag: the identity ETag with ``-gz`` appended.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+DEFAULT_CACHE_CONTROL = {
+    "brands": "public, max-age=300",
+    "models": "public, max-age=300",
+    "questions": "public, max-age=300",
+    "bootstrap": "public, max-age=300",
+    "phone_detail": "public, max-age=30",
+    "listing_facets": "public, max-age=15",
+}
+
+
+def cache_control(route: str) -> str:
+    return os.environ.get(f"CACHE_CONTROL_{route.upper()}", DEFAULT_CACHE_CONTROL.get(route, "no-cache"))
+
+
+def fingerprint(value: Any) -> str:
+    """Stable content hash of a JSON-compatible value."""
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.sha1(payload).hexdigest()
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def gzip_etag(etag: str) -> str:
+    return f'{etag[:-1]}-gz"'
+
+
+def matched_etag(request: Request, *etags: str) -> Optional[str]:
+    """The first of ``etags`` that If-None-Match names, by weak comparison as RFC 9110 requires."""
+    header = request.headers.get("if-none-match")
+    if not header or not etags:
+        return None
+    if header.strip() == "*":
+        return etags[0]
+    candidates = {candidate[2:] if candidate.startswith("W/") else candidate
+                  for candidate in (part.strip() for part in header.split(","))}
+    return next((etag for etag in etags if etag in candidates), None)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    return matched_etag(request, etag) is not None
+
+
+def not_modified(etag: str, route: str, vary: Optional[str] = None) -> Response:
+    headers = cache_headers(etag, route)
+    if vary is not None:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
+
+
+def cache_headers(etag: str, route: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control(route)}
+
+
+def set_cache_headers(response: Response, etag: str, route: str):
+    response.headers.update(cache_headers(etag, route))
+
+
+def request_key(request: Request) -> str:
+    """Route path plus the query parameters that shape the payload."""
+    query = sorted(request.query_params.multi_items())
+    return request.url.path + "?" + "&".join(f"{key}={value}" for key, value in query)
@@ -0,0 +1,144 @@
+"""Declarative index definitions and query-plan verification.
+
+``INDEXES`` is applied idempotently at startup: ``create_indexes`` is a no-op
+for indexes that already exist with the same keys and options, and fails
+loudly if an index with the same name was created with different options.
+
+``QUERY_SHAPES`` lists the lookups the API sends to Mongo. With
+``MONGO_VERIFY_QUERY_PLANS=1`` each shape is run through ``explain()`` after
+startup and the server refuses to start if any of them plans a COLLSCAN.
+Run ``python indexes.py`` to apply and verify against the configured database.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from reservations import available_filter
+
+logger = logging.getLogger(__name__)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "brands": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "phone_models": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("brand_id", ASCENDING), ("name", ASCENDING)], name="brand_name"),
+    ],
+    "questions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "phones_for_sale": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Listing filters: in_stock equality, optional brand equality, price range and sort. The
+        # trailing reserved_until lets the "not held" filter run on index keys, before any fetch.
+        IndexModel([("in_stock", ASCENDING), ("brand", ASCENDING), ("price", ASCENDING), ("id", ASCENDING),
+                    ("reserved_until", ASCENDING)], name="listing_brand_price_hold"),
+        IndexModel([("in_stock", ASCENDING), ("price", ASCENDING), ("id", ASCENDING), ("reserved_until", ASCENDING)],
+                   name="listing_price_hold"),
+        IndexModel([("in_stock", ASCENDING), ("brand", ASCENDING), ("_id", DESCENDING), ("reserved_until", ASCENDING)],
+                   name="listing_brand_newest_hold"),
+        IndexModel([("in_stock", ASCENDING), ("_id", DESCENDING), ("reserved_until", ASCENDING)],
+                   name="listing_newest_hold"),
+    ],
+    "reservation_slots": [
+        # Per-buyer hold slots are claimed by _id; release finds them by reservation.
+        IndexModel([("reservation_id", ASCENDING)], name="reservation_id"),
+        # An expired slot is already free; the TTL monitor only tidies it away.
+        IndexModel([("reserved_until", ASCENDING)], name="reserved_until_ttl", expireAfterSeconds=0),
+    ],
+    "leads": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Export range filters and (created_at, id) keyset resumption.
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "rate_limits": [
+        # Shared rate-limit buckets vanish once they would be full again.
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "lead_rollups": [
+        IndexModel([("dimension", ASCENDING), ("key", ASCENDING)], name="dimension_key"),
+    ],
+}
+
+
+_AVAILABLE = available_filter(datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+# (name, collection, filter, sort) for the point and listing lookups the API issues.
+QUERY_SHAPES: List[Tuple[str, str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = [
+    ("phone detail", "phones_for_sale", {"id": "sale-1"}, None),
+    ("listings newest", "phones_for_sale", {"in_stock": True, **_AVAILABLE}, [("_id", DESCENDING)]),
+    ("listings newest by brand", "phones_for_sale",
+     {"in_stock": True, "brand": "Samsung", **_AVAILABLE}, [("_id", DESCENDING)]),
+    ("listings by price", "phones_for_sale",
+     {"in_stock": True, "price": {"$gte": 10000, "$lte": 40000}, **_AVAILABLE}, [("price", ASCENDING), ("id", ASCENDING)]),
+    ("listings by brand and price", "phones_for_sale",
+     {"in_stock": True, "brand": "Samsung", "price": {"$gte": 10000}, **_AVAILABLE},
+     [("price", DESCENDING), ("id", DESCENDING)]),
+    ("reserve listing", "phones_for_sale", {"id": "sale-1", "in_stock": True, **_AVAILABLE}, None),
+    ("free hold slot", "reservation_slots", {"reservation_id": "reservation-1"}, None),
+    ("model by id", "phone_models", {"id": "sam-s23"}, None),
+    ("models by brand", "phone_models", {"brand_id": "samsung"}, [("name", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db):
+    async def ensure(collection: str, indexes: List[IndexModel]):
+        names = await db[collection].create_indexes(indexes)
+        logger.info("Indexes ensured on %s: %s", collection, ", ".join(names))
+
+    await asyncio.gather(*(ensure(collection, indexes) for collection, indexes in INDEXES.items()))
+
+
+def _plan_stages(plan: Dict[str, Any]) -> Iterator[str]:
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def verify_query_plans(db):
+    """Explain every route query shape and raise if any of them scans a whole collection."""
+    offenders = []
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        stages = list(_plan_stages(winning_plan))
+        logger.info("Query plan for %s: %s", name, " <- ".join(stages))
+        if "COLLSCAN" in stages:
+            offenders.append(f"{name} ({collection} {query})")
+
+    if offenders:
+        raise RuntimeError("Queries planned as COLLSCAN: " + "; ".join(offenders))
+
+
+if __name__ == "__main__":
+    import os
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            await ensure_indexes(db)
+            await verify_query_plans(db)
+        finally:
+            client.close()
+
+    asyncio.run(main())
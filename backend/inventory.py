@@ -0,0 +1,342 @@
+"""Bulk inventory import.
+
+Listings (``phones_for_sale``) and phone models are loaded from CSV or NDJSON
+streams. The body is parsed as it arrives and applied in batches of upserts
+keyed on ``id``, so memory stays flat however large the file is: at most one
+batch of rows, one CSV record of up to ``MAX_RECORD_LINES`` lines and the
+first ``max_errors`` row errors are held at a time.
+
+Each row is validated against the API model for its kind. Rows that fail
+validation are reported with their line number and skipped; the rest of the
+file is still applied. Upserts only ``$set`` the validated fields, so an
+imported listing keeps any live reservation hold.
+
+A kind can also accept partial rows (e.g. only ``id`` and ``base_price`` to
+reprice phone models): a row that is not a complete record is validated
+against the partial model instead and only updates a record that already
+exists; partial rows for unknown ids are reported as errors.
+
+CSV files have a header row. Nested ``specs`` go in ``specs.<name>`` columns
+(``specs.RAM``, ``specs.Storage``, ...) or in one ``specs`` column holding a
+JSON object; empty cells are treated as missing. A quoted cell may span
+lines; one whose closing quote never comes is reported on its first line and
+parsing resumes on the next.
+
+Run ``python inventory.py listings stock.csv`` to stream a file to the admin
+import endpoint of a running server.
+"""
+import codecs
+import csv
+import json
+import logging
+import time
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type,
+)
+
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# A quoted CSV cell still open after this many lines is taken to be unterminated.
+MAX_RECORD_LINES = 100
+
+Upsert = Callable[[List[Dict[str, Any]]], Awaitable[Tuple[int, int]]]
+# Which of the given ids are already stored.
+KnownIds = Callable[[List[str]], Awaitable[Set[str]]]
+
+
+class ImportReport:
+    def __init__(self, kind: str, fmt: str, max_errors: int = 100):
+        self.kind = kind
+        self.format = fmt
+        self.max_errors = max_errors
+        self.rows = 0
+        self.upserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def error(self, line: int, message: str, row_id: Optional[str] = None):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "id": row_id, "error": message})
+
+    @property
+    def applied(self) -> int:
+        return self.upserted + self.updated
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "format": self.format,
+            "rows": self.rows,
+            "upserted": self.upserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(time.perf_counter() - self.started, 3),
+        }
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Decode a UTF-8 byte stream into lines without holding more than one partial line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _ndjson_rows(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Any]]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"Invalid JSON: {e}")
+            continue
+        yield line_no, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+
+def _csv_row(header: List[str], values: List[str]) -> Dict[str, Any]:
+    if len(values) > len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+    row: Dict[str, Any] = {}
+    for column, value in zip(header, values):
+        if value == "":
+            continue
+        if column == "specs":
+            try:
+                row["specs"] = {**json.loads(value), **row.get("specs", {})}
+            except (ValueError, TypeError):
+                raise ValueError("specs must be a JSON object")
+        elif column.startswith("specs."):
+            row.setdefault("specs", {})[column[len("specs."):]] = value
+        else:
+            row[column] = value
+    return row
+
+
+class _RecordIncomplete(Exception):
+    pass
+
+
+class _RecordLines:
+    """The lines ``csv.reader`` parses from; reading past the end means the record goes on."""
+
+    def __init__(self):
+        self.lines: List[Tuple[int, str]] = []
+        self.used = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.used == len(self.lines):
+            raise _RecordIncomplete
+        self.used += 1
+        # iter_lines strips line ends; a quoted cell spanning lines needs them back.
+        return self.lines[self.used - 1][1] + "\n"
+
+
+def _csv_records(pending: _RecordLines, reader, final: bool) -> Iterator[Tuple[int, Any]]:
+    """``(line, values)`` for each complete record buffered in ``pending``."""
+    while pending.lines:
+        start = pending.lines[0][0]
+        pending.used = 0
+        try:
+            values = next(reader)
+        except _RecordIncomplete:
+            if not final and len(pending.lines) < MAX_RECORD_LINES:
+                return
+            # Drop only the line with the opening quote and reparse from the next one.
+            del pending.lines[0]
+            yield start, ValueError("Unterminated quoted field")
+            continue
+        except csv.Error as e:
+            values = ValueError(f"Invalid CSV: {e}")
+        del pending.lines[:max(pending.used, 1)]
+        yield start, values
+
+
+async def _csv_rows(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Any]]:
+    header: Optional[List[str]] = None
+    pending = _RecordLines()
+    reader = csv.reader(pending)
+    line_no = 0
+    finished = False
+    lines = aiter(lines)
+    while not finished:
+        try:
+            line_no += 1
+            pending.lines.append((line_no, await anext(lines)))
+        except StopAsyncIteration:
+            finished = True
+        for start, values in _csv_records(pending, reader, finished):
+            if isinstance(values, Exception):
+                yield start, values
+                continue
+            if not "".join(values).strip():
+                continue
+            if header is None:
+                header = [column.strip() for column in values]
+                continue
+            try:
+                row = _csv_row(header, values)
+            except ValueError as e:
+                row = e
+            yield start, row
+
+
+def read_rows(chunks: AsyncIterable[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """``(line, row)`` pairs from a CSV or NDJSON body; ``row`` is an exception for unparsable lines."""
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format {fmt!r}; expected one of {', '.join(IMPORT_FORMATS)}")
+    lines = iter_lines(chunks)
+    return _csv_rows(lines) if fmt == "csv" else _ndjson_rows(lines)
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}" for detail in error.errors()
+    )
+
+
+async def _apply(report: ImportReport, upsert: Upsert, batch: List[Tuple[int, Dict[str, Any], bool]],
+                 known_ids: Optional[KnownIds] = None):
+    partial_ids = [doc["id"] for _, doc, partial in batch if partial]
+    if partial_ids:
+        # Complete rows earlier in the batch create their records, so they count as known.
+        known = await known_ids(partial_ids) | {doc["id"] for _, doc, partial in batch if not partial}
+        for line, doc, partial in batch:
+            if partial and doc["id"] not in known:
+                report.error(line, "Unknown id; a new record needs every field", doc["id"])
+        batch = [item for item in batch if not item[2] or item[1]["id"] in known]
+        if not batch:
+            return
+    try:
+        upserted, updated = await upsert([doc for _, doc, _ in batch])
+    except BulkWriteError as e:
+        upserted, updated = e.details.get("nUpserted", 0), e.details.get("nMatched", 0)
+        for error in e.details.get("writeErrors", []):
+            line, doc, _ = batch[error["index"]]
+            report.error(line, error.get("errmsg", "Write failed"), doc["id"])
+    report.upserted += upserted
+    report.updated += updated
+    report.batches += 1
+
+
+def _validate(row: Dict[str, Any], model: Type[BaseModel],
+              partial: Optional[Tuple[Type[BaseModel], KnownIds]]) -> Tuple[Dict[str, Any], bool]:
+    try:
+        return model.model_validate(row).model_dump(), False
+    except ValidationError:
+        if partial is None:
+            raise
+    # Not a complete record: as an update, its errors are the ones worth reporting.
+    return partial[0].model_validate(row).model_dump(exclude_none=True), True
+
+
+async def import_rows(rows: AsyncIterable[Tuple[int, Any]], model: Type[BaseModel], upsert: Upsert,
+                      report: ImportReport, batch_size: int = 1000,
+                      on_progress: Optional[Callable[[ImportReport], None]] = None,
+                      partial: Optional[Tuple[Type[BaseModel], KnownIds]] = None) -> ImportReport:
+    """Validate ``rows`` against ``model`` and upsert them ``batch_size`` at a time.
+
+    With ``partial=(partial_model, known_ids)``, rows that are not a complete
+    ``model`` may instead update the stored record with their ``id``.
+    """
+    known_ids = partial[1] if partial is not None else None
+    batch: List[Tuple[int, Dict[str, Any], bool]] = []
+    async for line, row in rows:
+        report.rows += 1
+        if isinstance(row, Exception):
+            report.error(line, str(row))
+            continue
+        try:
+            doc, is_partial = _validate(row, model, partial)
+        except ValidationError as e:
+            report.error(line, _validation_message(e), row.get("id") if isinstance(row.get("id"), str) else None)
+            continue
+        batch.append((line, doc, is_partial))
+        if len(batch) >= batch_size:
+            await _apply(report, upsert, batch, known_ids)
+            batch = []
+            if on_progress is not None:
+                on_progress(report)
+    if batch:
+        await _apply(report, upsert, batch, known_ids)
+        if on_progress is not None:
+            on_progress(report)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import os
+    import sys
+    from pathlib import Path
+
+    import httpx
+
+    parser = argparse.ArgumentParser(description="Stream an inventory file to a running server's import endpoint.")
+    parser.add_argument("kind", choices=["listings", "models"])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--base-url", default=os.environ.get("API_BASE_URL", "http://localhost:8001"))
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=256 * 1024)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.suffix.lower() == ".csv" else "ndjson")
+
+    async def upload():
+        total = args.path.stat().st_size
+        sent = 0
+        with args.path.open("rb") as f:
+            while chunk := f.read(args.chunk_size):
+                sent += len(chunk)
+                print(f"\rUploaded {sent / 2**20:.1f} of {total / 2**20:.1f} MiB", end="", file=sys.stderr)
+                yield chunk
+        print(file=sys.stderr)
+
+    async def main():
+        headers = {"X-Admin-Token": args.admin_token} if args.admin_token else {}
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+            response = await client.post(
+                "/api/admin/inventory/import",
+                params={"kind": args.kind, "format": fmt, "batch_size": args.batch_size},
+                content=upload(),
+                headers=headers,
+            )
+        if response.status_code != 200:
+            print(f"Import failed: HTTP {response.status_code} {response.text}", file=sys.stderr)
+            return 2
+        report = response.json()
+        for error in report["errors"]:
+            print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+        if report["errors_truncated"]:
+            print(f"... {report['failed'] - len(report['errors'])} more row errors", file=sys.stderr)
+        print(f"{report['rows']} rows: {report['upserted']} inserted, {report['updated']} updated, "
+              f"{report['failed']} failed in {report['seconds']}s")
+        return 1 if report["failed"] else 0
+
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,267 @@
+"""Write-behind buffer for lead ingestion.
+
+``submit_lead`` hands documents to a bounded in-process queue; a single
+background task drains it with ``insert_many``. A batch is written as soon
+as the queue is empty, so a lone lead is not delayed; under load, leads that
+arrive while a flush is in flight form the next batch, up to ``batch_size``
+leads or ``flush_interval`` seconds of collecting.
+
+Durability is chosen with ``mode``:
+
+* ``wait``  - the request waits until its batch is written (group commit).
+* ``ack``   - the request returns as soon as the lead is queued; a crash can
+              lose whatever is still buffered.
+* ``sync``  - bypass the buffer and ``insert_one`` inline, as before.
+
+When the queue is full, ``submit`` waits up to ``put_timeout`` seconds for
+room and then raises ``LeadBufferFull`` so the route can shed load.
+
+``on_written`` is awaited with every group of leads once they are stored,
+which is where derived data such as the rollup counters is maintained.
+"""
+import asyncio
+import csv
+import io
+import logging
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+LEAD_WRITE_MODES = ("wait", "ack", "sync")
+DUPLICATE_KEY = 11000
+
+_STOP = object()
+
+
+class LeadBufferFull(Exception):
+    pass
+
+
+class LeadBuffer:
+    def __init__(self, store, mode: str = "wait", max_size: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.05, put_timeout: float = 1.0, max_attempts: int = 3,
+                 on_written: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None):
+        if mode not in LEAD_WRITE_MODES:
+            raise ValueError(f"Unknown lead write mode {mode!r}; expected one of {', '.join(LEAD_WRITE_MODES)}")
+        self.store = store
+        self.mode = mode
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_attempts = max_attempts
+        self.on_written = on_written
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.mode == "sync" or self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued and stop the background writer."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("Lead buffer drained (%d written, %d failed)", self.written, self.failed)
+
+    async def submit(self, doc: Dict[str, Any]):
+        if not self.running:
+            await self.store.insert_one(doc)
+            self.written += 1
+            if self.on_written is not None:
+                await self.on_written([doc])
+            return
+
+        future = asyncio.get_running_loop().create_future() if self.mode == "wait" else None
+        try:
+            await asyncio.wait_for(self._queue.put((doc, future)), self.put_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LeadBufferFull("Lead buffer is full")
+        self.enqueued += 1
+        if future is not None:
+            await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            # Take whatever queued up while the last flush ran, and flush as soon
+            # as the queue is empty; the deadline only caps how long a batch grows.
+            while len(batch) < self.batch_size and loop.time() < deadline:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]):
+        started = time.perf_counter()
+        pending = batch
+        error: Optional[Exception] = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.store.insert_many([doc for doc, _ in pending], ordered=False)
+                pending = []
+            except BulkWriteError as e:
+                # Duplicate keys mean an earlier attempt already wrote the lead.
+                retry = {
+                    err["index"] for err in e.details.get("writeErrors", [])
+                    if err.get("code") != DUPLICATE_KEY
+                }
+                pending = [item for index, item in enumerate(pending) if index in retry]
+                error = e
+            except PyMongoError as e:
+                error = e
+            if not pending:
+                break
+            if attempt < self.max_attempts:
+                await asyncio.sleep(0.05 * 2 ** attempt)
+
+        failed = {id(item) for item in pending}
+        if self.on_written is not None and len(pending) < len(batch):
+            try:
+                await self.on_written([item[0] for item in batch if id(item) not in failed])
+            except Exception:
+                logger.exception("Lead on_written hook failed")
+        for item in batch:
+            _, future = item
+            if id(item) in failed:
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            elif future is not None and not future.done():
+                future.set_result(None)
+
+        self.flushes += 1
+        self.written += len(batch) - len(pending)
+        self.failed += len(pending)
+        if pending:
+            logger.error("Failed to write %d leads after %d attempts: %s", len(pending), self.max_attempts, error)
+
+        elapsed = time.perf_counter() - started
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self.total_flush_seconds += elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "last_flush_seconds": round(self.last_flush_seconds, 6),
+            "max_flush_seconds": round(self.max_flush_seconds, 6),
+            "avg_flush_seconds": round(self.total_flush_seconds / self.flushes, 6) if self.flushes else None,
+        }
+
+
+# ============ EXPORT ============
+
+EXPORT_FIELDS = ("id", "created_at", "name", "phone", "area", "preferred_time",
+                 "phone_model", "offered_price", "remarks", "lead_type")
+EXPORT_SORT = [("created_at", 1), ("id", 1)]
+# Spreadsheets evaluate cells starting with these as formulas.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_safe(lead: Dict[str, Any]) -> Dict[str, Any]:
+    """Prefix text cells that a spreadsheet would run as a formula with a quote."""
+    return {
+        field: f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+        for field, value in lead.items()
+    }
+
+
+def export_query(created_from: Optional[str] = None, created_to: Optional[str] = None,
+                 after_created_at: Optional[str] = None, after_id: Optional[str] = None) -> Dict[str, Any]:
+    """Filter for an export, optionally resuming strictly after the last exported lead."""
+    conditions: List[Dict[str, Any]] = []
+    created_range: Dict[str, str] = {}
+    if created_from is not None:
+        created_range["$gte"] = created_from
+    if created_to is not None:
+        created_range["$lt"] = created_to
+    if created_range:
+        conditions.append({"created_at": created_range})
+    if after_created_at is not None:
+        if after_id is None:
+            conditions.append({"created_at": {"$gt": after_created_at}})
+        else:
+            conditions.append({"$or": [
+                {"created_at": {"$gt": after_created_at}},
+                {"created_at": after_created_at, "id": {"$gt": after_id}},
+            ]})
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+async def export_leads(leads: AsyncIterable[Dict[str, Any]], fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Encode leads as NDJSON or CSV, one chunk per ``batch_size`` rows.
+
+    Feed it leads in (created_at, id) order, so a client that lost its
+    connection resumes with the last row's created_at and id. CSV cells that
+    would start a spreadsheet formula are prefixed with ``'``.
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        rows = 0
+        async for lead in leads:
+            writer.writerow(_csv_safe(lead))
+            rows += 1
+            if rows % batch_size == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+        return
+
+    chunk: List[bytes] = []
+    async for lead in leads:
+        chunk.append(dumps({field: lead[field] for field in EXPORT_FIELDS if field in lead}))
+        if len(chunk) == batch_size:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
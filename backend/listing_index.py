@@ -0,0 +1,187 @@
+"""In-process, array-backed index of in-stock listings.
+
+With ``LISTING_INDEX=1`` the buy page's listing queries are answered from
+this index instead of Mongo. Every brand, and all brands together, get a
+column: listings sorted by ``(price, id)`` and by ``_id``, each with a
+parallel array of plain sort keys. A price range is two bisections into the
+key array, the slice between them is already in ``price_asc`` order (walk it
+backwards for ``price_desc``), and a cursor resumes with one more bisection.
+Listings are compact ``__slots__`` records holding the response dict once.
+
+Holds are checked per record at query time, so an expired reservation needs
+no update. The index is kept current from this worker's reservations and
+imports and from coherence events; holds placed by *other* workers show up
+once their change event arrives or, with ``COHERENCE_MODE=poll``, once the
+next poll sees the ``phones_for_sale`` version that reserving bumps and the
+index is rebuilt (a reserve attempt gets a 409 meanwhile).
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from pagination import MongoSort
+from reservations import aware
+
+
+class ListingRecord:
+    __slots__ = ("id", "brand", "price", "oid", "reserved_until", "listing")
+
+    def __init__(self, doc: Dict[str, Any], fields: Tuple[str, ...]):
+        self.oid = str(doc["_id"])
+        self.reserved_until = aware(doc.get("reserved_until"))
+        self.id = doc["id"]
+        self.brand = doc["brand"]
+        self.price = doc["price"]
+        # Only the response fields: reservation ids must never be served.
+        self.listing = {field: doc[field] for field in fields if field in doc}
+
+    def key(self, field: str) -> List[Any]:
+        return [self.oid] if field == "_id" else [self.price, self.id]
+
+
+class _Column:
+    """One brand's records (or every brand's) in price order and in ``_id`` order."""
+
+    __slots__ = ("price_keys", "by_price", "oids", "by_oid")
+
+    def __init__(self, records: Iterable[ListingRecord] = ()):
+        records = list(records)
+        self.by_price = sorted(records, key=lambda record: (record.price, record.id))
+        self.price_keys = [(record.price, record.id) for record in self.by_price]
+        self.by_oid = sorted(records, key=lambda record: record.oid)
+        self.oids = [record.oid for record in self.by_oid]
+
+    def __len__(self) -> int:
+        return len(self.by_price)
+
+    def add(self, record: ListingRecord):
+        key = (record.price, record.id)
+        position = bisect_left(self.price_keys, key)
+        self.price_keys.insert(position, key)
+        self.by_price.insert(position, record)
+        position = bisect_left(self.oids, record.oid)
+        self.oids.insert(position, record.oid)
+        self.by_oid.insert(position, record)
+
+    def remove(self, record: ListingRecord):
+        position = bisect_left(self.price_keys, (record.price, record.id))
+        del self.price_keys[position], self.by_price[position]
+        position = bisect_left(self.oids, record.oid)
+        del self.oids[position], self.by_oid[position]
+
+
+class ListingIndex:
+    def __init__(self, fields: Iterable[str]):
+        self.fields = tuple(fields)
+        self.loaded = False
+        self._records: Dict[str, ListingRecord] = {}
+        self._all = _Column()
+        self._brands: Dict[str, _Column] = {}
+
+        self.rebuilds = 0
+        self.updates = 0
+        self.queries = 0
+
+    def replace(self, docs: Iterable[Dict[str, Any]]):
+        """Swap in a fresh index of ``docs``, sorting each column once."""
+        records = {doc["id"]: ListingRecord(doc, self.fields) for doc in docs if doc.get("in_stock")}
+        by_brand: Dict[str, List[ListingRecord]] = {}
+        for record in records.values():
+            by_brand.setdefault(record.brand, []).append(record)
+        self._records = records
+        self._all = _Column(records.values())
+        self._brands = {brand: _Column(brand_records) for brand, brand_records in by_brand.items()}
+        self.loaded = True
+        self.rebuilds += 1
+
+    def upsert(self, doc: Dict[str, Any]):
+        """Apply a changed listing document; listings out of stock leave the index."""
+        self.remove(doc["id"])
+        if not doc.get("in_stock"):
+            return
+        record = ListingRecord(doc, self.fields)
+        self._records[record.id] = record
+        self._all.add(record)
+        self._brands.setdefault(record.brand, _Column()).add(record)
+        self.updates += 1
+
+    def remove(self, phone_id: str):
+        record = self._records.pop(phone_id, None)
+        if record is None:
+            return
+        self._all.remove(record)
+        column = self._brands[record.brand]
+        column.remove(record)
+        if not len(column):
+            del self._brands[record.brand]
+        self.updates += 1
+
+    def hold(self, phone_id: str, reserved_until: Optional[datetime]):
+        record = self._records.get(phone_id)
+        if record is not None:
+            record.reserved_until = aware(reserved_until)
+            self.updates += 1
+
+    def page(self, order: MongoSort, limit: int, after: Optional[List[Any]] = None, brand: Optional[str] = None,
+             min_price: Optional[int] = None, max_price: Optional[int] = None,
+             now: Optional[datetime] = None) -> Tuple[List[Dict[str, Any]], Optional[List[Any]]]:
+        """Up to ``limit`` available listings in ``order`` after ``after``, plus the next page's cursor key."""
+        self.queries += 1
+        column = self._brands.get(brand) if brand else self._all
+        if column is None:
+            return [], None
+        now = now or datetime.now(timezone.utc)
+        try:
+            records = self._candidates(column, order, after, min_price, max_price)
+        except TypeError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        listings: List[Dict[str, Any]] = []
+        last: Optional[ListingRecord] = None
+        for record in records:
+            if record.reserved_until is not None and record.reserved_until > now:
+                continue
+            if len(listings) == limit:
+                return listings, last.key(order.field)
+            listings.append(record.listing)
+            last = record
+        return listings, None
+
+    def _candidates(self, column: _Column, order: MongoSort, after: Optional[List[Any]],
+                    min_price: Optional[int], max_price: Optional[int]) -> Iterable[ListingRecord]:
+        keys = column.price_keys
+        low = bisect_left(keys, (min_price,)) if min_price is not None else 0
+        high = bisect_left(keys, (max_price + 1,)) if max_price is not None else len(keys)
+
+        if order.field == "price":
+            if after is not None:
+                key = tuple(after)
+                if order.direction > 0:
+                    low = max(low, bisect_right(keys, key))
+                else:
+                    high = min(high, bisect_left(keys, key))
+            if order.direction > 0:
+                return (column.by_price[i] for i in range(low, high))
+            return (column.by_price[i] for i in range(high - 1, low - 1, -1))
+
+        # Newest first: walk the _id array backwards, or sort just the price slice.
+        before = after[0] if after is not None else None
+        if min_price is None and max_price is None:
+            end = bisect_left(column.oids, before) if before is not None else len(column.oids)
+            return (column.by_oid[i] for i in range(end - 1, -1, -1))
+        matches = column.by_price[low:high]
+        if before is not None:
+            matches = [record for record in matches if record.oid < before]
+        return sorted(matches, key=lambda record: record.oid, reverse=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "listings": len(self._records),
+            "brands": len(self._brands),
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+            "queries": self.queries,
+        }
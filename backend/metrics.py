@@ -0,0 +1,195 @@
+"""Request and Mongo command metrics in Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request and labels it with the route
+template (``/api/models/{brand_id}``), not the raw path, to keep label
+cardinality bounded. ``MongoCommandListener`` is a pymongo command listener
+that times every command per collection, so a slow request can be split into
+time spent in Mongo and time spent in Python.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# (name, type, help, [(labels, value)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., sum, count]
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._values.items()]
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {_format_value(cumulative)}"
+            yield f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {_format_value(series[-1])}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(labels)} {_format_value(series[-1])}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = Counter(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Register a callback producing gauge/counter families at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route, method and status.")
+http_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency by route and method.")
+mongo_commands = registry.counter("mongo_commands_total", "Mongo commands by collection, command and outcome.")
+mongo_latency = registry.histogram("mongo_command_duration_seconds", "Mongo command latency by collection and command.")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streaming responses are timed to the last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(route=path, method=method, status=str(status[0]))
+            http_latency.observe(time.perf_counter() - started, route=path, method=method)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._collections: Dict[Tuple[int, Optional[int]], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        name = event.command_name
+        # Collection commands carry the collection name as the command's value;
+        # admin commands like hello/ping carry 1 instead.
+        collection = event.command.get("collection" if name == "getMore" else name, "")
+        if not isinstance(collection, str):
+            collection = ""
+        with self._lock:
+            self._collections[(event.request_id, event.operation_id)] = collection
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop((event.request_id, event.operation_id), "")
+        command = event.command_name
+        mongo_commands.inc(collection=collection, command=command, outcome=outcome)
+        mongo_latency.observe(event.duration_micros / 1_000_000, collection=collection, command=command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, "success")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, "failure")
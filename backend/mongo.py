@@ -0,0 +1,61 @@
+"""Mongo client settings from the environment.
+
+Pool size and timeouts map one-to-one onto PyMongo client options, e.g.
+``MONGO_MAX_POOL_SIZE=200`` or ``MONGO_SERVER_SELECTION_TIMEOUT_MS=2000``.
+Server selection defaults to 5 seconds instead of PyMongo's 30 so that a
+failover surfaces as a fast error (and a stale-catalog fallback) rather than
+every request hanging for half a minute.
+
+Catalog reads can be routed away from the primary with
+``MONGO_CATALOG_READ_PREFERENCE`` (default ``secondaryPreferred``), bounded by
+``MONGO_CATALOG_MAX_STALENESS_SECONDS`` when set (90 seconds at least).
+"""
+from typing import Any, Dict, Mapping
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# Environment variable -> (client keyword, type)
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_HEARTBEAT_FREQUENCY_MS": ("heartbeatFrequencyMS", int),
+    "MONGO_APP_NAME": ("appname", str),
+}
+
+DEFAULT_CLIENT_OPTIONS = {
+    "serverSelectionTimeoutMS": 5000,
+    "connectTimeoutMS": 5000,
+}
+
+READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def client_options(environ: Mapping[str, str]) -> Dict[str, Any]:
+    options: Dict[str, Any] = dict(DEFAULT_CLIENT_OPTIONS)
+    for name, (option, cast) in CLIENT_OPTIONS.items():
+        value = environ.get(name)
+        if value:
+            try:
+                options[option] = cast(value)
+            except ValueError:
+                raise ValueError(f"{name} must be {cast.__name__}, got {value!r}")
+    return options
+
+
+def read_preference(name: str, max_staleness: int = -1):
+    if name == "primary":
+        return Primary()
+    if name not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference {name!r}; expected primary or one of {', '.join(READ_PREFERENCES)}")
+    return READ_PREFERENCES[name](max_staleness=max_staleness)
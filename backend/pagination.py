@@ -0,0 +1,145 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is an opaque url-safe token holding the sort name and the sort key
+of the last item on the previous page. The next page starts strictly after
+that key, so pages stay stable while documents are inserted or removed and
+no page ever needs a ``skip``.
+
+List endpoints keep returning a plain JSON array; the cursor for the next
+page, if any, is sent in the ``X-Next-Cursor`` header and a ``Link`` header
+with ``rel="next"``.
+"""
+import base64
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, Request, Response
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort: str, key: Sequence[Any]) -> str:
+    payload = json.dumps({"s": sort, "k": list(key)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = payload["k"]
+        cursor_sort = payload["s"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Keys go into query filters: only a list of plain scalars is acceptable.
+    if not isinstance(key, list) or not key or not all(_is_key_part(part) for part in key):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+    return key
+
+
+def _is_key_part(value: Any) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def next_cursor_headers(request: Request, next_cursor: Optional[str]) -> Dict[str, str]:
+    if next_cursor is None:
+        return {}
+    next_url = request.url.include_query_params(cursor=next_cursor)
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'}
+
+
+def set_next_cursor(request: Request, response: Response, next_cursor: Optional[str]):
+    response.headers.update(next_cursor_headers(request, next_cursor))
+
+
+# ============ MONGO KEYSET SORTS ============
+
+class MongoSort:
+    """A sort order over a collection, tie-broken on a unique field.
+
+    The tiebreak uses the same direction as the primary field so the whole
+    sort can be served by walking one compound index in either direction.
+    """
+
+    def __init__(self, field: str, direction: int, tiebreak: str = "id"):
+        self.field = field
+        self.direction = direction
+        self.tiebreak = tiebreak
+
+    @property
+    def spec(self) -> List[Tuple[str, int]]:
+        if self.field == self.tiebreak:
+            return [(self.field, self.direction)]
+        return [(self.field, self.direction), (self.tiebreak, self.direction)]
+
+    def key(self, doc: Dict[str, Any]) -> List[Any]:
+        value = doc[self.field]
+        if isinstance(value, ObjectId):
+            value = str(value)
+        if self.field == self.tiebreak:
+            return [value]
+        return [value, doc[self.tiebreak]]
+
+    def _check(self, key: List[Any]):
+        if len(key) != (1 if self.field == self.tiebreak else 2):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def after(self, key: List[Any]) -> Dict[str, Any]:
+        """Filter matching documents strictly after ``key`` in this order."""
+        self._check(key)
+        op = "$gt" if self.direction > 0 else "$lt"
+        value = key[0]
+        if self.field == "_id":
+            try:
+                value = ObjectId(value)
+            except Exception:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        if self.field == self.tiebreak:
+            return {self.field: {op: value}}
+        return {"$or": [
+            {self.field: {op: value}},
+            {self.field: value, self.tiebreak: {op: key[1]}},
+        ]}
+
+    def follows(self, doc: Dict[str, Any], key: List[Any]) -> bool:
+        """In-memory counterpart of ``after``: is ``doc`` strictly after ``key``?"""
+        self._check(key)
+        try:
+            doc_key = self.key(doc)
+            return doc_key > key if self.direction > 0 else doc_key < key
+        except TypeError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+LISTING_SORTS = {
+    "newest": MongoSort("_id", -1, tiebreak="_id"),
+    "price_asc": MongoSort("price", 1),
+    "price_desc": MongoSort("price", -1),
+}
+
+
+# ============ IN-MEMORY KEYSET PAGES ============
+
+def paginate_memory(items: Sequence[Dict[str, Any]], sort: str,
+                    sort_key: Callable[[Dict[str, Any]], Tuple], limit: int,
+                    cursor: Optional[str] = None, reverse: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Keyset-paginate an in-memory list; ``sort_key`` must end with a unique field."""
+    ordered = sorted(items, key=sort_key, reverse=reverse)
+    if cursor is not None:
+        after = tuple(decode_cursor(cursor, sort))
+        if ordered and len(after) != len(sort_key(ordered[0])):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            if reverse:
+                ordered = [item for item in ordered if sort_key(item) < after]
+            else:
+                ordered = [item for item in ordered if sort_key(item) > after]
+        except TypeError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    page = ordered[:limit]
+    next_cursor = encode_cursor(sort, sort_key(page[-1])) if len(ordered) > limit else None
+    return page, next_cursor
@@ -0,0 +1,224 @@
+"""Compiled form of the question set used by /calculate-price.
+
+Questions are compiled once into bitmasks indexed by question position:
+``yes_mask`` marks questions where answering "yes" deducts, ``blocking_mask``
+marks questions that block the offer. A set of answers becomes a single
+integer, so the questions that apply to a quote are found with a couple of
+bitwise operations instead of a branchy loop over every question document.
+
+The result is identical to walking the questions in order: the first
+triggered blocking question blocks the offer, and only deductions that come
+before it are reported.
+
+Batches are evaluated with NumPy over an answers x questions matrix, so a
+thousand quotes cost one vectorised pass rather than a thousand loops. The
+same pass prices every single-answer flip of a form for ``sensitivity``.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cache import LRUCache
+
+
+class CompiledQuestionSet:
+    def __init__(self, questions: List[Dict[str, Any]]):
+        self.questions = questions
+        self.size = len(questions)
+        self.full_mask = (1 << self.size) - 1
+        self.yes_mask = 0
+        self.blocking_mask = 0
+        self.percentages: List[Any] = []
+        self.texts: List[str] = []
+        self.categories: List[str] = []
+        self.entries: List[Dict[str, Any]] = []
+        # Question id -> bits for its position(s), so duplicate ids stay faithful.
+        self.bits: Dict[str, int] = {}
+        self.positions: Dict[str, List[int]] = {}
+
+        for i, question in enumerate(questions):
+            bit = 1 << i
+            if question["yes_deducts"]:
+                self.yes_mask |= bit
+            if question["is_blocking"]:
+                self.blocking_mask |= bit
+            self.percentages.append(question["deduction_percentage"])
+            self.texts.append(question["text"])
+            self.categories.append(question.get("category", ""))
+            self.entries.append({"question": question["text"], "percentage": question["deduction_percentage"]})
+            self.bits[question["id"]] = self.bits.get(question["id"], 0) | bit
+            self.positions.setdefault(question["id"], []).append(i)
+
+        self.yes_vector = np.array([q["yes_deducts"] for q in questions], dtype=bool)
+        self.blocking_vector = np.array([q["is_blocking"] for q in questions], dtype=bool)
+        self.percentage_vector = np.array(self.percentages, dtype=np.float64)
+
+    def answer_mask(self, answers: Dict[str, bool]) -> int:
+        """Bitmask of questions answered "yes". Unknown ids are ignored, missing ones count as "no"."""
+        mask = 0
+        bits = self.bits
+        for question_id, answer in answers.items():
+            if answer:
+                mask |= bits.get(question_id, 0)
+        return mask
+
+    def triggered_mask(self, mask: int) -> int:
+        """Questions whose answer counts against the phone."""
+        return (mask & self.yes_mask) | (~mask & self.full_mask & ~self.yes_mask)
+
+    def quote(self, base_price: int, answers: Dict[str, bool]) -> Dict[str, Any]:
+        return self.quote_mask(base_price, self.answer_mask(answers))
+
+    def quote_mask(self, base_price: int, mask: int) -> Dict[str, Any]:
+        triggered = self.triggered_mask(mask)
+        blocked = triggered & self.blocking_mask
+        block_reason = None
+        if blocked:
+            first = (blocked & -blocked).bit_length() - 1
+            block_reason = self.texts[first]
+            triggered &= (1 << first) - 1
+
+        deductions = []
+        total_deduction_percentage = 0
+        remaining = triggered & ~self.blocking_mask
+        while remaining:
+            low = remaining & -remaining
+            i = low.bit_length() - 1
+            deductions.append(self.entries[i])
+            total_deduction_percentage += self.percentages[i]
+            remaining ^= low
+
+        if blocked:
+            final_price = 0
+        else:
+            final_price = int(base_price * (1 - total_deduction_percentage / 100))
+
+        return {
+            "base_price": base_price,
+            "final_price": final_price,
+            "deductions": deductions,
+            "is_blocked": bool(blocked),
+            "block_reason": block_reason,
+        }
+
+    def answer_matrix(self, answer_sets: Sequence[Dict[str, bool]]) -> np.ndarray:
+        """Boolean matrix with one row per answer set and one column per question."""
+        matrix = np.zeros((len(answer_sets), self.size), dtype=bool)
+        positions = self.positions
+        for row, answers in enumerate(answer_sets):
+            for question_id, answer in answers.items():
+                if answer and question_id in positions:
+                    matrix[row, positions[question_id]] = True
+        return matrix
+
+    def _evaluate(self, answers: np.ndarray):
+        """Blocked flags, first blocking column, deducting matrix and total percentages per row."""
+        triggered = answers == self.yes_vector
+        blocking = triggered & self.blocking_vector
+        blocked = blocking.any(axis=1)
+        first_block = np.where(blocked, blocking.argmax(axis=1), self.size)
+
+        # Deductions only count up to the first triggered blocking question.
+        columns = np.arange(self.size)
+        deducting = triggered & ~self.blocking_vector & (columns < first_block[:, None])
+        totals = deducting @ self.percentage_vector
+        return blocked, first_block, deducting, totals
+
+    def quote_many(self, base_prices: Sequence[int], answer_sets: Sequence[Dict[str, bool]]) -> List[Dict[str, Any]]:
+        """Quote many answer sets at once; each result matches ``quote`` for the same input."""
+        if not answer_sets:
+            return []
+
+        blocked, first_block, deducting, totals = self._evaluate(self.answer_matrix(answer_sets))
+        results = []
+        for row, base_price in enumerate(base_prices):
+            is_blocked = bool(blocked[row])
+            if is_blocked:
+                final_price = 0
+            else:
+                final_price = int(base_price * (1 - float(totals[row]) / 100))
+            results.append({
+                "base_price": base_price,
+                "final_price": final_price,
+                "deductions": [self.entries[i] for i in np.flatnonzero(deducting[row])],
+                "is_blocked": is_blocked,
+                "block_reason": self.texts[first_block[row]] if is_blocked else None,
+            })
+        return results
+
+    def sensitivity(self, base_price: int, answers: Dict[str, bool]) -> Dict[str, Any]:
+        """The current quote, the price after flipping each question, and deductions per category.
+
+        Row 0 of the evaluated matrix is the form as answered; every other row
+        flips one question id, so the whole what-if table is one NumPy pass.
+        """
+        current = self.answer_matrix([answers])[0]
+        question_ids = list(self.positions)
+        rows = np.repeat(current[None, :], len(question_ids) + 1, axis=0)
+        for row, question_id in enumerate(question_ids, start=1):
+            rows[row, self.positions[question_id]] ^= True
+        blocked, _, deducting, totals = self._evaluate(rows)
+
+        def final_price(row: int) -> int:
+            return 0 if blocked[row] else int(base_price * (1 - float(totals[row]) / 100))
+
+        current_price = final_price(0)
+        flips = []
+        for row, question_id in enumerate(question_ids, start=1):
+            price = final_price(row)
+            flips.append({
+                "question_id": question_id,
+                "answer": bool(current[self.positions[question_id][0]]),
+                "final_price": price,
+                "delta": price - current_price,
+                "is_blocked": bool(blocked[row]),
+            })
+
+        subtotals: Dict[str, Dict[str, Any]] = {}
+        for i, category in enumerate(self.categories):
+            subtotal = subtotals.setdefault(category, {"category": category, "deduction_percentage": 0, "deductions": 0})
+            if deducting[0, i]:
+                subtotal["deduction_percentage"] += self.percentages[i]
+                subtotal["deductions"] += 1
+        for subtotal in subtotals.values():
+            subtotal["deduction_amount"] = int(base_price * subtotal["deduction_percentage"] / 100)
+
+        return {
+            "quote": self.quote_mask(base_price, self.answer_mask(answers)),
+            "flips": flips,
+            "categories": list(subtotals.values()),
+        }
+
+
+class QuoteCache:
+    """Memoised quotes keyed by ``(model_id, answer bitmask)``.
+
+    The bitmask is canonical for a compiled question set: answer order,
+    unknown question ids and explicit "no" answers all map to the same key.
+    Call ``on_catalog_reload`` whenever the catalog changes so that quotes for
+    re-priced models, or every quote after a question set change, are dropped.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = 600.0):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, model_id: str, mask: int) -> Any:
+        return self.entries.get((model_id, mask))
+
+    def set(self, model_id: str, mask: int, quote: Any):
+        self.entries.set((model_id, mask), quote)
+
+    def on_catalog_reload(self, previous, current):
+        if previous is None or previous.pricing is not current.pricing:
+            self.entries.clear()
+            return
+
+        changed = {
+            model_id for model_id, model in previous.models_by_id.items()
+            if current.models_by_id.get(model_id, {}).get("base_price") != model["base_price"]
+        }
+        if changed:
+            self.entries.remove_where(lambda key: key[0] in changed)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.entries.stats()
@@ -0,0 +1,531 @@
+"""Storage backends behind the API.
+
+Routes and the caching/ingestion modules talk to a ``Repository`` rather than
+to Motor. It groups one store per aggregate:
+
+* ``catalog``  - brands, phone_models and questions, plus the version
+  documents that the caches revalidate against;
+* ``listings`` - phones_for_sale, including reservation holds;
+* ``leads``    - lead documents;
+* ``rollups``  - the pre-aggregated lead counters.
+
+``MongoRepository`` is the production backend. ``MemoryRepository`` keeps
+everything in process with hash and sorted-key indexes; select it with
+``REPOSITORY_BACKEND=memory`` to profile handler and framework CPU without
+database noise, or to run the API with no Mongo at all. It is per process:
+with several workers each one has its own data.
+"""
+import asyncio
+import logging
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import reservations
+from facets import count_facets, facet_stage, shape_facets
+from indexes import ensure_indexes, verify_query_plans
+from leads import DUPLICATE_KEY, EXPORT_SORT, export_query
+from pagination import MongoSort
+from reservations import ReservationConflict, ReservationLimitReached, ReservationNotFound, available_filter, utcnow
+
+logger = logging.getLogger(__name__)
+
+REPOSITORY_BACKENDS = ("mongo", "memory")
+
+RollupKey = Tuple[str, str]
+
+# Sorts after every real lead id, for resuming "after every lead at this timestamp".
+_LAST_ID = "\U0010ffff"
+
+
+def listing_query(brand: Optional[str] = None, min_price: Optional[int] = None,
+                  max_price: Optional[int] = None, now=None) -> Dict[str, Any]:
+    """Mongo filter for in-stock, unreserved listings."""
+    query: Dict[str, Any] = {"in_stock": True, **available_filter(now or utcnow())}
+    if brand:
+        query["brand"] = brand
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+    return query
+
+
+async def _upsert_by_id(collection, docs: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """``$set`` each document onto the one with its ``id``; returns (inserted, updated)."""
+    result = await collection.bulk_write(
+        [UpdateOne({"id": doc["id"]}, {"$set": doc}, upsert=True) for doc in docs], ordered=False,
+    )
+    return result.upserted_count, result.matched_count
+
+
+async def _insert_missing(collection, docs: List[Dict[str, Any]]) -> int:
+    """Insert the documents whose ``id`` is not stored yet; existing ones are left untouched."""
+    try:
+        result = await collection.bulk_write(
+            [UpdateOne({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True) for doc in docs], ordered=False,
+        )
+        return result.upserted_count
+    except BulkWriteError as e:
+        # Another worker inserting the same ids at the same moment is not an error here.
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+        return e.details.get("nUpserted", 0)
+
+
+# ============ MONGO ============
+
+class MongoCatalogStore:
+    def __init__(self, db, read_db=None):
+        self.db = db
+        # Catalog reads may go to secondaries; writes always use ``db``.
+        self.read_db = read_db if read_db is not None else db
+
+    async def load(self, primary: bool = False) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """``primary`` reads past secondary lag, e.g. right after this process wrote."""
+        db = self.db if primary else self.read_db
+        brands, models, questions = await asyncio.gather(
+            db.brands.find({}, {"_id": 0}).to_list(None),
+            db.phone_models.find({}, {"_id": 0}).to_list(None),
+            db.questions.find({}, {"_id": 0}).to_list(None),
+        )
+        return brands, models, questions
+
+    async def read_version(self, key: str, primary: bool = False) -> int:
+        db = self.db if primary else self.read_db
+        meta = await db.catalog_meta.find_one({"_id": key}, {"version": 1})
+        return meta["version"] if meta else 0
+
+    async def bump_version(self, key: str) -> int:
+        """Mark ``key`` as changed so every worker notices on its next revalidation."""
+        meta = await self.db.catalog_meta.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return meta["version"]
+
+    async def set_version(self, key: str, version: int):
+        """Record ``version`` for ``key`` unless a higher one is already stored."""
+        await self.db.catalog_meta.update_one({"_id": key}, {"$max": {"version": version}}, upsert=True)
+
+    async def seed(self, brands: List[Dict[str, Any]], models: List[Dict[str, Any]], questions: List[Dict[str, Any]]):
+        """Insert the missing brands, models and questions, leaving stored ones as they are."""
+        await asyncio.gather(
+            _insert_missing(self.db.brands, brands),
+            _insert_missing(self.db.phone_models, models),
+            _insert_missing(self.db.questions, questions),
+        )
+
+    async def upsert_models(self, models: List[Dict[str, Any]]) -> Tuple[int, int]:
+        return await _upsert_by_id(self.db.phone_models, models)
+
+    async def model_ids(self, ids: List[str]) -> Set[str]:
+        """The ones of ``ids`` that name a stored phone model."""
+        return set(await self.db.phone_models.distinct("id", {"id": {"$in": ids}}))
+
+
+class MongoListingStore:
+    def __init__(self, collection, slots=None):
+        self.collection = collection
+        self.slots = slots
+
+    async def page(self, order: MongoSort, limit: int, projection: Dict[str, Any], after: Optional[List[Any]] = None,
+                   brand: Optional[str] = None, min_price: Optional[int] = None,
+                   max_price: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Up to ``limit`` available listings in ``order``, strictly after the ``after`` key."""
+        query = listing_query(brand, min_price, max_price)
+        if after is not None:
+            query = {"$and": [query, order.after(after)]}
+        cursor = self.collection.find(query, projection).sort(order.spec).limit(limit).batch_size(limit)
+        return await cursor.to_list(limit)
+
+    async def facets(self, boundaries: Tuple[int, ...], brand: Optional[str] = None,
+                     min_price: Optional[int] = None, max_price: Optional[int] = None) -> Dict[str, Any]:
+        """Counts per facet over the available listings, in one aggregation."""
+        pipeline = [{"$match": listing_query(brand, min_price, max_price)}, facet_stage(boundaries)]
+        groups = await self.collection.aggregate(pipeline).to_list(1)
+        return shape_facets(groups[0] if groups else {}, boundaries)
+
+    async def get(self, phone_id: str, projection: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": phone_id}, projection)
+
+    async def in_stock(self, projection: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        async for phone in self.collection.find({"in_stock": True}, projection):
+            yield phone
+
+    async def seed(self, docs: List[Dict[str, Any]]):
+        await _insert_missing(self.collection, docs)
+
+    async def upsert_many(self, docs: List[Dict[str, Any]]) -> Tuple[int, int]:
+        return await _upsert_by_id(self.collection, docs)
+
+    async def reserve(self, phone_id: str, ttl: float, reserved_by: Optional[str] = None,
+                      max_holds: int = 0) -> Dict[str, Any]:
+        return await reservations.reserve(self.collection, phone_id, ttl, reserved_by, self.slots, max_holds)
+
+    async def release(self, phone_id: str, reservation_id: str) -> bool:
+        return await reservations.release(self.collection, phone_id, reservation_id, self.slots)
+
+
+class MongoLeadStore:
+    """``insert_one``/``insert_many`` keep PyMongo's semantics, errors included."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        await self.collection.insert_one(doc)
+
+    async def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = False):
+        await self.collection.insert_many(docs, ordered=ordered)
+
+    async def is_empty(self) -> bool:
+        return await self.collection.count_documents({}, limit=1) == 0
+
+    async def scan(self, created_from: Optional[str] = None, created_to: Optional[str] = None,
+                   after_created_at: Optional[str] = None, after_id: Optional[str] = None,
+                   batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Leads in (created_at, id) order, optionally resuming after a given lead."""
+        query = export_query(created_from, created_to, after_created_at, after_id)
+        cursor = self.collection.find(query, {"_id": 0}).sort(EXPORT_SORT).batch_size(batch_size)
+        async for lead in cursor:
+            yield lead
+
+
+class MongoRollupStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def increment(self, increments: Dict[RollupKey, Dict[str, float]]):
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": f"{dimension}:{key}"},
+                {"$inc": dict(counters), "$setOnInsert": {"dimension": dimension, "key": key}},
+                upsert=True,
+            )
+            for (dimension, key), counters in increments.items()
+        ], ordered=False)
+
+    async def replace_all(self, rows: Dict[RollupKey, Dict[str, float]]):
+        ids = [f"{dimension}:{key}" for dimension, key in rows]
+        if rows:
+            await self.collection.bulk_write([
+                ReplaceOne({"_id": f"{dimension}:{key}"}, {"dimension": dimension, "key": key, **counters}, upsert=True)
+                for (dimension, key), counters in rows.items()
+            ], ordered=False)
+        await self.collection.delete_many({"_id": {"$nin": ids}})
+
+    async def is_empty(self) -> bool:
+        return await self.collection.count_documents({}, limit=1) == 0
+
+    async def find(self, since_day: Optional[str] = None) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {}
+        if since_day is not None:
+            query = {"$or": [{"dimension": {"$ne": "day"}}, {"key": {"$gte": since_day}}]}
+        return await self.collection.find(query, {"_id": 0}).to_list(None)
+
+
+class MongoRepository:
+    backend = "mongo"
+
+    def __init__(self, client, db, catalog_db=None):
+        self.client = client
+        self.db = db
+        self.catalog = MongoCatalogStore(db, catalog_db)
+        self.listings = MongoListingStore(db.phones_for_sale, db.reservation_slots)
+        self.leads = MongoLeadStore(db.leads)
+        self.rollups = MongoRollupStore(db.lead_rollups)
+
+    async def prepare(self):
+        await ensure_indexes(self.db)
+
+    async def warmup(self, connections: int):
+        """Open ``connections`` pooled sockets now instead of on the first requests."""
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(connections)))
+
+    async def verify_query_plans(self):
+        await verify_query_plans(self.db)
+
+    def close(self):
+        self.client.close()
+
+
+# ============ IN-MEMORY ============
+
+def _project(doc: Dict[str, Any], projection: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply an inclusion projection the way Mongo does (``_id`` included unless excluded)."""
+    fields = [field for field, include in projection.items() if include and field != "_id"]
+    projected = {field: doc[field] for field in fields if field in doc}
+    if projection.get("_id", 1) and "_id" in doc:
+        projected["_id"] = doc["_id"]
+    return projected
+
+
+def _strip_id(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: value for field, value in doc.items() if field != "_id"}
+
+
+class MemoryCatalogStore:
+    def __init__(self):
+        self.brands: List[Dict[str, Any]] = []
+        self.models: List[Dict[str, Any]] = []
+        self.questions: List[Dict[str, Any]] = []
+        self.versions: Dict[str, int] = {}
+
+    async def load(self, primary: bool = False):
+        return [dict(b) for b in self.brands], [dict(m) for m in self.models], [dict(q) for q in self.questions]
+
+    async def read_version(self, key: str, primary: bool = False) -> int:
+        return self.versions.get(key, 0)
+
+    async def bump_version(self, key: str) -> int:
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return self.versions[key]
+
+    async def set_version(self, key: str, version: int):
+        self.versions[key] = max(self.versions.get(key, 0), version)
+
+    async def seed(self, brands, models, questions):
+        for stored, docs in ((self.brands, brands), (self.models, models), (self.questions, questions)):
+            ids = {doc["id"] for doc in stored}
+            stored.extend(_strip_id(doc) for doc in docs if doc["id"] not in ids)
+
+    async def upsert_models(self, models: List[Dict[str, Any]]) -> Tuple[int, int]:
+        positions = {model["id"]: index for index, model in enumerate(self.models)}
+        upserted = updated = 0
+        for model in models:
+            position = positions.get(model["id"])
+            if position is None:
+                positions[model["id"]] = len(self.models)
+                self.models.append(_strip_id(model))
+                upserted += 1
+            else:
+                self.models[position].update(_strip_id(model))
+                updated += 1
+        return upserted, updated
+
+    async def model_ids(self, ids: List[str]) -> Set[str]:
+        return set(ids) & {model["id"] for model in self.models}
+
+
+class MemoryListingStore:
+    """Listings indexed by id and by brand; a page sorts only the matching brand's listings."""
+
+    def __init__(self):
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_brand: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # reserved_by -> ids of the listings it has held; expired holds are dropped when checked.
+        self._by_buyer: Dict[str, set] = {}
+
+    async def page(self, order: MongoSort, limit: int, projection: Dict[str, Any], after: Optional[List[Any]] = None,
+                   brand: Optional[str] = None, min_price: Optional[int] = None,
+                   max_price: Optional[int] = None) -> List[Dict[str, Any]]:
+        matches = [
+            doc for doc in self._available(brand, min_price, max_price)
+            if after is None or order.follows(doc, after)
+        ]
+        matches.sort(key=order.key, reverse=order.direction < 0)
+        return [_project(doc, projection) for doc in matches[:limit]]
+
+    async def facets(self, boundaries: Tuple[int, ...], brand: Optional[str] = None,
+                     min_price: Optional[int] = None, max_price: Optional[int] = None) -> Dict[str, Any]:
+        return shape_facets(count_facets(self._available(brand, min_price, max_price), boundaries), boundaries)
+
+    def _available(self, brand: Optional[str], min_price: Optional[int],
+                   max_price: Optional[int]) -> Iterator[Dict[str, Any]]:
+        """In-memory ``listing_query``: in stock, not held, within the brand and price filters."""
+        candidates = self._by_brand.get(brand, {}).values() if brand else self._by_id.values()
+        now = utcnow()
+        return (
+            doc for doc in candidates
+            if doc.get("in_stock")
+            and (min_price is None or doc["price"] >= min_price)
+            and (max_price is None or doc["price"] <= max_price)
+            and not reservations.is_held(doc, now)
+        )
+
+    async def get(self, phone_id: str, projection: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        doc = self._by_id.get(phone_id)
+        return _project(doc, projection) if doc is not None else None
+
+    async def in_stock(self, projection: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        for doc in list(self._by_id.values()):
+            if doc.get("in_stock"):
+                yield _project(doc, projection)
+
+    def _add(self, doc: Dict[str, Any]):
+        stored = dict(doc)
+        stored.setdefault("_id", ObjectId())
+        self._by_id[stored["id"]] = stored
+        self._by_brand.setdefault(stored["brand"], {})[stored["id"]] = stored
+
+    async def seed(self, docs: List[Dict[str, Any]]):
+        for doc in docs:
+            if doc["id"] not in self._by_id:
+                self._add(doc)
+
+    async def upsert_many(self, docs: List[Dict[str, Any]]) -> Tuple[int, int]:
+        upserted = updated = 0
+        for doc in docs:
+            stored = self._by_id.get(doc["id"])
+            if stored is None:
+                self._add(_strip_id(doc))
+                upserted += 1
+                continue
+            # Like $set: reservation fields and _id survive the update.
+            self._by_brand[stored["brand"]].pop(stored["id"], None)
+            stored.update(_strip_id(doc))
+            self._by_brand.setdefault(stored["brand"], {})[stored["id"]] = stored
+            updated += 1
+        return upserted, updated
+
+    async def reserve(self, phone_id: str, ttl: float, reserved_by: Optional[str] = None,
+                      max_holds: int = 0) -> Dict[str, Any]:
+        # No await between the checks and the write, so this is atomic on the event loop.
+        now = utcnow()
+        # Checked first, as the Mongo store claims the buyer's slot before touching the listing.
+        if reserved_by is not None and max_holds > 0 and len(self._held_by(reserved_by, now)) >= max_holds:
+            raise ReservationLimitReached(reserved_by)
+        doc = self._by_id.get(phone_id)
+        if doc is None or not doc.get("in_stock"):
+            raise ReservationNotFound(phone_id)
+        if reservations.is_held(doc, now):
+            raise ReservationConflict(doc["reserved_until"])
+        doc.update(reservation_id=str(uuid.uuid4()), reserved_until=now + timedelta(seconds=ttl), reserved_by=reserved_by)
+        if reserved_by is not None:
+            self._by_buyer.setdefault(reserved_by, set()).add(phone_id)
+        return {field: doc[field] for field in ("id", "reservation_id", "reserved_until", "reserved_by")}
+
+    def _held_by(self, reserved_by: str, now: datetime) -> Set[str]:
+        held = {
+            phone_id for phone_id in self._by_buyer.get(reserved_by, ())
+            if self._by_id[phone_id].get("reserved_by") == reserved_by and reservations.is_held(self._by_id[phone_id], now)
+        }
+        if held:
+            self._by_buyer[reserved_by] = held
+        else:
+            self._by_buyer.pop(reserved_by, None)
+        return held
+
+    async def release(self, phone_id: str, reservation_id: str) -> bool:
+        doc = self._by_id.get(phone_id)
+        if doc is None or doc.get("reservation_id") != reservation_id:
+            return False
+        held = reservations.is_held(doc, utcnow())
+        self._by_buyer.get(doc.get("reserved_by"), set()).discard(phone_id)
+        doc.update(reservation_id=None, reserved_until=None, reserved_by=None)
+        return held
+
+
+class MemoryLeadStore:
+    """Leads indexed by id and kept sorted by (created_at, id) for range scans."""
+
+    def __init__(self):
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._order: List[Tuple[str, str]] = []
+
+    def _add(self, doc: Dict[str, Any]):
+        stored = _strip_id(doc)
+        self._by_id[stored["id"]] = stored
+        insort(self._order, (stored["created_at"], stored["id"]))
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        if doc["id"] in self._by_id:
+            raise DuplicateKeyError(f"Duplicate lead id {doc['id']!r}", DUPLICATE_KEY)
+        self._add(doc)
+
+    async def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = False):
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["id"] in self._by_id:
+                errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": f"Duplicate lead id {doc['id']!r}"})
+                if ordered:
+                    break
+                continue
+            self._add(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+    async def is_empty(self) -> bool:
+        return not self._by_id
+
+    async def scan(self, created_from: Optional[str] = None, created_to: Optional[str] = None,
+                   after_created_at: Optional[str] = None, after_id: Optional[str] = None,
+                   batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        if after_created_at is not None:
+            # Without an id, resume after every lead with that timestamp.
+            position: Tuple[str, str] = (after_created_at, after_id if after_id is not None else _LAST_ID)
+        else:
+            position = (created_from or "", "")
+        inclusive = after_created_at is None
+        while True:
+            # Re-seek for every batch so inserts during a long export cannot shift the scan.
+            start = (bisect_left if inclusive else bisect_right)(self._order, position)
+            batch = self._order[start:start + batch_size]
+            for created_at, lead_id in batch:
+                if created_to is not None and created_at >= created_to:
+                    return
+                if created_from is not None and created_at < created_from:
+                    continue
+                yield dict(self._by_id[lead_id])
+            if len(batch) < batch_size:
+                return
+            position = batch[-1]
+            inclusive = False
+
+
+class MemoryRollupStore:
+    def __init__(self):
+        self._rows: Dict[RollupKey, Dict[str, Any]] = {}
+
+    async def increment(self, increments: Dict[RollupKey, Dict[str, float]]):
+        for (dimension, key), counters in increments.items():
+            row = self._rows.setdefault((dimension, key), {"dimension": dimension, "key": key})
+            for counter, amount in counters.items():
+                row[counter] = row.get(counter, 0) + amount
+
+    async def replace_all(self, rows: Dict[RollupKey, Dict[str, float]]):
+        self._rows = {
+            (dimension, key): {"dimension": dimension, "key": key, **counters}
+            for (dimension, key), counters in rows.items()
+        }
+
+    async def is_empty(self) -> bool:
+        return not self._rows
+
+    async def find(self, since_day: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [
+            dict(row) for (dimension, key), row in self._rows.items()
+            if since_day is None or dimension != "day" or key >= since_day
+        ]
+
+
+class MemoryRepository:
+    backend = "memory"
+
+    def __init__(self):
+        self.catalog = MemoryCatalogStore()
+        self.listings = MemoryListingStore()
+        self.leads = MemoryLeadStore()
+        self.rollups = MemoryRollupStore()
+
+    async def prepare(self):
+        pass
+
+    async def warmup(self, connections: int):
+        pass
+
+    async def verify_query_plans(self):
+        pass
+
+    def close(self):
+        pass
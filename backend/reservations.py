@@ -0,0 +1,137 @@
+"""TTL holds on phones-for-sale listings.
+
+A listing is held while ``reserved_until`` lies in the future. Reserving and
+releasing are single ``find_one_and_update`` calls whose filter carries the
+precondition ("not held", "held by this reservation"), so concurrent buyers
+race inside Mongo and exactly one of them wins. Holds expire on their own:
+an expired ``reserved_until`` simply stops matching ``held_filter``, and no
+sweeper has to clear it.
+
+Every hold names the buyer it is for in ``reserved_by``, and a buyer may have
+at most ``max_holds`` live holds. Counting them and then reserving would let
+concurrent requests from one buyer all pass the count, so each hold first
+claims one of the buyer's numbered slot documents (``<buyer>:<n>`` in
+``reservation_slots``). A claim is an upsert whose filter only matches a free
+slot; a live slot turns the upsert into a duplicate-key error, so two claims
+can never take the same slot. Slots carry the hold's expiry, free themselves
+when it passes, and are deleted on release or when the listing write loses.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+RESERVATION_PROJECTION = {"id": 1, "reservation_id": 1, "reserved_until": 1, "reserved_by": 1}
+
+
+class ReservationConflict(Exception):
+    def __init__(self, reserved_until: Optional[datetime] = None):
+        super().__init__("Listing is already reserved")
+        self.reserved_until = reserved_until
+
+    def retry_after(self, now: Optional[datetime] = None) -> int:
+        if self.reserved_until is None:
+            return 1
+        remaining = (aware(self.reserved_until) - (now or utcnow())).total_seconds()
+        return max(1, int(remaining + 0.999))
+
+
+class ReservationNotFound(Exception):
+    pass
+
+
+class ReservationLimitReached(Exception):
+    def __init__(self, reserved_by: str):
+        super().__init__(f"{reserved_by} already holds the maximum number of listings")
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def aware(value: Optional[datetime]) -> Optional[datetime]:
+    # Motor returns naive UTC datetimes unless the client is tz_aware.
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def available_filter(now: datetime) -> Dict[str, Any]:
+    """Matches listings with no live hold; a missing or null ``reserved_until`` counts as free."""
+    return {"reserved_until": {"$not": {"$gt": now}}}
+
+
+def is_held(listing: Dict[str, Any], now: datetime) -> bool:
+    reserved_until = listing.get("reserved_until")
+    return reserved_until is not None and aware(reserved_until) > now
+
+
+async def claim_slot(slots, reserved_by: str, max_holds: int, reservation_id: str,
+                     reserved_until: datetime, now: datetime):
+    """Take a free hold slot for ``reserved_by`` or raise ``ReservationLimitReached``."""
+    for slot in range(max_holds):
+        try:
+            await slots.update_one(
+                {"_id": f"{reserved_by}:{slot}", "reserved_until": {"$not": {"$gt": now}}},
+                {"$set": {"reservation_id": reservation_id, "reserved_until": reserved_until}},
+                upsert=True,
+            )
+            return
+        except DuplicateKeyError:
+            # The slot exists and is live, so the upsert tried to insert a second one.
+            continue
+    raise ReservationLimitReached(reserved_by)
+
+
+async def free_slot(slots, reservation_id: str):
+    await slots.delete_one({"reservation_id": reservation_id})
+
+
+async def reserve(collection, phone_id: str, ttl: float, reserved_by: Optional[str] = None,
+                  slots=None, max_holds: int = 0) -> Dict[str, Any]:
+    now = utcnow()
+    reservation_id = str(uuid.uuid4())
+    reserved_until = now + timedelta(seconds=ttl)
+    capped = slots is not None and reserved_by is not None and max_holds > 0
+    if capped:
+        await claim_slot(slots, reserved_by, max_holds, reservation_id, reserved_until, now)
+
+    reservation = None
+    try:
+        reservation = await collection.find_one_and_update(
+            {"id": phone_id, "in_stock": True, **available_filter(now)},
+            {"$set": {"reservation_id": reservation_id, "reserved_until": reserved_until, "reserved_by": reserved_by}},
+            RESERVATION_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+    finally:
+        # A slot that outlives a failed delete still frees itself at reserved_until.
+        if reservation is None and capped:
+            await free_slot(slots, reservation_id)
+    if reservation is not None:
+        reservation.pop("_id", None)
+        reservation["reserved_until"] = aware(reservation["reserved_until"])
+        return reservation
+
+    # The write already lost; this read only picks the error to report.
+    current = await collection.find_one({"id": phone_id}, {"_id": 0, "in_stock": 1, "reserved_until": 1})
+    if current is None or not current.get("in_stock"):
+        raise ReservationNotFound(phone_id)
+    raise ReservationConflict(current.get("reserved_until"))
+
+
+async def release(collection, phone_id: str, reservation_id: str, slots=None) -> bool:
+    """Release a hold. Returns False when it had already expired or been released."""
+    result = await collection.find_one_and_update(
+        {"id": phone_id, "reservation_id": reservation_id},
+        {"$set": {"reservation_id": None, "reserved_until": None, "reserved_by": None}},
+        {"reserved_until": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if result is None:
+        return False
+    if slots is not None:
+        await free_slot(slots, reservation_id)
+    return is_held(result, utcnow())
@@ -0,0 +1,119 @@
+"""Incrementally maintained lead counters.
+
+Each written lead is folded into one rollup row per dimension with
+increments (``$inc`` upserts in Mongo), so dashboard stats are a read of a few
+small documents instead of an aggregation over the whole ``leads``
+collection. A flushed batch of leads becomes a single write with one update
+per distinct counter.
+
+Counters can drift if a process dies between writing leads and applying their
+rollup; ``rebuild`` recomputes them by streaming every lead once (it is not
+safe to run while leads are being written, since concurrent increments may be
+overwritten).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Rollup dimension -> lead field it groups by.
+DIMENSIONS = {
+    "total": None,
+    "area": "area",
+    "lead_type": "lead_type",
+    "day": "created_at",
+    "phone_model": "phone_model",
+}
+TOTAL_KEY = "all"
+
+
+def _rollup_keys(lead: Dict[str, Any]) -> Iterable[Tuple[str, str]]:
+    for dimension, field in DIMENSIONS.items():
+        if field is None:
+            yield dimension, TOTAL_KEY
+            continue
+        value = lead.get(field)
+        if not value:
+            continue
+        if dimension == "day":
+            value = value[:10]
+        yield dimension, str(value)
+
+
+def _accumulate(increments: Dict[Tuple[str, str], Dict[str, float]], lead: Dict[str, Any]):
+    price = lead.get("offered_price")
+    for dimension, key in _rollup_keys(lead):
+        counters = increments[(dimension, key)]
+        counters["count"] += 1
+        if price is not None:
+            counters["offered_price_total"] += price
+            counters["offered_price_count"] += 1
+
+
+def _counter_table() -> Dict[Tuple[str, str], Dict[str, float]]:
+    return defaultdict(lambda: defaultdict(int))
+
+
+class LeadRollups:
+    def __init__(self, store, leads):
+        self.store = store
+        self.leads = leads
+        self.applied = 0
+        self.errors = 0
+
+    async def apply(self, leads: List[Dict[str, Any]]):
+        """Fold newly written leads into the counters."""
+        increments = _counter_table()
+        for lead in leads:
+            _accumulate(increments, lead)
+        if not increments:
+            return
+        try:
+            await self.store.increment({key: dict(counters) for key, counters in increments.items()})
+            self.applied += len(leads)
+        except PyMongoError as e:
+            # The leads themselves are written; only the counters fall behind.
+            self.errors += 1
+            logger.error("Failed to update lead rollups for %d leads: %s", len(leads), e)
+
+    async def rebuild(self) -> int:
+        """Recompute every counter from the leads."""
+        totals = _counter_table()
+        async for lead in self.leads.scan():
+            _accumulate(totals, lead)
+        await self.store.replace_all({key: dict(counters) for key, counters in totals.items()})
+        logger.info("Rebuilt %d lead rollups", len(totals))
+        return len(totals)
+
+    async def backfill(self):
+        """Build the counters once for a database that has leads but no rollups yet."""
+        if await self.store.is_empty() and not await self.leads.is_empty():
+            await self.rebuild()
+
+    async def summary(self, days: Optional[int] = None) -> Dict[str, Any]:
+        since = None
+        if days is not None:
+            since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+
+        result: Dict[str, Any] = {"total": 0, "by_area": {}, "by_lead_type": {}, "by_day": {}, "by_phone_model": {}}
+        for doc in await self.store.find(since):
+            dimension, key, count = doc["dimension"], doc["key"], doc.get("count", 0)
+            if dimension == "total":
+                result["total"] = count
+            elif dimension == "phone_model":
+                priced = doc.get("offered_price_count", 0)
+                result["by_phone_model"][key] = {
+                    "count": count,
+                    "average_offered_price": round(doc["offered_price_total"] / priced, 2) if priced else None,
+                }
+            else:
+                result[f"by_{dimension}"][key] = count
+        result["by_day"] = dict(sorted(result["by_day"].items()))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"applied": self.applied, "errors": self.errors}
@@ -0,0 +1,164 @@
+"""In-memory search index over listings and phone models.
+
+An inverted index maps normalised tokens to document keys. The vocabulary is
+kept sorted so prefix matches ("s2" -> "s22", "s23") are a bisect plus a
+short scan, and every token's single-character deletions are indexed so
+typos within one edit ("redmu" -> "redmi", "galxy" -> "galaxy") are found
+without scanning the vocabulary (the symmetric-delete technique).
+
+Documents are added, replaced and removed one at a time, so the index can be
+kept current from change events instead of being rebuilt.
+"""
+import re
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+FUZZY_SCORE = 1.0
+
+# Query tokens shorter than this are only matched exactly or by prefix.
+FUZZY_MIN_LENGTH = 4
+# Cap on vocabulary tokens a single short prefix may expand to.
+MAX_PREFIX_EXPANSIONS = 200
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def _deletes(token: str) -> Set[str]:
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Damerau-Levenshtein distance <= 1."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    # b is one character longer than a.
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._deletes: Dict[str, Set[str]] = {}
+        # key -> (kind, payload, tokens)
+        self._docs: Dict[str, Tuple[str, Dict[str, Any], Tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def upsert(self, key: str, kind: str, text: str, payload: Dict[str, Any]):
+        if key in self._docs:
+            self.remove(key)
+        tokens = tuple(dict.fromkeys(tokenize(text)))
+        self._docs[key] = (kind, payload, tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                insort(self._vocabulary, token)
+                for variant in _deletes(token):
+                    self._deletes.setdefault(variant, set()).add(token)
+            postings.add(key)
+
+    def remove(self, key: str):
+        entry = self._docs.pop(key, None)
+        if entry is None:
+            return
+        for token in entry[2]:
+            postings = self._postings[token]
+            postings.discard(key)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+                for variant in _deletes(token):
+                    tokens = self._deletes[variant]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._deletes[variant]
+
+    def remove_kind(self, kind: str):
+        for key in [key for key, entry in self._docs.items() if entry[0] == kind]:
+            self.remove(key)
+
+    def _prefix_tokens(self, prefix: str) -> Iterable[str]:
+        vocabulary = self._vocabulary
+        i = bisect_left(vocabulary, prefix)
+        end = min(len(vocabulary), i + MAX_PREFIX_EXPANSIONS)
+        while i < end and vocabulary[i].startswith(prefix):
+            yield vocabulary[i]
+            i += 1
+
+    def _fuzzy_tokens(self, token: str) -> Set[str]:
+        candidates: Set[str] = set()
+        # Vocabulary tokens one deletion away, or sharing a deletion (substitution/transposition).
+        for variant in _deletes(token) | {token}:
+            candidates.update(self._deletes.get(variant, ()))
+            if variant in self._postings:
+                candidates.add(variant)
+        return {candidate for candidate in candidates if candidate != token and _within_one_edit(token, candidate)}
+
+    def _match(self, token: str) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+
+        def add(tokens: Iterable[str], score: float):
+            for matched in tokens:
+                for key in self._postings.get(matched, ()):
+                    if scores.get(key, 0.0) < score:
+                        scores[key] = score
+
+        add((token,), EXACT_SCORE)
+        add((t for t in self._prefix_tokens(token) if t != token), PREFIX_SCORE)
+        if len(token) >= FUZZY_MIN_LENGTH:
+            add(self._fuzzy_tokens(token), FUZZY_SCORE)
+        return scores
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Documents matching every query token, best first, as ``(score, kind, payload)``."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        totals: Optional[Dict[str, float]] = None
+        for token in tokens:
+            scores = self._match(token)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {key: totals[key] + score for key, score in scores.items() if key in totals}
+            if not totals:
+                return []
+
+        hits = []
+        for key, score in totals.items():
+            doc_kind, payload, doc_tokens = self._docs[key]
+            if kind is not None and doc_kind != kind:
+                continue
+            # Prefer documents where the query covers more of the name.
+            hits.append((score + len(tokens) / len(doc_tokens), doc_kind, payload, key))
+        hits.sort(key=lambda hit: (-hit[0], hit[3]))
+        return [(round(score, 4), doc_kind, payload) for score, doc_kind, payload, _ in hits[:limit]]
+
+    def stats(self) -> Dict[str, Any]:
+        kinds: Dict[str, int] = {}
+        for kind, _, _ in self._docs.values():
+            kinds[kind] = kinds.get(kind, 0) + 1
+        return {"documents": kinds, "tokens": len(self._vocabulary), "delete_variants": len(self._deletes)}
@@ -0,0 +1,83 @@
+"""Fast JSON path for hot read routes.
+
+Enabled with ``FAST_JSON=1``. Catalog payloads are validated against their
+response model once per catalog version, serialized by pydantic-core, gzipped
+once, and then served as raw bytes; the encoding is negotiated from
+``Accept-Encoding``. Listing routes skip ``response_model`` re-validation of
+documents read from Mongo (they are projected to the model's fields instead)
+and are encoded with orjson when it is installed.
+"""
+import gzip
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+from http_cache import gzip_etag
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Below this size gzip costs more on the client than it saves on the wire.
+GZIP_MIN_SIZE = 512
+GZIP_LEVEL = 6
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def accepts_gzip(request: Request) -> bool:
+    header = request.headers.get("accept-encoding", "")
+    gzip_q = wildcard_q = None
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        token = token.strip().lower()
+        if token == "gzip":
+            gzip_q = q
+        elif token == "*":
+            wildcard_q = q
+    if gzip_q is not None:
+        return gzip_q > 0
+    return bool(wildcard_q)
+
+
+class Payload:
+    """A response body serialized (and compressed) once and served many times.
+
+    ``headers`` must not depend on the request; per-request headers such as
+    pagination links are passed to ``response`` instead.
+    """
+
+    __slots__ = ("body", "gzipped", "headers", "gzip_headers")
+
+    def __init__(self, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.body = body
+        self.gzipped = gzip.compress(body, GZIP_LEVEL) if len(body) >= GZIP_MIN_SIZE else None
+        self.headers = dict(headers or {})
+        self.headers["Vary"] = "Accept-Encoding"
+        self.gzip_headers = {**self.headers, "Content-Encoding": "gzip"}
+        if "ETag" in self.headers:
+            self.gzip_headers["ETag"] = gzip_etag(self.headers["ETag"])
+
+    def response(self, request: Request, headers: Optional[Dict[str, str]] = None) -> Response:
+        if self.gzipped is not None and accepts_gzip(request):
+            body, base = self.gzipped, self.gzip_headers
+        else:
+            body, base = self.body, self.headers
+        return Response(body, media_type="application/json", headers={**base, **headers} if headers else base)
+
+
+def json_response(value: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(dumps(value), media_type="application/json", headers=headers)
@@ -1,26 +1,263 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ConnectionFailure
+from contextlib import asynccontextmanager
 import os
+import hmac
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
 
+from admission import DEFAULT_LIMITS, AdmissionController, build_store, route_limits
+from breaker import CircuitBreaker
+from catalog import CATALOG_META_ID, CatalogCache, CatalogUnavailable
+from coherence import LISTING_HOLDS_ID, CoherenceWatcher
+from facets import DEFAULT_PRICE_BOUNDARIES, price_boundaries
+from fixtures import FIXTURES_VERSION, apply_fixtures
+from pricing import QuoteCache
+from reservations import ReservationConflict, ReservationLimitReached, ReservationNotFound
+from repository import REPOSITORY_BACKENDS, MemoryRepository, MongoRepository
+from rollups import LeadRollups
+from cache import LRUCache
+from http_cache import (
+    cache_headers, etag_matches, fingerprint, gzip_etag, make_etag, matched_etag, not_modified, request_key,
+    set_cache_headers,
+)
+from inventory import IMPORT_FORMATS, ImportReport, import_rows, read_rows
+from leads import LeadBuffer, LeadBufferFull, export_leads
+from listing_index import ListingIndex
+from mongo import client_options, read_preference
+from metrics import MetricsMiddleware, MongoCommandListener, registry as metrics_registry
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, LISTING_SORTS,
+    decode_cursor, encode_cursor, next_cursor_headers, paginate_memory, set_next_cursor,
+)
+from search import SearchIndex
+from serialization import Payload, json_response
+from startup import StartupPhases
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+REPOSITORY_BACKEND = os.environ.get('REPOSITORY_BACKEND', 'mongo')
+if REPOSITORY_BACKEND == 'memory':
+    # Everything in process: no Mongo needed, nothing shared between workers.
+    db = None
+    repository = MemoryRepository()
+elif REPOSITORY_BACKEND == 'mongo':
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener()], **client_options(os.environ))
+    db = client[os.environ['DB_NAME']]
+    
+    # Catalog reads tolerate replication lag, so they can be served by secondaries.
+    catalog_db = client.get_database(
+        os.environ['DB_NAME'],
+        read_preference=read_preference(
+            os.environ.get('MONGO_CATALOG_READ_PREFERENCE', 'secondaryPreferred'),
+            int(os.environ.get('MONGO_CATALOG_MAX_STALENESS_SECONDS', '-1')),
+        ),
+    )
+    repository = MongoRepository(client, db, catalog_db)
+else:
+    raise ValueError(f"Unknown REPOSITORY_BACKEND {REPOSITORY_BACKEND!r}; expected one of {', '.join(REPOSITORY_BACKENDS)}")
+
+catalog = CatalogCache(
+    repository.catalog,
+    ttl=float(os.environ.get('CATALOG_CACHE_TTL', '30')),
+    max_age=float(os.environ.get('CATALOG_CACHE_MAX_AGE', '3600')),
+    timeout=float(os.environ.get('CATALOG_MONGO_TIMEOUT', '2')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('CATALOG_BREAKER_FAILURES', '3')),
+        reset_timeout=float(os.environ.get('CATALOG_BREAKER_RESET', '10')),
+    ),
+)
+
+quote_cache = QuoteCache(
+    maxsize=int(os.environ.get('QUOTE_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('QUOTE_CACHE_TTL', '600')),
+)
+catalog.add_listener(quote_cache.on_catalog_reload)
+
+lead_rollups = LeadRollups(repository.rollups, repository.leads)
+
+lead_buffer = LeadBuffer(
+    repository.leads,
+    mode=os.environ.get('LEAD_WRITE_MODE', 'wait'),
+    max_size=int(os.environ.get('LEAD_BUFFER_SIZE', '10000')),
+    batch_size=int(os.environ.get('LEAD_BATCH_SIZE', '200')),
+    flush_interval=float(os.environ.get('LEAD_FLUSH_INTERVAL', '0.05')),
+    put_timeout=float(os.environ.get('LEAD_PUT_TIMEOUT', '1.0')),
+    on_written=lead_rollups.apply,
+)
+
+# phone_id -> ETag of the last served version, so If-None-Match can be
+# answered without reading Mongo. The TTL bounds staleness after writes made
+# by other processes.
+listing_etags = LRUCache(
+    maxsize=int(os.environ.get('LISTING_ETAG_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('LISTING_ETAG_CACHE_TTL', '30')),
+)
+
+# Opt-in fast serialization: pre-encoded, pre-gzipped catalog payloads and
+# listing responses that skip response_model re-validation.
+FAST_JSON = os.environ.get('FAST_JSON', '').lower() in ('1', 'true', 'yes')
+catalog_payloads = LRUCache(maxsize=int(os.environ.get('CATALOG_PAYLOAD_CACHE_SIZE', '512')))
+catalog.add_listener(lambda previous, current: catalog_payloads.clear())
+
+# Propagates writes made by other workers to this worker's caches. The
+# in-memory backend has no other workers to hear from.
+coherence = CoherenceWatcher(
+    db,
+    mode=os.environ.get('COHERENCE_MODE', 'auto') if db is not None else 'off',
+    poll_interval=float(os.environ.get('COHERENCE_POLL_INTERVAL', '2')),
+)
+coherence.on_change("catalog", lambda events: catalog.refresh())
+
+def invalidate_listing_caches(events):
+    """Drop per-listing caches for the changed listings, or all of them if unknown."""
+    if events is None or any(event.get("fullDocument") is None for event in events):
+        listing_etags.clear()
+        return
+    for event in events:
+        listing_etags.pop(event["fullDocument"].get("id"))
+
+coherence.on_change("phones_for_sale", invalidate_listing_caches)
 
-app = FastAPI()
+# (brand, min_price, max_price) -> (facet counts, ETag). Reservations change
+# the counts too, so the TTL is short; local writes clear it right away.
+listing_facets = LRUCache(
+    maxsize=int(os.environ.get('LISTING_FACET_CACHE_SIZE', '1024')),
+    ttl=float(os.environ.get('LISTING_FACET_CACHE_TTL', '15')),
+)
+PRICE_FACET_BOUNDARIES = price_boundaries(
+    os.environ.get('PRICE_FACET_BOUNDARIES', ','.join(map(str, DEFAULT_PRICE_BOUNDARIES)))
+)
+coherence.on_change("phones_for_sale", lambda events: listing_facets.clear())
+
+# Prefix and typo-tolerant search over in-stock listings and phone models.
+search_index = SearchIndex()
+
+def index_models(previous, snapshot):
+    brand_names = {brand["id"]: brand["name"] for brand in snapshot.brands}
+    search_index.remove_kind("model")
+    for model in snapshot.models:
+        brand_name = brand_names.get(model["brand_id"], "")
+        search_index.upsert(f"model:{model['id']}", "model", f"{brand_name} {model['name']}", model)
+
+def index_listing(phone):
+    key = f"listing:{phone['id']}"
+    if not phone.get("in_stock"):
+        search_index.remove(key)
+        return
+    text = " ".join([phone["brand"], phone["model"], phone["condition"], *phone.get("specs", {}).values()])
+    search_index.upsert(key, "listing", text, {field: phone[field] for field in PhoneForSale.model_fields if field in phone})
+
+async def rebuild_listing_search():
+    search_index.remove_kind("listing")
+    async for phone in repository.listings.in_stock(LISTING_PROJECTION):
+        index_listing(phone)
+
+async def update_listing_search(events):
+    """Apply listing change events to the search index; rebuild when they are not enough."""
+    if events is None or any(event.get("fullDocument") is None for event in events):
+        await rebuild_listing_search()
+        return
+    for event in events:
+        index_listing(event["fullDocument"])
+
+catalog.add_listener(index_models)
+coherence.on_change("phones_for_sale", update_listing_search)
+
+# Per-client rate limits and per-worker concurrency caps for write and compute routes.
+admission = AdmissionController(
+    build_store(os.environ.get('RATE_LIMIT_STORE', 'memory'), db, int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', '100000'))),
+    limits={route: route_limits(route, os.environ) for route in DEFAULT_LIMITS},
+    trusted_proxies=int(os.environ['RATE_LIMIT_TRUSTED_PROXIES']) if os.environ.get('RATE_LIMIT_TRUSTED_PROXIES') else None,
+)
+
+RESERVATION_TTL = float(os.environ.get('RESERVATION_TTL', '300'))
+RESERVATION_MAX_TTL = float(os.environ.get('RESERVATION_MAX_TTL', '600'))
+RESERVATION_MAX_PER_BUYER = int(os.environ.get('RESERVATION_MAX_PER_BUYER', '2'))
+
+PRICE_BATCH_MAX_SIZE = int(os.environ.get('PRICE_BATCH_MAX_SIZE', '5000'))
+
+# Per-phase startup timings; the worker reports ready once all of them are done.
+startup = StartupPhases()
+
+
+def collect_cache_metrics():
+    catalog_stats = catalog.stats()
+    quote_stats = quote_cache.stats()
+    lead_stats = lead_buffer.stats()
+    yield "catalog_cache_lookups_total", "counter", "Catalog cache lookups by result.", [
+        ({"result": "hit"}, catalog_stats["hits"]),
+        ({"result": "miss"}, catalog_stats["misses"]),
+    ]
+    yield "catalog_cache_reloads_total", "counter", "Catalog reloads from Mongo.", [({}, catalog_stats["reloads"])]
+    yield "catalog_version", "gauge", "Catalog version currently served.", [({}, catalog_stats["version"])]
+    yield "catalog_stale_serves_total", "counter", "Catalog reads served from a snapshot that could not be revalidated.", [
+        ({}, catalog_stats["stale_serves"]),
+    ]
+    yield "catalog_breaker_open", "gauge", "1 while the catalog circuit breaker is open.", [
+        ({}, int(catalog_stats["breaker"]["state"] == "open")),
+    ]
+    yield "quote_cache_lookups_total", "counter", "Quote cache lookups by result.", [
+        ({"result": "hit"}, quote_stats["hits"]),
+        ({"result": "miss"}, quote_stats["misses"]),
+    ]
+    yield "quote_cache_evictions_total", "counter", "Quote cache LRU evictions.", [({}, quote_stats["evictions"])]
+    yield "quote_cache_entries", "gauge", "Quotes currently cached.", [({}, quote_stats["size"])]
+    yield "lead_buffer_queue_depth", "gauge", "Leads waiting to be flushed.", [({}, lead_stats["queue_depth"])]
+    yield "lead_buffer_leads_total", "counter", "Leads by write outcome.", [
+        ({"outcome": "written"}, lead_stats["written"]),
+        ({"outcome": "failed"}, lead_stats["failed"]),
+        ({"outcome": "rejected"}, lead_stats["rejected"]),
+    ]
+    yield "lead_buffer_last_flush_seconds", "gauge", "Duration of the last lead flush.", [
+        ({}, lead_stats["last_flush_seconds"]),
+    ]
+    admission_stats = admission.stats()["routes"]
+    yield "admission_requests_total", "counter", "Guarded requests by admission outcome.", [
+        ({"route": route, "outcome": outcome}, stats[outcome])
+        for route, stats in admission_stats.items()
+        for outcome in ("admitted", "throttled", "shed")
+    ]
+    yield "admission_in_flight", "gauge", "Guarded requests currently being handled.", [
+        ({"route": route}, stats["in_flight"]) for route, stats in admission_stats.items()
+    ]
+    startup_stats = startup.stats()
+    yield "startup_phase_seconds", "gauge", "Duration of each startup phase.", [
+        ({"phase": phase}, seconds) for phase, seconds in startup_stats["phases"].items()
+    ]
+    yield "ready", "gauge", "1 once startup has finished and until shutdown begins.", [({}, int(startup_stats["ready"]))]
+
+metrics_registry.add_collector(collect_cache_metrics)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_up()
+    try:
+        yield
+    finally:
+        await shut_down()
+
+app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
+@app.exception_handler(CatalogUnavailable)
+@app.exception_handler(ConnectionFailure)
+async def database_unavailable(request: Request, exc: Exception):
+    """Fail fast with a retryable 503 instead of a 500 while Mongo is unreachable."""
+    logger.warning("Database unavailable for %s: %r", request.url.path, exc)
+    return JSONResponse(status_code=503, content={"detail": "Service temporarily unavailable"}, headers={"Retry-After": "5"})
+
 
 # ============ MODELS ============
 
@@ -38,6 +275,15 @@ class PhoneModel(BaseModel):
     base_price: int
     image: str
 
+class PhoneModelUpdate(BaseModel):
+    """A partial phone model row for imports, e.g. just ``id`` and ``base_price``."""
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    brand_id: Optional[str] = None
+    name: Optional[str] = None
+    base_price: Optional[int] = None
+    image: Optional[str] = None
+
 class Question(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -47,10 +293,23 @@ class Question(BaseModel):
     is_blocking: bool
     yes_deducts: bool
 
+class CatalogBootstrap(BaseModel):
+    version: int
+    fingerprint: str
+    brands: List[Brand]
+    models: Dict[str, List[PhoneModel]]
+    questions: Dict[str, List[Question]]
+
 class PriceCalculationRequest(BaseModel):
     model_id: str
     answers: Dict[str, bool]
 
+class BatchPriceCalculationRequest(BaseModel):
+    """Either a list of independent requests, or one model with many answer sets."""
+    requests: Optional[List[PriceCalculationRequest]] = None
+    model_id: Optional[str] = None
+    answer_sets: Optional[List[Dict[str, bool]]] = None
+
 class PriceCalculationResponse(BaseModel):
     model_config = ConfigDict(extra="ignore")
     base_price: int
@@ -59,6 +318,24 @@ class PriceCalculationResponse(BaseModel):
     is_blocked: bool
     block_reason: Optional[str] = None
 
+class QuestionSensitivity(BaseModel):
+    question_id: str
+    answer: bool
+    final_price: int
+    delta: int
+    is_blocked: bool
+
+class CategorySubtotal(BaseModel):
+    category: str
+    deduction_percentage: float
+    deduction_amount: int
+    deductions: int
+
+class PriceSensitivityResponse(BaseModel):
+    quote: PriceCalculationResponse
+    flips: List[QuestionSensitivity]
+    categories: List[CategorySubtotal]
+
 class PhoneForSale(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -71,6 +348,42 @@ class PhoneForSale(BaseModel):
     specs: Dict[str, str]
     in_stock: bool
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBucketCount(BaseModel):
+    min: int
+    max: Optional[int] = None
+    count: int
+
+class ListingFacets(BaseModel):
+    total: int
+    brands: List[FacetCount]
+    conditions: List[FacetCount]
+    ram: List[FacetCount]
+    storage: List[FacetCount]
+    price: List[PriceBucketCount]
+
+class ReservationRequest(BaseModel):
+    # The buyer the hold is for (e.g. their phone number); live holds are capped per buyer.
+    reserved_by: str = Field(..., min_length=1, max_length=100)
+    ttl_seconds: Optional[float] = Field(None, gt=0)
+
+class Reservation(BaseModel):
+    reservation_id: str
+    phone_id: str
+    reserved_until: datetime
+    reserved_by: Optional[str] = None
+
+class SearchHit(BaseModel):
+    type: str
+    id: str
+    title: str
+    score: float
+    listing: Optional[PhoneForSale] = None
+    model: Optional[PhoneModel] = None
+
 class LeadSubmission(BaseModel):
     name: str
     phone: str
@@ -91,99 +404,354 @@ class LeadResponse(BaseModel):
     created_at: str
 
 
+BRANDS_ADAPTER = TypeAdapter(List[Brand])
+MODELS_ADAPTER = TypeAdapter(List[PhoneModel])
+QUESTIONS_ADAPTER = TypeAdapter(List[Question])
+BOOTSTRAP_ADAPTER = TypeAdapter(CatalogBootstrap)
+
+# Only the PhoneForSale fields, so the fast path can skip response_model filtering.
+LISTING_PROJECTION = {"_id": 0, **{field: 1 for field in PhoneForSale.model_fields}}
+LISTING_INDEX_PROJECTION = {**LISTING_PROJECTION, "_id": 1, "reserved_until": 1}
+
+# Opt-in array-backed listing index: listing pages and price ranges are
+# answered in process, without a Mongo round-trip per slider drag.
+LISTING_INDEX = os.environ.get('LISTING_INDEX', '').lower() in ('1', 'true', 'yes')
+listing_index = ListingIndex(PhoneForSale.model_fields)
+
+async def rebuild_listing_index():
+    if LISTING_INDEX:
+        listing_index.replace([phone async for phone in repository.listings.in_stock(LISTING_INDEX_PROJECTION)])
+
+async def update_listing_index(events):
+    if not listing_index.loaded:
+        return
+    if events is None or any(event.get("fullDocument") is None for event in events):
+        await rebuild_listing_index()
+        return
+    for event in events:
+        listing_index.upsert(event["fullDocument"])
+
+coherence.on_change("phones_for_sale", update_listing_index)
+coherence.on_change(LISTING_HOLDS_ID, update_listing_index)
+coherence.on_change(LISTING_HOLDS_ID, lambda events: listing_facets.clear())
+
+async def announce_hold_change():
+    """Let poll-mode workers see a reserve or release; change streams deliver it on their own."""
+    if coherence.active_mode == "poll":
+        await repository.catalog.bump_version(LISTING_HOLDS_ID)
+
+
+# ============ ADMIN ============
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard admin routes with ADMIN_TOKEN; with no token configured they are closed to everyone."""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token or x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
 # ============ ROUTES ============
 
 @api_router.get("/")
 async def root():
     return {"message": "PhoneXchange Patna API"}
 
+@api_router.get("/ready")
+async def readiness():
+    """200 once startup warmup is done; 503 before that and while shutting down."""
+    stats = startup.stats()
+    if not stats["ready"]:
+        return JSONResponse(status_code=503, content=stats, headers={"Retry-After": "1"})
+    return stats
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+BRAND_SORTS = {
+    "name": lambda brand: (brand["name"].lower(), brand["id"]),
+    "id": lambda brand: (brand["id"],),
+}
+
+MODEL_SORTS = {
+    "name": (lambda model: (model["name"].lower(), model["id"]), False),
+    "price_asc": (lambda model: (model["base_price"], model["id"]), False),
+    "price_desc": (lambda model: (model["base_price"], model["id"]), True),
+}
+
+def catalog_response(request: Request, response: Response, snapshot, route: str, adapter: TypeAdapter, build):
+    """Serve a catalog payload with ETag revalidation and, on the fast path, cached gzip bytes.
+
+    ``build()`` returns ``(value, next_cursor)`` and only runs on a cache miss.
+    """
+    etag = make_etag(snapshot.fingerprint, request_key(request))
+    if FAST_JSON:
+        # Either encoding may be what the client cached; answer with the one it named.
+        matched = matched_etag(request, etag, gzip_etag(etag))
+        if matched is not None:
+            return not_modified(matched, route, vary="Accept-Encoding")
+        cached = catalog_payloads.get(etag)
+        if cached is None:
+            items, next_cursor = build()
+            body = adapter.dump_json(adapter.validate_python(items))
+            # The Link header holds the requester's host, so it is added per request.
+            cached = (Payload(body, cache_headers(etag, route)), next_cursor)
+            catalog_payloads.set(etag, cached)
+        payload, next_cursor = cached
+        return payload.response(request, next_cursor_headers(request, next_cursor))
+    
+    if etag_matches(request, etag):
+        return not_modified(etag, route)
+    
+    items, next_cursor = build()
+    set_next_cursor(request, response, next_cursor)
+    set_cache_headers(response, etag, route)
+    return items
+
 @api_router.get("/brands", response_model=List[Brand])
-async def get_brands():
-    brands = await db.brands.find({}, {"_id": 0}).to_list(100)
-    return brands
+async def get_brands(
+    request: Request,
+    response: Response,
+    sort: str = Query("name", enum=list(BRAND_SORTS)),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    snapshot = await catalog.get()
+    return catalog_response(
+        request, response, snapshot, "brands", BRANDS_ADAPTER,
+        lambda: paginate_memory(snapshot.brands, sort, BRAND_SORTS[sort], limit, cursor),
+    )
 
 @api_router.get("/models/{brand_id}", response_model=List[PhoneModel])
-async def get_models(brand_id: str):
-    models = await db.phone_models.find({"brand_id": brand_id}, {"_id": 0}).to_list(100)
-    return models
+async def get_models(
+    brand_id: str,
+    request: Request,
+    response: Response,
+    sort: str = Query("name", enum=list(MODEL_SORTS)),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    snapshot = await catalog.get()
+    sort_key, reverse = MODEL_SORTS[sort]
+    return catalog_response(
+        request, response, snapshot, "models", MODELS_ADAPTER,
+        lambda: paginate_memory(
+            snapshot.models_by_brand.get(brand_id, []), sort, sort_key, limit, cursor, reverse=reverse,
+        ),
+    )
 
 @api_router.get("/questions", response_model=List[Question])
-async def get_questions():
-    questions = await db.questions.find({}, {"_id": 0}).to_list(100)
-    return questions
+async def get_questions(request: Request, response: Response):
+    snapshot = await catalog.get()
+    return catalog_response(
+        request, response, snapshot, "questions", QUESTIONS_ADAPTER,
+        lambda: (snapshot.questions, None),
+    )
+
+def build_bootstrap(snapshot):
+    name_key = BRAND_SORTS["name"]
+    model_key, _ = MODEL_SORTS["name"]
+    return {
+        "version": snapshot.version,
+        "fingerprint": snapshot.fingerprint,
+        "brands": sorted(snapshot.brands, key=name_key),
+        "models": {
+            brand_id: sorted(models, key=model_key)
+            for brand_id, models in snapshot.models_by_brand.items()
+        },
+        "questions": snapshot.questions_by_category,
+    }
 
-@api_router.post("/calculate-price", response_model=PriceCalculationResponse)
+@api_router.get("/bootstrap", response_model=CatalogBootstrap)
+async def get_bootstrap(request: Request, response: Response):
+    """Everything the sell flow needs before the first interaction, in one round-trip."""
+    snapshot = await catalog.get()
+    return catalog_response(
+        request, response, snapshot, "bootstrap", BOOTSTRAP_ADAPTER,
+        lambda: (build_bootstrap(snapshot), None),
+    )
+
+@api_router.post("/calculate-price", response_model=PriceCalculationResponse, dependencies=[Depends(admission.guard("calculate_price"))])
 async def calculate_price(request: PriceCalculationRequest):
-    phone_model = await db.phone_models.find_one({"id": request.model_id}, {"_id": 0})
+    snapshot = await catalog.get()
+    phone_model = snapshot.models_by_id.get(request.model_id)
     if not phone_model:
         raise HTTPException(status_code=404, detail="Phone model not found")
     
-    base_price = phone_model["base_price"]
-    questions = await db.questions.find({}, {"_id": 0}).to_list(100)
+    mask = snapshot.pricing.answer_mask(request.answers)
+    response = quote_cache.get(request.model_id, mask)
+    if response is None:
+        quote = snapshot.pricing.quote_mask(phone_model["base_price"], mask)
+        response = PriceCalculationResponse(**quote)
+        quote_cache.set(request.model_id, mask, response)
+    return response
+
+@api_router.post("/calculate-price/batch", response_model=List[PriceCalculationResponse], dependencies=[Depends(admission.guard("calculate_price_batch"))])
+async def calculate_price_batch(request: BatchPriceCalculationRequest):
+    if request.requests is not None:
+        if request.model_id is not None or request.answer_sets is not None:
+            raise HTTPException(status_code=422, detail="Send either requests or model_id with answer_sets, not both")
+        model_ids = [item.model_id for item in request.requests]
+        answer_sets = [item.answers for item in request.requests]
+    elif request.model_id is not None and request.answer_sets is not None:
+        model_ids = [request.model_id] * len(request.answer_sets)
+        answer_sets = request.answer_sets
+    else:
+        raise HTTPException(status_code=422, detail="Send either requests or model_id with answer_sets")
+    
+    if len(answer_sets) > PRICE_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {PRICE_BATCH_MAX_SIZE}")
     
-    deductions = []
-    total_deduction_percentage = 0
-    is_blocked = False
-    block_reason = None
+    snapshot = await catalog.get()
+    base_prices = []
+    for model_id in model_ids:
+        phone_model = snapshot.models_by_id.get(model_id)
+        if not phone_model:
+            raise HTTPException(status_code=404, detail=f"Phone model not found: {model_id}")
+        base_prices.append(phone_model["base_price"])
     
-    for question in questions:
-        answer = request.answers.get(question["id"], False)
-        
-        if question["is_blocking"]:
-            if (question["yes_deducts"] and answer) or (not question["yes_deducts"] and not answer):
-                is_blocked = True
-                block_reason = question["text"]
-                break
-        
-        if question["yes_deducts"] and answer:
-            deductions.append({
-                "question": question["text"],
-                "percentage": question["deduction_percentage"]
-            })
-            total_deduction_percentage += question["deduction_percentage"]
-        elif not question["yes_deducts"] and not answer:
-            deductions.append({
-                "question": question["text"],
-                "percentage": question["deduction_percentage"]
-            })
-            total_deduction_percentage += question["deduction_percentage"]
+    quotes = snapshot.pricing.quote_many(base_prices, answer_sets)
+    return [PriceCalculationResponse(**quote) for quote in quotes]
+
+@api_router.post("/calculate-price/sensitivity", response_model=PriceSensitivityResponse, dependencies=[Depends(admission.guard("calculate_price_sensitivity"))])
+async def calculate_price_sensitivity(request: PriceCalculationRequest):
+    """Current quote plus the price after flipping each answer, so the form can update without re-quoting."""
+    snapshot = await catalog.get()
+    phone_model = snapshot.models_by_id.get(request.model_id)
+    if not phone_model:
+        raise HTTPException(status_code=404, detail="Phone model not found")
+    return snapshot.pricing.sensitivity(phone_model["base_price"], request.answers)
+
+@api_router.get("/phones-for-sale", response_model=List[PhoneForSale])
+async def get_phones_for_sale(
+    request: Request,
+    response: Response,
+    brand: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    sort: str = Query("newest", enum=list(LISTING_SORTS)),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    order = LISTING_SORTS[sort]
+    after = decode_cursor(cursor, sort) if cursor is not None else None
     
-    if is_blocked:
-        final_price = 0
+    if listing_index.loaded:
+        phones, next_key = listing_index.page(order, limit, after, brand, min_price, max_price)
+        next_cursor = encode_cursor(sort, next_key) if next_key is not None else None
     else:
-        final_price = int(base_price * (1 - total_deduction_percentage / 100))
+        phones, next_cursor = await read_listing_page(order, sort, limit, after, brand, min_price, max_price)
     
-    return PriceCalculationResponse(
-        base_price=base_price,
-        final_price=final_price,
-        deductions=deductions,
-        is_blocked=is_blocked,
-        block_reason=block_reason
+    if FAST_JSON:
+        return json_response(phones, next_cursor_headers(request, next_cursor))
+    set_next_cursor(request, response, next_cursor)
+    return phones
+
+async def read_listing_page(order, sort: str, limit: int, after, brand, min_price, max_price):
+    # Read one extra document to learn whether there is a next page.
+    projection = dict(LISTING_PROJECTION)
+    if order.field == "_id":
+        projection.pop("_id")
+    page = await repository.listings.page(
+        order, limit + 1, projection, after=after, brand=brand, min_price=min_price, max_price=max_price,
     )
+    next_cursor = encode_cursor(sort, order.key(page[limit - 1])) if len(page) > limit else None
+    phones = page[:limit]
+    for phone in phones:
+        phone.pop("_id", None)
+    return phones, next_cursor
 
-@api_router.get("/phones-for-sale", response_model=List[PhoneForSale])
-async def get_phones_for_sale(brand: Optional[str] = None, min_price: Optional[int] = None, max_price: Optional[int] = None):
-    query = {"in_stock": True}
-    if brand:
-        query["brand"] = brand
-    if min_price is not None or max_price is not None:
-        query["price"] = {}
-        if min_price is not None:
-            query["price"]["$gte"] = min_price
-        if max_price is not None:
-            query["price"]["$lte"] = max_price
+@api_router.get("/phones-for-sale/facets", response_model=ListingFacets)
+async def get_phone_facets(
+    request: Request,
+    response: Response,
+    brand: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+):
+    """Filter-chip counts for the listings matching the same filters as /phones-for-sale."""
+    key = (brand, min_price, max_price)
+    cached = listing_facets.get(key)
+    if cached is None:
+        facets = await repository.listings.facets(PRICE_FACET_BOUNDARIES, brand, min_price, max_price)
+        cached = (facets, make_etag(fingerprint(facets)))
+        listing_facets.set(key, cached)
+    facets, etag = cached
     
-    phones = await db.phones_for_sale.find(query, {"_id": 0}).to_list(100)
-    return phones
+    if etag_matches(request, etag):
+        return not_modified(etag, "listing_facets")
+    if FAST_JSON:
+        return json_response(facets, cache_headers(etag, "listing_facets"))
+    set_cache_headers(response, etag, "listing_facets")
+    return facets
 
 @api_router.get("/phones-for-sale/{phone_id}", response_model=PhoneForSale)
-async def get_phone_detail(phone_id: str):
-    phone = await db.phones_for_sale.find_one({"id": phone_id}, {"_id": 0})
+async def get_phone_detail(phone_id: str, request: Request, response: Response):
+    cached_etag = listing_etags.get(phone_id)
+    if cached_etag is not None and etag_matches(request, cached_etag):
+        return not_modified(cached_etag, "phone_detail")
+    
+    phone = await repository.listings.get(phone_id, LISTING_PROJECTION)
     if not phone:
+        listing_etags.pop(phone_id)
         raise HTTPException(status_code=404, detail="Phone not found")
+    
+    etag = make_etag(fingerprint(phone))
+    listing_etags.set(phone_id, etag)
+    if etag_matches(request, etag):
+        return not_modified(etag, "phone_detail")
+    if FAST_JSON:
+        return json_response(phone, cache_headers(etag, "phone_detail"))
+    set_cache_headers(response, etag, "phone_detail")
     return phone
 
-@api_router.post("/submit-lead", response_model=LeadResponse)
+@api_router.post("/phones-for-sale/{phone_id}/reservation", response_model=Reservation, dependencies=[Depends(admission.guard("reserve_phone"))])
+async def reserve_phone(phone_id: str, request: ReservationRequest):
+    """Hold a listing for ttl_seconds; it is hidden from listings until released or expired."""
+    ttl = min(request.ttl_seconds or RESERVATION_TTL, RESERVATION_MAX_TTL)
+    try:
+        held = await repository.listings.reserve(phone_id, ttl, request.reserved_by, RESERVATION_MAX_PER_BUYER)
+    except ReservationLimitReached:
+        raise HTTPException(status_code=429, detail="Too many active reservations")
+    except ReservationNotFound:
+        raise HTTPException(status_code=404, detail="Phone not found")
+    except ReservationConflict as e:
+        raise HTTPException(status_code=409, detail="Phone is reserved", headers={"Retry-After": str(e.retry_after())})
+    listing_index.hold(phone_id, held["reserved_until"])
+    listing_facets.clear()
+    await announce_hold_change()
+    return Reservation(
+        reservation_id=held["reservation_id"],
+        phone_id=phone_id,
+        reserved_until=held["reserved_until"],
+        reserved_by=held.get("reserved_by"),
+    )
+
+@api_router.delete("/phones-for-sale/{phone_id}/reservation/{reservation_id}", status_code=204)
+async def release_phone(phone_id: str, reservation_id: str):
+    if not await repository.listings.release(phone_id, reservation_id):
+        raise HTTPException(status_code=404, detail="Reservation not found or expired")
+    listing_index.hold(phone_id, None)
+    listing_facets.clear()
+    await announce_hold_change()
+    return Response(status_code=204)
+
+@api_router.get("/search", response_model=List[SearchHit])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    type: Optional[str] = Query(None, enum=["listing", "model"]),
+    limit: int = Query(20, ge=1, le=100),
+):
+    hits = []
+    for score, kind, payload in search_index.search(q, limit=limit, kind=type):
+        if kind == "listing":
+            title = f"{payload['brand']} {payload['model']}"
+            hits.append(SearchHit(type=kind, id=payload["id"], title=title, score=score, listing=payload))
+        else:
+            hits.append(SearchHit(type=kind, id=payload["id"], title=payload["name"], score=score, model=payload))
+    return hits
+
+@api_router.post("/submit-lead", response_model=LeadResponse, dependencies=[Depends(admission.guard("submit_lead"))])
 async def submit_lead(lead: LeadSubmission):
     lead_id = str(uuid.uuid4())
     created_at = datetime.now(timezone.utc).isoformat()
@@ -201,7 +769,10 @@ async def submit_lead(lead: LeadSubmission):
         "created_at": created_at
     }
     
-    await db.leads.insert_one(lead_doc)
+    try:
+        await lead_buffer.submit(lead_doc)
+    except LeadBufferFull:
+        raise HTTPException(status_code=503, detail="Too many leads right now, please retry", headers={"Retry-After": "1"})
     
     return LeadResponse(
         id=lead_id,
@@ -212,6 +783,120 @@ async def submit_lead(lead: LeadSubmission):
         created_at=created_at
     )
 
+@api_router.post("/admin/catalog/refresh", dependencies=[Depends(require_admin)])
+async def refresh_catalog():
+    """Bump the catalog version so every worker reloads, and reload this one now."""
+    await repository.catalog.bump_version(CATALOG_META_ID)
+    await catalog.refresh(primary=True)
+    return catalog.stats()
+
+@api_router.get("/admin/catalog/stats", dependencies=[Depends(require_admin)])
+async def get_catalog_stats():
+    return catalog.stats()
+
+@api_router.get("/admin/quote-cache/stats", dependencies=[Depends(require_admin)])
+async def get_quote_cache_stats():
+    return quote_cache.stats()
+
+@api_router.get("/admin/lead-buffer/stats", dependencies=[Depends(require_admin)])
+async def get_lead_buffer_stats():
+    return {**lead_buffer.stats(), "rollups": lead_rollups.stats()}
+
+@api_router.get("/admin/coherence/stats", dependencies=[Depends(require_admin)])
+async def get_coherence_stats():
+    return coherence.stats()
+
+@api_router.get("/admin/admission/stats", dependencies=[Depends(require_admin)])
+async def get_admission_stats():
+    return admission.stats()
+
+@api_router.get("/admin/listing-index/stats", dependencies=[Depends(require_admin)])
+async def get_listing_index_stats():
+    return {"enabled": LISTING_INDEX, **listing_index.stats()}
+
+@api_router.get("/admin/search/stats", dependencies=[Depends(require_admin)])
+async def get_search_stats():
+    return search_index.stats()
+
+@api_router.get("/leads/stats", dependencies=[Depends(require_admin)])
+async def get_lead_stats(days: Optional[int] = Query(30, ge=1, le=3660)):
+    """Lead counts per area, type, day and phone model, read from the rollups."""
+    return await lead_rollups.summary(days)
+
+@api_router.post("/admin/leads/rollups/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_lead_rollups():
+    """Recompute the rollups from the leads collection; run while lead intake is quiet."""
+    return {"rollups": await lead_rollups.rebuild()}
+
+def to_utc_iso(value: Optional[datetime]) -> Optional[str]:
+    """Match the format submit_lead stores created_at in."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+@api_router.get("/leads/export", dependencies=[Depends(require_admin)])
+async def export_leads_route(
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    after_created_at: Optional[str] = Query(None, description="created_at of the last lead already received"),
+    after_id: Optional[str] = Query(None, description="id of the last lead already received"),
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
+    leads = repository.leads.scan(
+        to_utc_iso(created_from), to_utc_iso(created_to), after_created_at, after_id, batch_size=batch_size,
+    )
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"leads-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{format}"
+    return StreamingResponse(
+        export_leads(leads, format, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+IMPORT_KINDS = {
+    "listings": (PhoneForSale, repository.listings.upsert_many),
+    "models": (PhoneModel, repository.catalog.upsert_models),
+}
+
+# Kinds whose import rows may update only some fields of a stored record.
+PARTIAL_IMPORTS = {
+    "models": (PhoneModelUpdate, repository.catalog.model_ids),
+}
+
+@api_router.post("/admin/inventory/import", dependencies=[Depends(require_admin)])
+async def import_inventory(
+    request: Request,
+    kind: str = Query(..., enum=list(IMPORT_KINDS)),
+    format: str = Query("ndjson", enum=list(IMPORT_FORMATS)),
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
+    """Upsert listings or phone models from a CSV/NDJSON request body, streamed batch by batch."""
+    if kind not in IMPORT_KINDS or format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=422, detail="Unknown import kind or format")
+    model, upsert = IMPORT_KINDS[kind]
+    report = ImportReport(kind, format)
+    await import_rows(
+        read_rows(request.stream(), format), model, upsert, report, batch_size=batch_size,
+        on_progress=lambda r: logger.info("Inventory import (%s): %d rows, %d applied, %d failed",
+                                          kind, r.rows, r.applied, r.failed),
+        partial=PARTIAL_IMPORTS.get(kind),
+    )
+    
+    # Other workers pick the change up from the version bump; this one refreshes now.
+    if report.applied and kind == "models":
+        await repository.catalog.bump_version(CATALOG_META_ID)
+        await catalog.refresh(primary=True)
+    elif report.applied:
+        await repository.catalog.bump_version("phones_for_sale")
+        listing_etags.clear()
+        listing_facets.clear()
+        await rebuild_listing_search()
+        await rebuild_listing_index()
+    return report.as_dict()
+
 
 app.include_router(api_router)
 
@@ -221,176 +906,63 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# ============ STARTUP ============
 
+async def warm_connection_pool():
+    await repository.warmup(int(os.environ.get('MONGO_WARMUP_CONNECTIONS', '10')))
 
-# ============ SEED DATA ============
-@app.on_event("startup")
-async def seed_database():
-    """Seed initial data if collections are empty"""
-    
-    # Check if already seeded
-    if await db.brands.count_documents({}) > 0:
-        logger.info("Database already seeded")
+async def seed_fixtures():
+    """Insert missing fixture documents; a single read once this fixtures version is applied."""
+    if not await apply_fixtures(repository):
+        logger.info("Fixtures v%d already applied", FIXTURES_VERSION)
         return
-    
-    logger.info("Seeding database...")
-    
-    # Brands
-    brands = [
-        {"id": "samsung", "name": "Samsung", "logo": "/brands/samsung.png"},
-        {"id": "xiaomi", "name": "Xiaomi", "logo": "/brands/xiaomi.png"},
-        {"id": "oneplus", "name": "OnePlus", "logo": "/brands/oneplus.png"},
-        {"id": "realme", "name": "Realme", "logo": "/brands/realme.png"},
-        {"id": "vivo", "name": "Vivo", "logo": "/brands/vivo.png"},
-        {"id": "oppo", "name": "Oppo", "logo": "/brands/oppo.png"},
-    ]
-    await db.brands.insert_many(brands)
-    
-    # Phone Models
-    models = [
-        {"id": "sam-s23", "brand_id": "samsung", "name": "Galaxy S23", "base_price": 45000, "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400"},
-        {"id": "sam-s22", "brand_id": "samsung", "name": "Galaxy S22", "base_price": 38000, "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400"},
-        {"id": "sam-a54", "brand_id": "samsung", "name": "Galaxy A54", "base_price": 28000, "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400"},
-        {"id": "xi-13pro", "brand_id": "xiaomi", "name": "13 Pro", "base_price": 42000, "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400"},
-        {"id": "xi-12", "brand_id": "xiaomi", "name": "12", "base_price": 32000, "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400"},
-        {"id": "xi-note12", "brand_id": "xiaomi", "name": "Redmi Note 12 Pro", "base_price": 22000, "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400"},
-        {"id": "op-11", "brand_id": "oneplus", "name": "11", "base_price": 48000, "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400"},
-        {"id": "op-nord3", "brand_id": "oneplus", "name": "Nord 3", "base_price": 28000, "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400"},
-        {"id": "real-11pro", "brand_id": "realme", "name": "11 Pro+", "base_price": 30000, "image": "https://images.unsplash.com/photo-1585060544812-6b45742d762f?w=400"},
-        {"id": "real-narzo", "brand_id": "realme", "name": "Narzo 60", "base_price": 18000, "image": "https://images.unsplash.com/photo-1585060544812-6b45742d762f?w=400"},
-    ]
-    await db.phone_models.insert_many(models)
-    
-    # Questions
-    questions = [
-        {"id": "q1", "text": "Does the phone turn ON?", "category": "Basic Functionality", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": False},
-        {"id": "q2", "text": "Does the phone charge properly?", "category": "Basic Functionality", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": False},
-        {"id": "q3", "text": "Is the touchscreen fully responsive?", "category": "Basic Functionality", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": False},
-        {"id": "q4", "text": "Are physical buttons working?", "category": "Basic Functionality", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
-        {"id": "q5", "text": "Is fingerprint sensor working?", "category": "Basic Functionality", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
-        {"id": "q6", "text": "Is face unlock working?", "category": "Basic Functionality", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
-        {"id": "q7", "text": "Are speakers functioning correctly?", "category": "Basic Functionality", "deduction_percentage": 4, "is_blocking": False, "yes_deducts": False},
-        {"id": "q8", "text": "Is microphone working?", "category": "Basic Functionality", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": False},
-        {"id": "q9", "text": "Is vibration motor working?", "category": "Basic Functionality", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
-        {"id": "q10", "text": "Is WiFi working?", "category": "Basic Functionality", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
-        {"id": "q11", "text": "Is Bluetooth working?", "category": "Basic Functionality", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
-        {"id": "q12", "text": "Is mobile network detected?", "category": "Basic Functionality", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": False},
-        {"id": "q13", "text": "Is GPS working?", "category": "Basic Functionality", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
-        {"id": "q14", "text": "Is the screen cracked or broken?", "category": "Display", "deduction_percentage": 20, "is_blocking": False, "yes_deducts": True},
-        {"id": "q15", "text": "Are there dead pixels or lines on screen?", "category": "Display", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": True},
-        {"id": "q16", "text": "Is there screen discoloration?", "category": "Display", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
-        {"id": "q17", "text": "Is there touch delay or ghost touch?", "category": "Display", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": True},
-        {"id": "q18", "text": "Is brightness normal?", "category": "Display", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
-        {"id": "q19", "text": "Has display been replaced before?", "category": "Display", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": True},
-        {"id": "q20", "text": "Is battery backup normal (lasts full day)?", "category": "Battery", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": False},
-        {"id": "q21", "text": "Does phone heat abnormally?", "category": "Battery", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
-        {"id": "q22", "text": "Is battery swelling?", "category": "Battery", "deduction_percentage": 25, "is_blocking": False, "yes_deducts": True},
-        {"id": "q23", "text": "Has battery been replaced before?", "category": "Battery", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": True},
-        {"id": "q24", "text": "Is fast charging working?", "category": "Battery", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
-        {"id": "q25", "text": "Is rear camera working?", "category": "Camera", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": False},
-        {"id": "q26", "text": "Is front camera working?", "category": "Camera", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": False},
-        {"id": "q27", "text": "Is there blurry or focus issue?", "category": "Camera", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
-        {"id": "q28", "text": "Is flash working?", "category": "Camera", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
-        {"id": "q29", "text": "Is camera glass cracked?", "category": "Camera", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": True},
-        {"id": "q30", "text": "Are there major dents or cracks on body?", "category": "Body", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": True},
-        {"id": "q31", "text": "Is back panel damaged?", "category": "Body", "deduction_percentage": 12, "is_blocking": False, "yes_deducts": True},
-        {"id": "q32", "text": "Is frame bent?", "category": "Body", "deduction_percentage": 18, "is_blocking": False, "yes_deducts": True},
-        {"id": "q33", "text": "Are there water damage signs?", "category": "Water Damage", "deduction_percentage": 25, "is_blocking": False, "yes_deducts": True},
-        {"id": "q34", "text": "Is there rust or corrosion near ports?", "category": "Water Damage", "deduction_percentage": 15, "is_blocking": False, "yes_deducts": True},
-        {"id": "q35", "text": "Has phone been exposed to water?", "category": "Water Damage", "deduction_percentage": 20, "is_blocking": False, "yes_deducts": True},
-        {"id": "q36", "text": "Are there moisture warnings?", "category": "Water Damage", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
-        {"id": "q37", "text": "Is Google account removed?", "category": "Security", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": False},
-        {"id": "q38", "text": "Is screen lock removed?", "category": "Security", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
-        {"id": "q39", "text": "Is IMEI valid?", "category": "Security", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": False},
-        {"id": "q40", "text": "Is device blacklisted?", "category": "Security", "deduction_percentage": 0, "is_blocking": True, "yes_deducts": True},
-        {"id": "q41", "text": "Has any part been replaced?", "category": "Repair History", "deduction_percentage": 8, "is_blocking": False, "yes_deducts": True},
-        {"id": "q42", "text": "Any third-party repairs done?", "category": "Repair History", "deduction_percentage": 10, "is_blocking": False, "yes_deducts": True},
-        {"id": "q43", "text": "Do you have charger?", "category": "Accessories", "deduction_percentage": 2, "is_blocking": False, "yes_deducts": False},
-        {"id": "q44", "text": "Do you have original box?", "category": "Accessories", "deduction_percentage": 3, "is_blocking": False, "yes_deducts": False},
-        {"id": "q45", "text": "Do you have purchase bill?", "category": "Accessories", "deduction_percentage": 5, "is_blocking": False, "yes_deducts": False},
-    ]
-    await db.questions.insert_many(questions)
-    
-    # Phones for Sale
-    phones_for_sale = [
-        {
-            "id": "sale-1",
-            "brand": "Samsung",
-            "model": "Galaxy S22 Ultra",
-            "price": 42000,
-            "condition": "Excellent",
-            "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400",
-            "description": "Like new condition, barely used for 6 months. All original accessories included.",
-            "specs": {"RAM": "12GB", "Storage": "256GB", "Battery": "95% Health", "Warranty": "3 Months"},
-            "in_stock": True
-        },
-        {
-            "id": "sale-2",
-            "brand": "OnePlus",
-            "model": "10 Pro",
-            "price": 35000,
-            "condition": "Good",
-            "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400",
-            "description": "Well maintained, minor scratches on back. Works perfectly.",
-            "specs": {"RAM": "8GB", "Storage": "128GB", "Battery": "88% Health", "Warranty": "3 Months"},
-            "in_stock": True
-        },
-        {
-            "id": "sale-3",
-            "brand": "Xiaomi",
-            "model": "13 Pro",
-            "price": 38000,
-            "condition": "Excellent",
-            "image": "https://images.unsplash.com/photo-1598327105666-5b89351aff97?w=400",
-            "description": "Premium flagship in pristine condition. All accessories and box included.",
-            "specs": {"RAM": "12GB", "Storage": "256GB", "Battery": "92% Health", "Warranty": "6 Months"},
-            "in_stock": True
-        },
-        {
-            "id": "sale-4",
-            "brand": "Samsung",
-            "model": "Galaxy A54",
-            "price": 24000,
-            "condition": "Good",
-            "image": "https://images.unsplash.com/photo-1610945415295-d9bbf067e59c?w=400",
-            "description": "Mid-range champion, perfect for daily use. Camera is excellent.",
-            "specs": {"RAM": "8GB", "Storage": "128GB", "Battery": "90% Health", "Warranty": "3 Months"},
-            "in_stock": True
-        },
-        {
-            "id": "sale-5",
-            "brand": "Realme",
-            "model": "11 Pro+",
-            "price": 26000,
-            "condition": "Excellent",
-            "image": "https://images.unsplash.com/photo-1585060544812-6b45742d762f?w=400",
-            "description": "Fast charging beast with amazing display. Barely used.",
-            "specs": {"RAM": "12GB", "Storage": "256GB", "Battery": "94% Health", "Warranty": "6 Months"},
-            "in_stock": True
-        },
-        {
-            "id": "sale-6",
-            "brand": "OnePlus",
-            "model": "Nord 3",
-            "price": 24000,
-            "condition": "Good",
-            "image": "https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400",
-            "description": "Best value for money. Smooth performance and good camera.",
-            "specs": {"RAM": "8GB", "Storage": "128GB", "Battery": "87% Health", "Warranty": "3 Months"},
-            "in_stock": True
-        },
-    ]
-    await db.phones_for_sale.insert_many(phones_for_sale)
-    
-    logger.info("Database seeding completed")
+    await repository.catalog.bump_version(CATALOG_META_ID)
+    await repository.catalog.bump_version("phones_for_sale")
+    logger.info("Fixtures v%d applied", FIXTURES_VERSION)
+
+async def check_query_plans():
+    """Fail startup on collection scans when MONGO_VERIFY_QUERY_PLANS is set."""
+    if os.environ.get('MONGO_VERIFY_QUERY_PLANS', '').lower() in ('1', 'true', 'yes'):
+        await repository.verify_query_plans()
+
+async def start_up():
+    startup.begin()
+    if not os.environ.get('ADMIN_TOKEN'):
+        logger.warning("ADMIN_TOKEN is not set; every admin route will answer 403")
+    if not admission.rate_limited:
+        logger.warning("RATE_LIMIT_TRUSTED_PROXIES is not set; per-client rate limits are off")
+    # Opening sockets and ensuring indexes are independent; everything after needs both.
+    await startup.run_concurrently({
+        "connection_pool": warm_connection_pool,
+        "indexes": repository.prepare,
+    })
+    await startup.run("fixtures", seed_fixtures)
+    await startup.run_concurrently({
+        "catalog": catalog.refresh,
+        "listing_search": rebuild_listing_search,
+        "listing_index": rebuild_listing_index,
+        "lead_rollups": lead_rollups.backfill,
+        "query_plans": check_query_plans,
+    })
+    await startup.run_concurrently({
+        "lead_buffer": lead_buffer.start,
+        "coherence": coherence.start,
+    })
+    startup.finish()
+
+async def shut_down():
+    startup.ready = False
+    await coherence.stop()
+    await lead_buffer.stop()
+    repository.close()
@@ -0,0 +1,54 @@
+"""Timed startup phases and readiness.
+
+The app's lifespan runs its startup work as named phases through
+``StartupPhases``. Each phase's duration is logged, exported as a metric and
+returned by the readiness endpoint, so a slow cold start can be pinned on a
+phase. Independent phases run concurrently with ``run_concurrently``.
+
+``ready`` only turns true once every phase has finished, and turns false
+again as soon as shutdown begins, so a load balancer stops routing to a
+worker that is draining.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Phase = Callable[[], Awaitable[Any]]
+
+
+class StartupPhases:
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.ready = False
+        self.total_seconds: Optional[float] = None
+        self._started: Optional[float] = None
+
+    def begin(self):
+        self._started = time.perf_counter()
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self._started
+        self.ready = True
+        logger.info("Startup finished in %.3fs: %s", self.total_seconds,
+                    ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.timings.items()))
+
+    async def run(self, name: str, phase: Phase) -> Any:
+        started = time.perf_counter()
+        try:
+            return await phase()
+        finally:
+            self.timings[name] = time.perf_counter() - started
+            logger.info("Startup phase %s took %.3fs", name, self.timings[name])
+
+    async def run_concurrently(self, phases: Dict[str, Phase]):
+        await asyncio.gather(*(self.run(name, phase) for name, phase in phases.items()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "startup_seconds": round(self.total_seconds, 4) if self.total_seconds is not None else None,
+            "phases": {name: round(seconds, 4) for name, seconds in self.timings.items()},
+        }
@@ -0,0 +1,370 @@
+"""Async load test and benchmark harness for the PhoneXchange API.
+
+By default it launches ``uvicorn server:app`` from ./backend against a local
+Mongo (``--mongo-url``, default mongodb://localhost:27017) using a throwaway
+database, drives every scenario concurrently with httpx, and reports
+throughput and p50/p95/p99 latency per endpoint.
+
+    python backend_bench.py --duration 10 --concurrency 32 --output bench.json
+    python backend_bench.py --rps 500 --scenarios calculate_price,brands
+    python backend_bench.py --base-url http://localhost:8001 --baseline bench.json
+    python backend_bench.py --scenarios root --contention 500 --contention-rounds 20
+
+Results are written as JSON; ``--baseline`` compares a run against an earlier
+one and exits non-zero when p99 or throughput regress past ``--max-regression``.
+
+``--contention N`` also fires N simultaneous reservation attempts at one
+listing per round, checks that exactly one wins each round, and reports the
+attempt throughput and latency. The run fails if any round has a double winner.
+Unless ``--rate-limits`` is given, the reservation route's rate and
+concurrency limits are lifted for the launched server so that no attempt is
+throttled or shed.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+SAMPLE_LEAD = {
+    "name": "Bench User",
+    "phone": "9876543210",
+    "area": "Boring Road, Patna",
+    "preferred_time": "Morning",
+    "phone_model": "Galaxy S23",
+    "offered_price": 35000,
+    "remarks": "Benchmark lead",
+    "lead_type": "sell",
+}
+
+
+YES_DEDUCTS = {14, 15, 16, 17, 19, 21, 22, 23, 27, 29, 30, 31, 32, 33, 34, 35, 36, 40, 41, 42}
+BLOCKING = {1, 37, 39, 40}
+
+
+def random_answers():
+    """Mostly healthy phones with a few random defects, like real traffic."""
+    answers = {}
+    for i in range(1, 46):
+        if i in YES_DEDUCTS:
+            answers[f"q{i}"] = random.random() < 0.05
+        elif i in BLOCKING:
+            answers[f"q{i}"] = True
+        else:
+            answers[f"q{i}"] = random.random() >= 0.1
+    return answers
+
+
+# name -> (method, path, body factory)
+SCENARIOS = {
+    "root": ("GET", "/api/", None),
+    "brands": ("GET", "/api/brands", None),
+    "models": ("GET", "/api/models/samsung", None),
+    "questions": ("GET", "/api/questions", None),
+    "calculate_price": ("POST", "/api/calculate-price",
+                        lambda: {"model_id": random.choice(["sam-s23", "xi-13pro", "op-11"]), "answers": random_answers()}),
+    "calculate_price_batch": ("POST", "/api/calculate-price/batch",
+                              lambda: {"model_id": "sam-s23", "answer_sets": [random_answers() for _ in range(100)]}),
+    "phones_for_sale": ("GET", "/api/phones-for-sale", None),
+    "phones_for_sale_filtered": ("GET", "/api/phones-for-sale?brand=Samsung&min_price=20000&sort=price_asc", None),
+    "phone_detail": ("GET", "/api/phones-for-sale/sale-1", None),
+    "submit_lead": ("POST", "/api/submit-lead", lambda: SAMPLE_LEAD),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(client, name, duration, concurrency, rps):
+    method, path, body_factory = SCENARIOS[name]
+    latencies = []
+    statuses = {}
+    errors = 0
+    started = time.perf_counter()
+    deadline = started + duration
+    next_slot = [started]
+    interval = 1.0 / rps if rps else 0.0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            if interval:
+                # Open-loop pacing: each request claims the next slot on a shared schedule.
+                slot = next_slot[0]
+                next_slot[0] += interval
+                delay = slot - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if time.perf_counter() >= deadline:
+                return
+            body = body_factory() if body_factory else None
+            t0 = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status < 400)
+    return {
+        "method": method,
+        "path": path,
+        "requests": len(latencies) + errors,
+        "ok": ok,
+        "errors": errors + len(latencies) - ok,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            "p50": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            "p95": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+            "p99": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+            "max": round(latencies[-1] * 1000, 3) if latencies else None,
+        },
+    }
+
+
+async def run_contention(base_url, attempts, rounds, phone_id, timeout):
+    """Race ``attempts`` reservations on one listing per round; exactly one may win."""
+    path = f"/api/phones-for-sale/{phone_id}/reservation"
+    latencies = []
+    statuses = {}
+    violations = 0
+    limits = httpx.Limits(max_connections=attempts, max_keepalive_connections=attempts)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        for round_no in range(rounds):
+            async def attempt(i):
+                t0 = time.perf_counter()
+                # A distinct buyer per attempt, so the per-buyer hold cap never decides a round.
+                response = await client.post(path, json={"reserved_by": f"bench-{round_no}-{i}", "ttl_seconds": 60})
+                latencies.append(time.perf_counter() - t0)
+                return response
+
+            responses = await asyncio.gather(*(attempt(i) for i in range(attempts)), return_exceptions=True)
+            winners = []
+            for response in responses:
+                status = "error" if isinstance(response, Exception) else response.status_code
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    winners.append(response.json()["reservation_id"])
+            if len(winners) != 1:
+                violations += 1
+            for reservation_id in winners:
+                await client.delete(f"{path}/{reservation_id}")
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "path": path,
+        "attempts_per_round": attempts,
+        "rounds": rounds,
+        "violations": violations,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            "p99": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+            "max": round(latencies[-1] * 1000, 3) if latencies else None,
+        },
+    }
+
+
+async def wait_until_ready(base_url, timeout):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout}s")
+
+
+def launch_server(args):
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db_name,
+        "CORS_ORIGINS": "*",
+    })
+    if not args.rate_limits:
+        # Every benchmark request comes from one client; measure the routes, not the limiter.
+        for route in ("SUBMIT_LEAD", "CALCULATE_PRICE", "CALCULATE_PRICE_BATCH", "CALCULATE_PRICE_SENSITIVITY",
+                      "RESERVE_PHONE"):
+            env.setdefault(f"RATE_LIMIT_{route}_RATE", "0")
+        if args.contention:
+            # A contention round is one burst of simultaneous attempts; shedding them would count as losers.
+            env.setdefault("CONCURRENCY_LIMIT_RESERVE_PHONE", "0")
+    else:
+        # The benchmark talks to uvicorn directly, with no proxy in between.
+        env.setdefault("RATE_LIMIT_TRUSTED_PROXIES", "0")
+    command = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+               "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def drop_database(mongo_url, db_name):
+    from pymongo import MongoClient
+    client = MongoClient(mongo_url, serverSelectionTimeoutMS=2000)
+    try:
+        client.drop_database(db_name)
+    finally:
+        client.close()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """Print per-endpoint deltas against a baseline run and return the regressions."""
+    regressions = []
+    print(f"\n{'scenario':<26}{'rps':>12}{'Δ rps':>10}{'p99 ms':>12}{'Δ p99':>10}")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        rps_delta = (current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"] * 100 \
+            if previous["throughput_rps"] else 0.0
+        p99, previous_p99 = current["latency_ms"]["p99"], previous["latency_ms"]["p99"]
+        p99_delta = (p99 - previous_p99) / previous_p99 * 100 if p99 and previous_p99 else 0.0
+        print(f"{name:<26}{current['throughput_rps']:>12.1f}{rps_delta:>9.1f}%{p99 or 0:>12.2f}{p99_delta:>9.1f}%")
+        if rps_delta < -max_regression or p99_delta > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+async def run(args):
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = launch_server(args)
+    try:
+        await wait_until_ready(base_url, args.startup_timeout)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            # Warm caches and connection pools so the first scenario isn't penalised.
+            for name in names:
+                method, path, body_factory = SCENARIOS[name]
+                await client.request(method, path, json=body_factory() if body_factory else None)
+
+            scenarios = {}
+            for name in names:
+                result = await run_scenario(client, name, args.duration, args.concurrency, args.rps)
+                scenarios[name] = result
+                latency = result["latency_ms"]
+                print(f"{name:<26} {result['throughput_rps']:>9.1f} req/s  "
+                      f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+                      f"errors {result['errors']}")
+
+        contention = None
+        if args.contention:
+            contention = await run_contention(base_url, args.contention, args.contention_rounds,
+                                              args.contention_listing, args.timeout)
+            print(f"{'reservation contention':<26} {contention['throughput_rps']:>9.1f} req/s  "
+                  f"p50 {contention['latency_ms']['p50']} ms  p99 {contention['latency_ms']['p99']} ms  "
+                  f"rounds without exactly one winner {contention['violations']}/{contention['rounds']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+            if not args.keep_db:
+                drop_database(args.mongo_url, args.db_name)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "base_url": base_url,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "rps": args.rps,
+            "workers": args.workers if server is not None else None,
+        },
+        "scenarios": scenarios,
+        "reservation_contention": contention,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Benchmark an already running server instead of launching one")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default=f"bench_{uuid.uuid4().hex[:8]}")
+    parser.add_argument("--keep-db", action="store_true", help="Keep the throwaway database after the run")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the launched server")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="Keep per-client rate limits enabled on the launched server")
+    parser.add_argument("--scenarios", help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rps", type=float, default=0.0, help="Target request rate per scenario (0 = closed loop)")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--contention", type=int, default=0,
+                        help="Simultaneous reservation attempts per round on one listing (0 = skip)")
+    parser.add_argument("--contention-rounds", type=int, default=10)
+    parser.add_argument("--contention-listing", default="sale-1")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    contention = results.get("reservation_contention")
+    if contention and contention["violations"]:
+        print(f"\nReservation contention: {contention['violations']} rounds did not have exactly one winner")
+        return 1
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\nRegressed beyond {args.max_regression}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
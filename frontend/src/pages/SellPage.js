@@ -13,6 +13,7 @@ const SellPage = () => {
   const [step, setStep] = useState(1);
   const [brands, setBrands] = useState([]);
   const [models, setModels] = useState([]);
+  const [modelsByBrand, setModelsByBrand] = useState({});
   const [questions, setQuestions] = useState([]);
   const [selectedBrand, setSelectedBrand] = useState(null);
   const [selectedModel, setSelectedModel] = useState(null);
@@ -21,43 +22,24 @@ const SellPage = () => {
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
-    fetchBrands();
-    fetchQuestions();
+    fetchBootstrap();
   }, []);
 
-  const fetchBrands = async () => {
+  // Brands, models and questions arrive together in one round-trip.
+  const fetchBootstrap = async () => {
     try {
-      const response = await axios.get(`${API}/brands`);
-      setBrands(response.data);
+      const response = await axios.get(`${API}/bootstrap`);
+      setBrands(response.data.brands);
+      setModelsByBrand(response.data.models);
+      setQuestions(Object.values(response.data.questions).flat());
     } catch (error) {
-      toast.error('Failed to load brands');
-    }
-  };
-
-  const fetchQuestions = async () => {
-    try {
-      const response = await axios.get(`${API}/questions`);
-      setQuestions(response.data);
-    } catch (error) {
-      toast.error('Failed to load questions');
-    }
-  };
-
-  const fetchModels = async (brandId) => {
-    try {
-      setLoading(true);
-      const response = await axios.get(`${API}/models/${brandId}`);
-      setModels(response.data);
-      setLoading(false);
-    } catch (error) {
-      toast.error('Failed to load models');
-      setLoading(false);
+      toast.error('Failed to load catalog');
     }
   };
 
   const handleBrandSelect = (brand) => {
     setSelectedBrand(brand);
-    fetchModels(brand.id);
+    setModels(modelsByBrand[brand.id] || []);
     setStep(2);
   };
 
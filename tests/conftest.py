@@ -0,0 +1,28 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# The API under test runs on the in-process repository, so no Mongo is needed.
+os.environ["REPOSITORY_BACKEND"] = "memory"
+os.environ["ADMIN_TOKEN"] = "test-admin-token"
+os.environ.pop("RATE_LIMIT_TRUSTED_PROXIES", None)
+
+
+@pytest.fixture(scope="session")
+def api():
+    from fastapi.testclient import TestClient
+
+    import server
+
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def admin_headers():
+    return {"X-Admin-Token": os.environ["ADMIN_TOKEN"]}
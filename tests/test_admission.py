@@ -0,0 +1,159 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+from starlette.requests import Request
+
+import admission
+from admission import AdmissionController, MemoryBucketStore, MongoBucketStore, RouteLimits, route_limits
+
+
+def guarded_app(controller, release=None):
+    app = FastAPI()
+
+    @app.post("/guarded", dependencies=[Depends(controller.guard("route"))])
+    async def guarded():
+        if release is not None:
+            await release.wait()
+        return {"ok": True}
+
+    return app
+
+
+def request_from(peer, forwarded_for=None):
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": (peer, 5000)})
+
+
+def test_requests_over_the_concurrency_limit_are_shed_with_retry_after():
+    controller = AdmissionController(MemoryBucketStore(), {"route": RouteLimits(0, 1, 2)})
+
+    async def scenario():
+        release = asyncio.Event()
+        transport = httpx.ASGITransport(app=guarded_app(controller, release))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            held = [asyncio.create_task(client.post("/guarded")) for _ in range(2)]
+            while controller.in_flight["route"] < 2:
+                await asyncio.sleep(0.01)
+            shed = await client.post("/guarded")
+            release.set()
+            return shed, await asyncio.gather(*held)
+
+    shed, held = asyncio.run(scenario())
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
+    assert [response.status_code for response in held] == [200, 200]
+    assert controller.in_flight["route"] == 0
+    assert controller.shed["route"] == 1
+
+
+def test_clients_over_their_rate_get_429_and_release_their_slot(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    # One request every 4 seconds, bursts of 2.
+    controller = AdmissionController(MemoryBucketStore(), {"route": RouteLimits(0.25, 2, 5)}, trusted_proxies=0)
+    client = TestClient(guarded_app(controller))
+
+    assert [client.post("/guarded").status_code for _ in range(2)] == [200, 200]
+    throttled = client.post("/guarded")
+    assert throttled.status_code == 429
+    assert throttled.headers["retry-after"] == "4"
+    assert controller.in_flight["route"] == 0
+    assert (controller.admitted["route"], controller.throttled["route"]) == (2, 1)
+
+    clock[0] += 1.5
+    assert client.post("/guarded").headers["retry-after"] == "3"
+    clock[0] += 2.5
+    assert client.post("/guarded").status_code == 200
+
+
+def test_rate_limits_stay_off_until_proxies_are_configured():
+    controller = AdmissionController(MemoryBucketStore(), {"route": RouteLimits(0.01, 1, 0)})
+    client = TestClient(guarded_app(controller))
+    assert not controller.rate_limited
+    assert [client.post("/guarded").status_code for _ in range(3)] == [200, 200, 200]
+
+
+@pytest.mark.parametrize("trusted_proxies,forwarded_for,expected", [
+    (0, "6.6.6.6", "10.0.0.9"),
+    (None, "6.6.6.6", "10.0.0.9"),
+    (1, "1.1.1.1", "1.1.1.1"),
+    (1, "6.6.6.6, 1.1.1.1", "1.1.1.1"),
+    # A client can prepend anything; only the entries trusted proxies appended count.
+    (2, "6.6.6.6, 1.1.1.1, 10.0.0.2", "1.1.1.1"),
+    (2, " 6.6.6.6 ,, 1.1.1.1 , 10.0.0.2 ", "1.1.1.1"),
+    (3, "1.1.1.1, 10.0.0.2", "1.1.1.1"),
+    (1, None, "10.0.0.9"),
+    (1, "", "10.0.0.9"),
+])
+def test_client_key_picks_the_address_the_outermost_trusted_proxy_saw(trusted_proxies, forwarded_for, expected):
+    controller = AdmissionController(MemoryBucketStore(), {}, trusted_proxies=trusted_proxies)
+    assert controller.client_key(request_from("10.0.0.9", forwarded_for)) == expected
+
+
+def test_memory_buckets_allow_a_burst_then_one_request_per_interval(monkeypatch):
+    clock = [50.0]
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    store = MemoryBucketStore()
+
+    def acquire(key="a"):
+        return asyncio.run(store.acquire(key, 2.0, 3))
+
+    assert [acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert acquire() == pytest.approx(2.0)
+    assert acquire("b") == 0.0
+    clock[0] += 2.0
+    assert acquire() == 0.0
+    assert acquire() == pytest.approx(2.0)
+    # A long idle spell refills the bucket to its burst, no further.
+    clock[0] += 60.0
+    assert [acquire() for _ in range(4)][-1] == pytest.approx(2.0)
+
+
+def test_memory_buckets_are_bounded():
+    store = MemoryBucketStore(maxsize=2)
+    for key in ("a", "b", "c"):
+        asyncio.run(store.acquire(key, 1.0, 1))
+    assert len(store.arrivals) == 2
+
+
+class BucketCollection:
+    """Stands in for the rate_limits collection: a full bucket fails its upsert with a duplicate key."""
+
+    def __init__(self, tat=None, error=None):
+        self.tat = tat
+        self.error = error
+
+    async def find_one_and_update(self, query, update, projection, upsert, return_document):
+        if self.error is not None:
+            raise self.error
+        if self.tat is not None:
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return {"_id": query["_id"]}
+
+    async def find_one(self, query, projection):
+        return {"_id": query["_id"], "tat": self.tat} if self.tat is not None else None
+
+
+def test_mongo_bucket_wait_is_derived_from_the_stored_arrival_time(monkeypatch):
+    monkeypatch.setattr(admission, "time", SimpleNamespace(time=lambda: 100.0))
+    assert asyncio.run(MongoBucketStore(BucketCollection()).acquire("k", 2.0, 3)) == 0.0
+    # Full since tat = now + burst * interval; room again once tat - now <= (burst - 1) * interval.
+    assert asyncio.run(MongoBucketStore(BucketCollection(tat=106.0)).acquire("k", 2.0, 3)) == pytest.approx(2.0)
+    assert asyncio.run(MongoBucketStore(BucketCollection(tat=109.0)).acquire("k", 2.0, 3)) == pytest.approx(5.0)
+
+
+def test_mongo_bucket_store_fails_open():
+    store = MongoBucketStore(BucketCollection(error=AutoReconnect("down")))
+    assert asyncio.run(store.acquire("k", 1.0, 1)) == 0.0
+    assert store.errors == 1
+
+
+def test_route_limits_read_per_route_overrides():
+    limits = route_limits("reserve_phone", {"RATE_LIMIT_RESERVE_PHONE_BURST": "9", "CONCURRENCY_LIMIT_RESERVE_PHONE": "0"})
+    assert limits.as_dict() == {"rate": 0.2, "burst": 9, "concurrency": 0}
+    assert route_limits("unknown", {}).as_dict() == {"rate": 0.0, "burst": 1, "concurrency": 0}
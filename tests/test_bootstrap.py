@@ -0,0 +1,22 @@
+def test_bootstrap_matches_the_separate_catalog_routes(api):
+    bootstrap = api.get("/api/bootstrap").json()
+
+    brands = api.get("/api/brands", params={"limit": 500}).json()
+    assert bootstrap["brands"] == brands
+    for brand in brands:
+        models = api.get(f"/api/models/{brand['id']}", params={"limit": 500}).json()
+        assert bootstrap["models"].get(brand["id"], []) == models
+
+    questions = api.get("/api/questions").json()
+    grouped = {}
+    for question in questions:
+        grouped.setdefault(question["category"], []).append(question)
+    assert bootstrap["questions"] == grouped
+
+
+def test_bootstrap_carries_the_catalog_version(api, admin_headers):
+    bootstrap = api.get("/api/bootstrap")
+    stats = api.get("/api/admin/catalog/stats", headers=admin_headers).json()
+    assert bootstrap.json()["version"] == stats["version"]
+    assert bootstrap.headers["cache-control"] == "public, max-age=300"
+    assert api.get("/api/bootstrap", headers={"If-None-Match": bootstrap.headers["etag"]}).status_code == 304
@@ -0,0 +1,244 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+import catalog
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from catalog import CatalogCache, CatalogUnavailable
+from repository import MongoCatalogStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CatalogStore:
+    """A catalog store that can be failed, stalled and asked which reads went to the primary."""
+
+    def __init__(self):
+        self.version = 1
+        self.brands = [{"id": "samsung", "name": "Samsung"}]
+        self.error = None
+        self.stall = None
+        self.reads = []
+
+    async def read_version(self, key, primary=False):
+        self.reads.append(("version", primary))
+        if self.stall is not None:
+            await self.stall.wait()
+        if self.error is not None:
+            raise self.error
+        return self.version
+
+    async def load(self, primary=False):
+        self.reads.append(("load", primary))
+        return [dict(brand) for brand in self.brands], [], []
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5.0, clock=clock)
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now = 5.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    # Only one trial at a time.
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert (breaker.opens, breaker.short_circuits) == (2, 3)
+
+
+def test_failed_revalidation_serves_the_last_snapshot_and_opens_the_breaker():
+    store = CatalogStore()
+    cache = CatalogCache(store, ttl=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    async def scenario():
+        loaded = await cache.get()
+        store.error = AutoReconnect("primary stepped down")
+        served = [await cache.get() for _ in range(4)]
+        return loaded, served
+
+    loaded, served = asyncio.run(scenario())
+    assert all(snapshot is loaded for snapshot in served)
+    # Two failures open the breaker; the calls after that never reach the store.
+    assert len(store.reads) == 4
+    assert cache.stats()["failures"] == 2
+    assert cache.stats()["stale_serves"] == 4
+    assert cache.breaker.state == OPEN
+
+
+def test_nothing_loaded_and_no_store_is_catalog_unavailable():
+    store = CatalogStore()
+    store.error = AutoReconnect("no primary")
+    cache = CatalogCache(store, breaker=CircuitBreaker(failure_threshold=1))
+    for _ in range(2):
+        with pytest.raises(CatalogUnavailable):
+            asyncio.run(cache.get())
+
+
+def test_catalog_unavailable_is_a_retryable_503(api, monkeypatch):
+    import server
+
+    store = CatalogStore()
+    store.error = AutoReconnect("no primary")
+    monkeypatch.setattr(server, "catalog", CatalogCache(store))
+    response = api.get("/api/brands")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_a_cancelled_trial_reopens_the_breaker():
+    clock = Clock()
+    store = CatalogStore()
+    cache = CatalogCache(store, ttl=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=5.0, clock=clock))
+
+    async def scenario():
+        loaded = await cache.get()
+        store.error = AutoReconnect("down")
+        await cache.get()
+        clock.now = 5.0
+        store.error, store.stall = None, asyncio.Event()
+        trial = asyncio.create_task(cache.get())
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        state_after_cancel = cache.breaker.state
+
+        # Without the reset the half-open trial would stay "in flight" forever.
+        store.stall = None
+        clock.now = 10.0
+        recovered = await cache.get()
+        return loaded, state_after_cancel, recovered
+
+    loaded, state_after_cancel, recovered = asyncio.run(scenario())
+    assert state_after_cancel == OPEN
+    assert recovered is loaded
+    assert cache.breaker.state == CLOSED
+
+
+def test_refresh_after_an_own_write_reads_the_primary():
+    store = CatalogStore()
+    cache = CatalogCache(store)
+
+    async def scenario():
+        await cache.get()
+        store.brands.append({"id": "vivo", "name": "Vivo"})
+        store.version = 2
+        return await cache.refresh(primary=True)
+
+    snapshot = asyncio.run(scenario())
+    assert [brand["id"] for brand in snapshot.brands] == ["samsung", "vivo"]
+    assert store.reads == [("version", False), ("load", False), ("version", True), ("load", True)]
+
+
+class Collection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        return self
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+    async def find_one(self, query, projection):
+        return self.docs[0] if self.docs else None
+
+
+def catalog_db(brand, version):
+    return SimpleNamespace(brands=Collection([{"id": brand}]), phone_models=Collection([]),
+                           questions=Collection([]), catalog_meta=Collection([{"_id": "catalog", "version": version}]))
+
+
+def test_mongo_catalog_store_reads_secondaries_unless_asked_for_the_primary():
+    # The secondary has not caught up with the write yet.
+    store = MongoCatalogStore(catalog_db("vivo", 2), read_db=catalog_db("samsung", 1))
+
+    async def scenario():
+        return (await store.read_version("catalog"), (await store.load())[0],
+                await store.read_version("catalog", primary=True), (await store.load(primary=True))[0])
+
+    assert asyncio.run(scenario()) == (1, [{"id": "samsung"}], 2, [{"id": "vivo"}])
+
+
+def test_reads_within_the_ttl_are_hits_and_a_new_version_reloads(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(catalog, "time", SimpleNamespace(monotonic=clock))
+    store = CatalogStore()
+    cache = CatalogCache(store, ttl=30.0, max_age=3600.0)
+
+    async def scenario():
+        first = await cache.get()
+        assert await cache.get() is first
+        clock.now = 31.0
+        # Revalidated: same version, so the snapshot is kept.
+        assert await cache.get() is first
+        store.version = 2
+        store.brands.append({"id": "vivo", "name": "Vivo"})
+        assert await cache.get() is first
+        clock.now = 62.0
+        return first, await cache.get()
+
+    first, second = asyncio.run(scenario())
+    assert second is not first and second.version == 2
+    assert [brand["id"] for brand in second.brands] == ["samsung", "vivo"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["revalidations"], stats["reloads"]) == (2, 3, 3, 2)
+
+
+def test_max_age_reloads_even_when_the_version_did_not_move(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(catalog, "time", SimpleNamespace(monotonic=clock))
+    store = CatalogStore()
+    cache = CatalogCache(store, ttl=30.0, max_age=100.0)
+
+    async def scenario():
+        first = await cache.get()
+        clock.now = 101.0
+        return first, await cache.get()
+
+    first, second = asyncio.run(scenario())
+    assert second is not first
+    assert cache.stats()["reloads"] == 2
+
+
+def test_listeners_see_each_new_snapshot():
+    store = CatalogStore()
+    cache = CatalogCache(store)
+    seen = []
+    cache.add_listener(lambda previous, current: seen.append((previous, current.version)))
+
+    async def scenario():
+        first = await cache.get()
+        store.version = 3
+        await cache.refresh()
+        return first
+
+    first = asyncio.run(scenario())
+    assert seen == [(None, 1), (first, 3)]
+
+
+def test_admin_refresh_reloads_and_is_admin_only(api, admin_headers):
+    assert api.post("/api/admin/catalog/refresh").status_code == 403
+    before = api.get("/api/admin/catalog/stats", headers=admin_headers).json()
+    refreshed = api.post("/api/admin/catalog/refresh", headers=admin_headers).json()
+    assert refreshed["version"] == before["version"] + 1
+    assert refreshed["reloads"] == before["reloads"] + 1
@@ -0,0 +1,52 @@
+import asyncio
+
+from coherence import CoherenceWatcher
+
+
+def test_events_recorded_during_a_handler_are_dispatched():
+    async def scenario():
+        watcher = CoherenceWatcher(db=None, mode="off", debounce=0.01)
+        seen = []
+
+        async def handler(events):
+            seen.append(events)
+            if len(seen) == 1:
+                # Arrives while this dispatch is still awaiting its handler.
+                watcher._record("phones_for_sale", {"n": 2})
+                await asyncio.sleep(0.05)
+
+        watcher.on_change("phones_for_sale", handler)
+        watcher._record("phones_for_sale", {"n": 1})
+        for _ in range(100):
+            if len(seen) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await watcher.stop()
+        return seen, watcher.dispatches["phones_for_sale"]
+
+    seen, dispatches = asyncio.run(scenario())
+    assert seen == [[{"n": 1}], [{"n": 2}]]
+    assert dispatches == 2
+
+
+def test_events_within_the_debounce_window_are_coalesced():
+    async def scenario():
+        watcher = CoherenceWatcher(db=None, mode="off", debounce=0.05)
+        seen = []
+        watcher.on_change("catalog", seen.append)
+        for n in range(3):
+            watcher._record("catalog", {"n": n})
+        watcher._record("catalog", None)
+        await asyncio.sleep(0.2)
+        return seen
+
+    assert asyncio.run(scenario()) == [None]
+
+
+def test_a_broken_stream_skips_poll_only_sources():
+    async def scenario():
+        watcher = CoherenceWatcher(db=None, mode="off", debounce=0.01)
+        watcher._stream_failed(RuntimeError("stream closed"))
+        return set(watcher._pending)
+
+    assert asyncio.run(scenario()) == {"catalog", "phones_for_sale"}
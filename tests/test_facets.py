@@ -0,0 +1,93 @@
+import random
+from bisect import bisect_right
+from collections import Counter
+
+import pytest
+
+from facets import DEFAULT_PRICE_BOUNDARIES, _field, count_facets, facet_stage, price_boundaries, shape_facets
+
+
+def run_facet_stage(stage, docs):
+    """Evaluate the ``$facet`` stage the way Mongo does, for the operators it uses."""
+    groups = {}
+    for name, [step] in stage["$facet"].items():
+        counts = Counter()
+        if "$group" in step:
+            field = step["$group"]["_id"][1:]
+            for doc in docs:
+                counts[_field(doc, field)] += 1
+        else:
+            bucket = step["$bucket"]
+            bounds = bucket["boundaries"]
+            for doc in docs:
+                value = _field(doc, bucket["groupBy"][1:])
+                inside = bounds[0] <= value < bounds[-1]
+                counts[bounds[bisect_right(bounds, value) - 1] if inside else bucket["default"]] += 1
+        groups[name] = [{"_id": value, "count": count} for value, count in counts.items()]
+    return groups
+
+
+def random_listings(rng, count):
+    docs = []
+    for _ in range(count):
+        specs = {}
+        if rng.random() < 0.8:
+            specs["RAM"] = rng.choice(["4GB", "8GB", "12GB"])
+        if rng.random() < 0.8:
+            specs["Storage"] = rng.choice(["64GB", "128GB", "256GB"])
+        docs.append({
+            "brand": rng.choice(["Samsung", "Vivo", "OnePlus"]),
+            "condition": rng.choice(["Good", "Excellent", "Fair"]),
+            # Boundary values and out-of-range prices exercise the bucket edges.
+            "price": rng.choice([-1, 0, 9999, 10000, 25000, 50000, 50001, rng.randrange(0, 80000)]),
+            "specs": specs,
+        })
+    return docs
+
+
+def sorted_groups(groups):
+    return {name: sorted(buckets, key=lambda bucket: str(bucket["_id"])) for name, buckets in groups.items()}
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("boundaries", [DEFAULT_PRICE_BOUNDARIES, (15000,), (5000, 7500, 60000)])
+def test_count_facets_matches_the_aggregation_stage(seed, boundaries):
+    docs = random_listings(random.Random(seed), 300)
+    in_memory = count_facets(docs, boundaries)
+    aggregated = run_facet_stage(facet_stage(boundaries), docs)
+    assert sorted_groups(in_memory) == sorted_groups(aggregated)
+    assert shape_facets(in_memory, boundaries) == shape_facets(aggregated, boundaries)
+
+
+def test_shape_includes_empty_buckets_and_drops_missing_values():
+    docs = [
+        {"brand": "Vivo", "condition": "Good", "price": 12000, "specs": {"RAM": "8GB"}},
+        {"brand": "Vivo", "condition": "Fair", "price": 70000, "specs": {}},
+        {"brand": "Apple", "condition": "Good", "price": 12500, "specs": {"RAM": "8GB"}},
+    ]
+    facets = shape_facets(count_facets(docs, (10000, 20000)), (10000, 20000))
+    assert facets["brands"] == [{"value": "Vivo", "count": 2}, {"value": "Apple", "count": 1}]
+    assert facets["ram"] == [{"value": "8GB", "count": 2}]
+    assert facets["storage"] == []
+    assert facets["price"] == [
+        {"min": 0, "max": 10000, "count": 0},
+        {"min": 10000, "max": 20000, "count": 2},
+        {"min": 20000, "max": None, "count": 1},
+    ]
+    assert facets["total"] == 3
+
+
+def test_price_boundaries_are_parsed_sorted_and_distinct():
+    assert price_boundaries("30000, 10000,,10000") == (10000, 30000)
+    for bad in ("", "0,10000", "-5"):
+        with pytest.raises(ValueError):
+            price_boundaries(bad)
+
+
+@pytest.mark.parametrize("params", [{}, {"brand": "Samsung"}, {"min_price": 20000}, {"brand": "Nokia"}])
+def test_facet_endpoint_counts_the_listings_the_same_filters_return(api, params):
+    facets = api.get("/api/phones-for-sale/facets", params=params).json()
+    listings = api.get("/api/phones-for-sale", params={**params, "limit": 500}).json()
+    assert facets["total"] == len(listings)
+    assert sum(brand["count"] for brand in facets["brands"]) == len(listings)
+    assert sum(bucket["count"] for bucket in facets["price"]) == len(listings)
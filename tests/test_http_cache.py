@@ -0,0 +1,63 @@
+import pytest
+
+from http_cache import cache_control, make_etag
+
+
+@pytest.mark.parametrize("path", ["/api/brands", "/api/models/samsung", "/api/questions", "/api/bootstrap"])
+def test_catalog_routes_revalidate_to_304(api, path):
+    first = api.get(path)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "public, max-age=300"
+
+    for header in (etag, f"W/{etag}", f'"stale", {etag}', "*"):
+        revalidated = api.get(path, headers={"If-None-Match": header})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+        assert revalidated.content == b""
+    assert api.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_etags_depend_on_the_query(api):
+    by_name = api.get("/api/models/samsung", params={"sort": "name"}).headers["etag"]
+    by_price = api.get("/api/models/samsung", params={"sort": "price_asc"}).headers["etag"]
+    assert by_name != by_price
+    assert api.get("/api/models/samsung", params={"sort": "price_asc"}).headers["etag"] == by_price
+
+
+def test_phone_detail_304_skips_the_repository(api, monkeypatch):
+    import server
+
+    etag = api.get("/api/phones-for-sale/sale-1").headers["etag"]
+    reads = []
+    original = server.repository.listings.get
+
+    async def counting_get(phone_id, projection):
+        reads.append(phone_id)
+        return await original(phone_id, projection)
+
+    monkeypatch.setattr(server.repository.listings, "get", counting_get)
+    revalidated = api.get("/api/phones-for-sale/sale-1", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["cache-control"] == "public, max-age=30"
+    assert reads == []
+    assert api.get("/api/phones-for-sale/sale-1", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert reads == ["sale-1"]
+
+
+def test_facets_revalidate_to_304(api):
+    etag = api.get("/api/phones-for-sale/facets").headers["etag"]
+    assert api.get("/api/phones-for-sale/facets", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_cache_control_is_tunable_per_route(monkeypatch):
+    assert cache_control("unknown_route") == "no-cache"
+    monkeypatch.setenv("CACHE_CONTROL_BRANDS", "public, max-age=600")
+    assert cache_control("brands") == "public, max-age=600"
+
+
+def test_etags_are_strong_and_stable():
+    etag = make_etag("fingerprint", "/api/brands?")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("fingerprint", "/api/brands?")
+    assert etag != make_etag("fingerprint", "/api/brands?sort=id")
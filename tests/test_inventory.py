@@ -0,0 +1,178 @@
+import asyncio
+import json
+from typing import Dict, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from inventory import ImportReport, import_rows, read_rows
+from repository import MemoryCatalogStore, MemoryListingStore
+
+
+class Listing(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    brand: str
+    price: int
+    description: str
+    specs: Dict[str, str]
+    in_stock: bool
+
+
+class Model(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    brand_id: str
+    name: str
+    base_price: int
+    image: str
+
+
+class ModelUpdate(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    brand_id: Optional[str] = None
+    name: Optional[str] = None
+    base_price: Optional[int] = None
+    image: Optional[str] = None
+
+
+async def chunked(body: str, size: int = 7):
+    data = body.encode()
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def import_listings(body: str, fmt: str, store: Optional[MemoryListingStore] = None, batch_size: int = 2):
+    store = store or MemoryListingStore()
+
+    async def scenario():
+        report = ImportReport("listings", fmt)
+        await import_rows(read_rows(chunked(body), fmt), Listing, store.upsert_many, report, batch_size=batch_size)
+        return report.as_dict(), {doc["id"]: doc for doc in store._by_id.values()}
+
+    return asyncio.run(scenario())
+
+
+CSV_HEADER = "id,brand,price,description,specs.RAM,specs,in_stock\n"
+
+
+def test_csv_rows_are_applied_and_bad_rows_reported_by_line():
+    body = CSV_HEADER + (
+        'sale-1,Samsung,30000,6.1" display,8GB,,true\n'
+        'sale-2,Vivo,20000,"Price drop,\nnow cheaper",,"{""Storage"": ""128GB""}",1\n'
+        "sale-3,Vivo,notanumber,bad price,8GB,,true\n"
+        "sale-4,Vivo,1000,too many,8GB,,true,extra\n"
+        ",,,,,,\n"
+        "\n"
+        'sale-5,Vivo,1000,x,8GB,"{not json",true\n'
+        "sale-6,Vivo,1000,last,4GB,,false"
+    )
+    report, docs = import_listings(body, "csv")
+
+    assert report["rows"] == 6
+    assert (report["upserted"], report["updated"], report["failed"]) == (3, 0, 3)
+    assert [(error["line"], error["id"]) for error in report["errors"]] == [(5, "sale-3"), (6, None), (9, None)]
+    assert "price" in report["errors"][0]["error"]
+    assert docs["sale-1"]["description"] == '6.1" display'
+    assert docs["sale-2"]["description"] == "Price drop,\nnow cheaper"
+    assert docs["sale-2"]["specs"] == {"Storage": "128GB"}
+    assert docs["sale-6"]["in_stock"] is False
+
+
+def test_unterminated_quote_only_costs_its_own_line():
+    body = CSV_HEADER + (
+        'sale-1,Samsung,30000,"never closed,8GB,,true\n'
+        "sale-2,Vivo,20000,fine,8GB,,true\n"
+    )
+    report, docs = import_listings(body, "csv")
+    assert report["errors"] == [{"line": 2, "id": None, "error": "Unterminated quoted field"}]
+    assert list(docs) == ["sale-2"]
+
+
+def test_ndjson_rows_are_applied_and_bad_rows_reported_by_line():
+    rows = [
+        json.dumps({"id": "sale-1", "brand": "Samsung", "price": 30000, "description": "d", "specs": {},
+                    "in_stock": True}),
+        "{not json",
+        "[1, 2]",
+        "",
+        json.dumps({"id": "sale-2", "brand": "Vivo", "price": "cheap", "description": "d", "specs": {},
+                    "in_stock": True}),
+        json.dumps({"id": "sale-3", "brand": "Vivo", "price": 100, "description": "d", "specs": {},
+                    "in_stock": True}),
+    ]
+    report, docs = import_listings("\n".join(rows) + "\n", "ndjson")
+
+    assert report["rows"] == 5
+    assert (report["upserted"], report["failed"]) == (2, 3)
+    assert [(error["line"], error["id"]) for error in report["errors"]] == [(2, None), (3, None), (5, "sale-2")]
+    assert report["errors"][0]["error"].startswith("Invalid JSON")
+    assert report["errors"][1]["error"] == "Expected a JSON object"
+    assert sorted(docs) == ["sale-1", "sale-3"]
+
+
+def test_reimport_updates_and_keeps_reservation_holds():
+    store = MemoryListingStore()
+    body = CSV_HEADER + "sale-1,Samsung,30000,first,8GB,,true\n"
+    import_listings(body, "csv", store)
+    asyncio.run(store.reserve("sale-1", 60, "buyer-1"))
+
+    report, docs = import_listings(body.replace("30000,first", "25000,second"), "csv", store)
+    assert (report["upserted"], report["updated"]) == (0, 1)
+    assert docs["sale-1"]["price"] == 25000
+    assert docs["sale-1"]["reserved_by"] == "buyer-1"
+
+
+def test_error_list_is_truncated():
+    body = CSV_HEADER + "".join(f"sale-{i},Vivo,bad,x,8GB,,true\n" for i in range(5))
+
+    async def scenario():
+        report = ImportReport("listings", "csv", max_errors=2)
+        await import_rows(read_rows(chunked(body), "csv"), Listing, MemoryListingStore().upsert_many, report)
+        return report.as_dict()
+
+    report = asyncio.run(scenario())
+    assert report["failed"] == 5
+    assert len(report["errors"]) == 2
+    assert report["errors_truncated"] is True
+
+
+def test_partial_model_rows_update_existing_models_only():
+    catalog = MemoryCatalogStore()
+    body = (
+        "id,brand_id,name,base_price,image\n"
+        "sam-s23,samsung,Galaxy S23,45000,img\n"
+        "sam-s23,,,43000,\n"
+        "vivo-new,,,1000,\n"
+        "sam-s23,,,cheap,\n"
+    )
+
+    async def scenario():
+        report = ImportReport("models", "csv")
+        await import_rows(read_rows(chunked(body), "csv"), Model, catalog.upsert_models, report,
+                          partial=(ModelUpdate, catalog.model_ids))
+        return report.as_dict()
+
+    report = asyncio.run(scenario())
+    assert (report["upserted"], report["updated"], report["failed"]) == (1, 1, 2)
+    errors = {error["line"]: error["error"] for error in report["errors"]}
+    assert errors[4] == "Unknown id; a new record needs every field"
+    assert errors[5].startswith("base_price")
+    assert catalog.models == [
+        {"id": "sam-s23", "brand_id": "samsung", "name": "Galaxy S23", "base_price": 43000, "image": "img"},
+    ]
+
+
+def test_import_endpoint_reprices_models(api, admin_headers):
+    body = "id,base_price\nsam-s23,41000\n"
+    response = api.post("/api/admin/inventory/import?kind=models&format=csv", content=body.encode(),
+                        headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+    models = {model["id"]: model for model in api.get("/api/models/samsung").json()}
+    assert models["sam-s23"]["base_price"] == 41000
+    assert models["sam-s23"]["name"] == "Galaxy S23"
+
+
+def test_import_endpoint_is_admin_only(api):
+    assert api.post("/api/admin/inventory/import?kind=models", content=b"").status_code == 403
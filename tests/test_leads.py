@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from leads import DUPLICATE_KEY, LeadBuffer, export_leads
+
+
+class FlakyLeadStore:
+    """Fails the first ``failures`` insert_many calls with the given errors, then stores everything."""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.docs = {}
+        self.calls = []
+
+    async def insert_one(self, doc):
+        self.docs[doc["id"]] = doc
+
+    async def insert_many(self, docs, ordered=False):
+        self.calls.append([doc["id"] for doc in docs])
+        if self.failures:
+            failure = self.failures.pop(0)
+            error = failure(self, docs) if callable(failure) else failure
+            raise error
+        for doc in docs:
+            self.docs[doc["id"]] = doc
+
+
+def partial_write(codes):
+    """Store every doc except the indexes in ``codes``, which fail with those error codes."""
+    def fail(store, docs):
+        for index, doc in enumerate(docs):
+            if index not in codes or codes[index] == DUPLICATE_KEY:
+                store.docs[doc["id"]] = doc
+        return BulkWriteError({
+            "writeErrors": [{"index": index, "code": code, "errmsg": "failed"} for index, code in codes.items()],
+            "nInserted": len(docs) - len(codes),
+        })
+    return fail
+
+
+def submit_all(buffer, count):
+    async def scenario():
+        await buffer.start()
+        results = await asyncio.gather(
+            *(buffer.submit({"id": f"lead-{i}"}) for i in range(count)), return_exceptions=True,
+        )
+        await buffer.stop()
+        return results
+    return asyncio.run(scenario())
+
+
+def test_transient_errors_are_retried():
+    store = FlakyLeadStore(AutoReconnect("primary stepped down"))
+    buffer = LeadBuffer(store, batch_size=10)
+    assert submit_all(buffer, 5) == [None] * 5
+    assert len(store.docs) == 5
+    assert len(store.calls) == 2
+    assert buffer.written == 5 and buffer.failed == 0
+
+
+def test_only_failed_writes_are_retried_and_duplicates_count_as_written():
+    # Index 1 was written by an earlier attempt (duplicate key); index 3 hit a transient error.
+    store = FlakyLeadStore(partial_write({1: DUPLICATE_KEY, 3: 91}))
+    buffer = LeadBuffer(store, batch_size=10)
+    assert submit_all(buffer, 5) == [None] * 5
+    assert store.calls[1] == ["lead-3"]
+    assert sorted(store.docs) == [f"lead-{i}" for i in range(5)]
+    assert buffer.written == 5 and buffer.failed == 0
+
+
+def test_leads_fail_after_max_attempts():
+    store = FlakyLeadStore(*[AutoReconnect("down")] * 3)
+    written = []
+
+    async def on_written(docs):
+        written.extend(docs)
+
+    buffer = LeadBuffer(store, batch_size=10, max_attempts=3, on_written=on_written)
+    results = submit_all(buffer, 3)
+    assert all(isinstance(result, AutoReconnect) for result in results)
+    assert len(store.calls) == 3
+    assert buffer.failed == 3 and buffer.written == 0
+    assert written == []
+
+
+def test_on_written_sees_only_stored_leads():
+    store = FlakyLeadStore(*[partial_write({0: 91})] * 3)
+    written = []
+
+    async def on_written(docs):
+        written.extend(doc["id"] for doc in docs)
+
+    buffer = LeadBuffer(store, batch_size=10, max_attempts=3, on_written=on_written)
+    results = submit_all(buffer, 3)
+    assert [isinstance(result, BulkWriteError) for result in results] == [True, False, False]
+    assert sorted(written) == ["lead-1", "lead-2"]
+
+
+def test_a_lone_lead_is_not_held_for_the_flush_interval():
+    store = FlakyLeadStore()
+    buffer = LeadBuffer(store, flush_interval=5.0)
+
+    async def scenario():
+        await buffer.start()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await buffer.submit({"id": "lead-0"})
+        elapsed = loop.time() - started
+        await buffer.stop()
+        return elapsed
+
+    assert asyncio.run(scenario()) < 1.0
+    assert store.calls == [["lead-0"]]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        LeadBuffer(FlakyLeadStore(), mode="later")
+
+
+def test_csv_export_neutralises_formulas():
+    async def leads():
+        yield {"id": "1", "name": "=HYPERLINK(\"http://x\")", "phone": "+919999999999",
+               "remarks": "@SUM(A1)", "offered_price": -5}
+
+    async def scenario():
+        return b"".join([chunk async for chunk in export_leads(leads(), "csv", 10)]).decode()
+
+    header, row = asyncio.run(scenario()).splitlines()
+    assert row == "1,,\"'=HYPERLINK(\"\"http://x\"\")\",'+919999999999,,,,-5,'@SUM(A1),"
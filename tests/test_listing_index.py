@@ -0,0 +1,127 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from listing_index import ListingIndex
+from pagination import LISTING_SORTS
+from repository import MemoryListingStore
+from reservations import ReservationConflict, ReservationNotFound
+
+FIELDS = ("id", "brand", "model", "price", "condition", "image", "description", "specs", "in_stock")
+PROJECTION = {**{field: 1 for field in FIELDS}, "_id": 1}
+BRANDS = ("Samsung", "Vivo", "OnePlus", "Apple")
+
+
+def random_listings(rng, count):
+    now = datetime.now(timezone.utc)
+    docs = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            reserved_until = now + timedelta(minutes=5)
+        elif roll < 0.15:
+            # Motor hands back naive UTC datetimes.
+            reserved_until = (now + timedelta(minutes=5)).replace(tzinfo=None)
+        elif roll < 0.25:
+            reserved_until = now - timedelta(minutes=5)
+        else:
+            reserved_until = None
+        docs.append({
+            "_id": ObjectId(),
+            "id": f"sale-{rng.randrange(10 ** 6)}-{i}",
+            "brand": rng.choice(BRANDS),
+            "model": "Phone",
+            # Few distinct prices, so ties are broken on id.
+            "price": rng.randrange(10, 40) * 1000,
+            "condition": "Good",
+            "image": "img",
+            "description": "d",
+            "specs": {},
+            "in_stock": rng.random() < 0.9,
+            "reserved_until": reserved_until,
+        })
+    return docs
+
+
+def walk_index(index, order, limit, **filters):
+    pages, after = [], None
+    while True:
+        listings, after = index.page(order, limit, after, **filters)
+        pages.append([listing["id"] for listing in listings])
+        if after is None:
+            return pages
+
+
+def walk_store(store, order, limit, **filters):
+    async def walk():
+        pages, after = [], None
+        while True:
+            docs = await store.page(order, limit + 1, PROJECTION, after=after, **filters)
+            pages.append([doc["id"] for doc in docs[:limit]])
+            if len(docs) <= limit:
+                return pages
+            after = order.key(docs[limit - 1])
+    return asyncio.run(walk())
+
+
+@pytest.fixture(scope="module")
+def listings():
+    docs = random_listings(random.Random(7), 600)
+    store = MemoryListingStore()
+    asyncio.run(store.seed(docs))
+    index = ListingIndex(FIELDS)
+    index.replace(docs)
+    return index, store
+
+
+FILTERS = [
+    {},
+    {"brand": "Vivo"},
+    {"brand": "Nokia"},
+    {"min_price": 20000},
+    {"max_price": 15000},
+    {"brand": "Samsung", "min_price": 15000, "max_price": 30000},
+    {"min_price": 30000, "max_price": 20000},
+]
+
+
+@pytest.mark.parametrize("sort", list(LISTING_SORTS))
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("limit", [1, 7, 100, 1000])
+def test_index_pages_match_repository_pages(listings, sort, filters, limit):
+    index, store = listings
+    order = LISTING_SORTS[sort]
+    assert walk_index(index, order, limit, **filters) == walk_store(store, order, limit, **filters)
+
+
+def test_index_serves_only_response_fields(listings):
+    index, _ = listings
+    listings_page, _ = index.page(LISTING_SORTS["newest"], 50)
+    assert all(set(listing) <= set(FIELDS) for listing in listings_page)
+
+
+def test_updates_holds_and_removals_stay_in_step():
+    docs = random_listings(random.Random(11), 200)
+    store = MemoryListingStore()
+    asyncio.run(store.seed(docs))
+    index = ListingIndex(FIELDS)
+    index.replace(docs)
+
+    rng = random.Random(3)
+    for doc in rng.sample(docs, 40):
+        changed = {**doc, "price": rng.randrange(10, 40) * 1000, "in_stock": rng.random() < 0.8}
+        asyncio.run(store.upsert_many([changed]))
+        index.upsert({**changed, "reserved_until": store._by_id[doc["id"]].get("reserved_until")})
+    for doc in rng.sample(docs, 20):
+        try:
+            held = asyncio.run(store.reserve(doc["id"], 60, "buyer"))
+        except (ReservationConflict, ReservationNotFound):
+            continue
+        index.hold(doc["id"], held["reserved_until"])
+
+    for sort, order in LISTING_SORTS.items():
+        for filters in FILTERS:
+            assert walk_index(index, order, 9, **filters) == walk_store(store, order, 9, **filters), (sort, filters)
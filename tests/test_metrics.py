@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from metrics import MongoCommandListener, Registry, registry
+
+
+def samples(text, name):
+    """{label string: value} for every sample of ``name`` in a Prometheus text page."""
+    found = {}
+    for line in text.splitlines():
+        if line.startswith(name) and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            found[series[len(name):]] = float(value)
+    return found
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Registry()
+    latency = metrics.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value, route="/a")
+
+    rendered = metrics.render()
+    assert "# TYPE latency_seconds histogram" in rendered
+    assert samples(rendered, "latency_seconds_bucket") == {
+        '{route="/a",le="0.1"}': 1, '{route="/a",le="1"}': 3, '{route="/a",le="+Inf"}': 4,
+    }
+    assert samples(rendered, "latency_seconds_sum") == {'{route="/a"}': 4.25}
+    assert samples(rendered, "latency_seconds_count") == {'{route="/a"}': 4}
+
+
+def test_counters_and_collectors_render_escaped_labels():
+    metrics = Registry()
+    requests = metrics.counter("requests_total", "Requests.")
+    requests.inc(route='say "hi"\n')
+    requests.inc(2, route='say "hi"\n')
+    metrics.add_collector(lambda: [("size", "gauge", "Size.", [({}, 3), ({"kind": "unknown"}, None)])])
+
+    rendered = metrics.render()
+    assert 'requests_total{route="say \\"hi\\"\\n"} 3' in rendered
+    assert "# TYPE size gauge" in rendered
+    assert samples(rendered, "size") == {"": 3}
+
+
+def test_requests_are_labelled_with_the_route_template(api):
+    assert api.get("/api/models/samsung").status_code == 200
+    assert api.get("/api/no-such-route").status_code == 404
+
+    response = api.get("/api/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    requests = samples(response.text, "http_requests_total")
+    assert requests['{method="GET",route="/api/models/{brand_id}",status="200"}'] >= 1
+    assert requests['{method="GET",route="unmatched",status="404"}'] >= 1
+    assert not any("samsung" in labels for labels in requests)
+    counts = samples(response.text, "http_request_duration_seconds_count")
+    assert counts['{method="GET",route="/api/models/{brand_id}"}'] >= 1
+    assert "catalog_cache_lookups_total" in response.text
+
+
+def test_mongo_commands_are_timed_per_collection():
+    listener = MongoCommandListener()
+
+    def event(request_id, name, command, micros=0):
+        return SimpleNamespace(request_id=request_id, operation_id=request_id, command_name=name,
+                               command=command, duration_micros=micros)
+
+    listener.started(event(1, "find", {"find": "metrics_probe"}))
+    listener.succeeded(event(1, "find", {}, micros=2500))
+    listener.started(event(2, "getMore", {"getMore": 99, "collection": "metrics_probe"}))
+    listener.failed(event(2, "getMore", {}, micros=1000))
+    listener.started(event(3, "ping", {"ping": 1}))
+    listener.succeeded(event(3, "ping", {}))
+
+    rendered = registry.render()
+    commands = samples(rendered, "mongo_commands_total")
+    assert commands['{collection="metrics_probe",command="find",outcome="success"}'] == 1
+    assert commands['{collection="metrics_probe",command="getMore",outcome="failure"}'] == 1
+    assert commands['{collection="",command="ping",outcome="success"}'] >= 1
+    assert samples(rendered, "mongo_command_duration_seconds_sum")['{collection="metrics_probe",command="find"}'] == 0.0025
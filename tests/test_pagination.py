@@ -0,0 +1,128 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import LISTING_SORTS, decode_cursor, encode_cursor
+
+
+def walk(api, path, limit, **params):
+    """Every page of ``path``, following X-Next-Cursor."""
+    pages, cursor = [], None
+    while True:
+        query = {**params, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = api.get(path, params=query)
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+        assert response.headers["link"].endswith('; rel="next"')
+
+
+def test_cursor_round_trip():
+    key = [42000, "sale-1"]
+    assert decode_cursor(encode_cursor("price_asc", key), "price_asc") == key
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+MALFORMED_CURSORS = [
+    "not-base64!",
+    encode_cursor("price_asc", [1, "a"])[:-3],
+    "e30",
+    raw_cursor([]),
+    raw_cursor({"s": "price_asc", "k": 5}),
+    raw_cursor({"s": "price_asc", "k": None}),
+    raw_cursor({"s": "price_asc", "k": {"$gt": 1}}),
+    raw_cursor({"s": "price_asc", "k": []}),
+    raw_cursor({"s": "price_asc", "k": [{"$ne": 1}, "a"]}),
+    raw_cursor({"s": "price_asc", "k": [True, "a"]}),
+]
+
+
+@pytest.mark.parametrize("cursor", MALFORMED_CURSORS)
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "price_asc")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("key", [[1], [1, "a", "b"]])
+def test_tiebreak_sorts_reject_keys_of_the_wrong_length(key):
+    order = LISTING_SORTS["price_asc"]
+    doc = {"price": 1, "id": "a"}
+    for check in (lambda: order.after(key), lambda: order.follows(doc, key)):
+        with pytest.raises(HTTPException) as error:
+            check()
+        assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("key", [5, None, [1]])
+@pytest.mark.parametrize("path,sort", [("/api/brands", "name"), ("/api/models/samsung", "price_asc"),
+                                       ("/api/phones-for-sale", "price_asc")])
+def test_malformed_cursors_are_a_client_error(api, path, sort, key):
+    response = api.get(path, params={"sort": sort, "cursor": raw_cursor({"s": sort, "k": key})})
+    assert response.status_code == 400
+
+
+def test_cursor_is_bound_to_its_sort():
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor("price_asc", [1, "a"]), "price_desc")
+
+
+@pytest.fixture(scope="module")
+def tied_listings(api):
+    import server
+
+    # Equal prices across several listings, so pages must break ties on id.
+    docs = [
+        {"id": f"tie-{i:02d}", "brand": "Tie", "model": "Phone", "price": 10000 + 1000 * (i % 3),
+         "condition": "Good", "image": "img", "description": "d", "specs": {}, "in_stock": True}
+        for i in range(11)
+    ]
+    api.portal.call(server.repository.listings.upsert_many, docs)
+    return sorted(doc["id"] for doc in docs)
+
+
+@pytest.mark.parametrize("sort", list(LISTING_SORTS))
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_listing_pages_cover_every_listing_once(api, tied_listings, sort, limit):
+    [everything] = walk(api, "/api/phones-for-sale", 500, sort=sort, brand="Tie")
+    assert sorted(everything) == tied_listings
+    pages = walk(api, "/api/phones-for-sale", limit, sort=sort, brand="Tie")
+    assert [phone_id for page in pages for phone_id in page] == everything
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+@pytest.mark.parametrize("sort", list(LISTING_SORTS))
+def test_listing_sort_orders(api, tied_listings, sort):
+    phones = api.get("/api/phones-for-sale", params={"sort": sort, "brand": "Tie", "limit": 500}).json()
+    keys = [(phone["price"], phone["id"]) for phone in phones]
+    if sort == "price_asc":
+        assert keys == sorted(keys)
+    elif sort == "price_desc":
+        assert keys == sorted(keys, reverse=True)
+
+
+@pytest.mark.parametrize("sort", ["name", "id"])
+def test_brand_pages_cover_every_brand_once(api, sort):
+    [everything] = walk(api, "/api/brands", 500, sort=sort)
+    assert [brand_id for page in walk(api, "/api/brands", 1, sort=sort) for brand_id in page] == everything
+
+
+@pytest.mark.parametrize("sort", ["name", "price_asc", "price_desc"])
+def test_model_pages_cover_every_model_once(api, sort):
+    [everything] = walk(api, "/api/models/samsung", 500, sort=sort)
+    assert len(everything) > 1
+    assert [model_id for page in walk(api, "/api/models/samsung", 1, sort=sort) for model_id in page] == everything
+
+
+def test_cursor_from_another_sort_is_rejected(api):
+    cursor = api.get("/api/brands", params={"sort": "name", "limit": 1}).headers["x-next-cursor"]
+    assert api.get("/api/brands", params={"sort": "id", "cursor": cursor}).status_code == 400
+    listing_cursor = encode_cursor("price_asc", [1000, "sale-1"])
+    assert api.get("/api/phones-for-sale", params={"sort": "newest", "cursor": listing_cursor}).status_code == 400
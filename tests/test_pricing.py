@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from pricing import CompiledQuestionSet
+
+
+def loop_quote(questions, base_price, answers):
+    """The /calculate-price loop the compiled question set replaced."""
+    deductions = []
+    total_deduction_percentage = 0
+    is_blocked = False
+    block_reason = None
+    for question in questions:
+        answer = answers.get(question["id"], False)
+        triggered = answer if question["yes_deducts"] else not answer
+        if question["is_blocking"] and triggered:
+            is_blocked = True
+            block_reason = question["text"]
+            break
+        if triggered:
+            deductions.append({"question": question["text"], "percentage": question["deduction_percentage"]})
+            total_deduction_percentage += question["deduction_percentage"]
+    final_price = 0 if is_blocked else int(base_price * (1 - total_deduction_percentage / 100))
+    return {
+        "base_price": base_price,
+        "final_price": final_price,
+        "deductions": deductions,
+        "is_blocked": is_blocked,
+        "block_reason": block_reason,
+    }
+
+
+def random_questions(rng, count):
+    return [
+        {
+            # A few repeated ids: one answer then drives several questions.
+            "id": f"q{rng.randrange(count - 2) if rng.random() < 0.1 else i}",
+            "text": f"Question {i}",
+            "category": rng.choice(["Screen", "Body", "Battery"]),
+            "deduction_percentage": rng.choice([0, 2.5, 5, 10, 15]),
+            "yes_deducts": rng.random() < 0.5,
+            "is_blocking": rng.random() < 0.1,
+        }
+        for i in range(count)
+    ]
+
+
+def random_answers(rng, questions):
+    ids = {question["id"] for question in questions} | {"unknown"}
+    return {question_id: rng.random() < 0.5 for question_id in ids if rng.random() < 0.8}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_quote_matches_loop(seed):
+    rng = random.Random(seed)
+    questions = random_questions(rng, rng.randrange(3, 40))
+    compiled = CompiledQuestionSet(questions)
+    for _ in range(50):
+        answers = random_answers(rng, questions)
+        base_price = rng.randrange(1000, 100000)
+        assert compiled.quote(base_price, answers) == loop_quote(questions, base_price, answers)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_quote_many_matches_loop(seed):
+    rng = random.Random(seed)
+    questions = random_questions(rng, 25)
+    compiled = CompiledQuestionSet(questions)
+    answer_sets = [random_answers(rng, questions) for _ in range(200)]
+    base_prices = [rng.randrange(1000, 100000) for _ in answer_sets]
+    assert compiled.quote_many(base_prices, answer_sets) == [
+        loop_quote(questions, base_price, answers) for base_price, answers in zip(base_prices, answer_sets)
+    ]
+
+
+def test_quote_many_empty():
+    assert CompiledQuestionSet(random_questions(random.Random(0), 5)).quote_many([], []) == []
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sensitivity_matches_loop(seed):
+    rng = random.Random(seed)
+    questions = random_questions(rng, 20)
+    compiled = CompiledQuestionSet(questions)
+    answers = random_answers(rng, questions)
+    base_price = rng.randrange(1000, 100000)
+
+    result = compiled.sensitivity(base_price, answers)
+    current = loop_quote(questions, base_price, answers)
+    assert result["quote"] == current
+
+    assert [flip["question_id"] for flip in result["flips"]] == list(dict.fromkeys(q["id"] for q in questions))
+    for flip in result["flips"]:
+        answer = answers.get(flip["question_id"], False)
+        flipped = loop_quote(questions, base_price, {**answers, flip["question_id"]: not answer})
+        assert flip["answer"] == answer
+        assert flip["final_price"] == flipped["final_price"]
+        assert flip["is_blocked"] == flipped["is_blocked"]
+        assert flip["delta"] == flipped["final_price"] - current["final_price"]
+
+    by_text = {question["text"]: question["category"] for question in questions}
+    expected = {}
+    for deduction in current["deductions"]:
+        subtotal = expected.setdefault(by_text[deduction["question"]], [0, 0])
+        subtotal[0] += deduction["percentage"]
+        subtotal[1] += 1
+    for category in result["categories"]:
+        percentage, count = expected.get(category["category"], [0, 0])
+        assert category["deduction_percentage"] == percentage
+        assert category["deductions"] == count
+        assert category["deduction_amount"] == int(base_price * percentage / 100)
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from repository import MemoryListingStore
+from reservations import ReservationConflict, ReservationLimitReached, ReservationNotFound
+
+
+def listing(phone_id, **fields):
+    return {"id": phone_id, "brand": "Samsung", "model": "Galaxy", "price": 10000, "condition": "Good",
+            "image": "img", "description": "d", "specs": {}, "in_stock": True, **fields}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_exactly_one_concurrent_reserve_wins():
+    async def scenario():
+        store = MemoryListingStore()
+        await store.seed([listing("sale-race")])
+        return await asyncio.gather(
+            *(store.reserve("sale-race", 60, f"buyer-{i}") for i in range(50)), return_exceptions=True,
+        )
+
+    results = run(scenario())
+    winners = [result for result in results if isinstance(result, dict)]
+    assert len(winners) == 1
+    assert all(isinstance(result, ReservationConflict) for result in results if result is not winners[0])
+
+
+def test_release_needs_the_reservation_id_and_frees_the_listing():
+    async def scenario():
+        store = MemoryListingStore()
+        await store.seed([listing("sale-1")])
+        held = await store.reserve("sale-1", 60, "buyer-1")
+        wrong = await store.release("sale-1", "not-the-id")
+        released = await store.release("sale-1", held["reservation_id"])
+        again = await store.reserve("sale-1", 60, "buyer-2")
+        return wrong, released, again["reserved_by"]
+
+    assert run(scenario()) == (False, True, "buyer-2")
+
+
+def test_out_of_stock_and_unknown_listings_are_not_found():
+    async def scenario():
+        store = MemoryListingStore()
+        await store.seed([listing("sale-sold", in_stock=False)])
+        for phone_id in ("sale-sold", "sale-missing"):
+            with pytest.raises(ReservationNotFound):
+                await store.reserve(phone_id, 60, "buyer-1")
+
+    run(scenario())
+
+
+def test_concurrent_reserves_by_one_buyer_respect_the_cap():
+    async def scenario():
+        store = MemoryListingStore()
+        await store.seed([listing(f"sale-{i}") for i in range(20)])
+        return await asyncio.gather(
+            *(store.reserve(f"sale-{i}", 60, "buyer-1", max_holds=2) for i in range(20)), return_exceptions=True,
+        )
+
+    results = run(scenario())
+    assert sum(isinstance(result, dict) for result in results) == 2
+    assert sum(isinstance(result, ReservationLimitReached) for result in results) == 18
+
+
+def test_expired_and_released_holds_free_the_buyers_slots():
+    async def scenario():
+        store = MemoryListingStore()
+        await store.seed([listing("sale-1"), listing("sale-2"), listing("sale-3"), listing("sale-4")])
+        kept = await store.reserve("sale-1", 60, "buyer-1", max_holds=2)
+        await store.reserve("sale-2", 0.01, "buyer-1", max_holds=2)
+        await store.reserve("sale-3", 60, "buyer-2", max_holds=2)
+        with pytest.raises(ReservationLimitReached):
+            await store.reserve("sale-4", 60, "buyer-1", max_holds=2)
+        await asyncio.sleep(0.02)
+        await store.reserve("sale-4", 60, "buyer-1", max_holds=2)
+        await store.release("sale-1", kept["reservation_id"])
+        await store.reserve("sale-2", 60, "buyer-1", max_holds=2)
+
+    run(scenario())
+
+
+def test_api_reserve_race_has_one_winner(api):
+    import server
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.post("/api/phones-for-sale/sale-3/reservation", json={"reserved_by": f"buyer-{i}"})
+                for i in range(100)
+            ))
+        return [response.status_code for response in responses]
+
+    codes = api.portal.call(scenario)
+    assert codes.count(200) == 1
+    assert codes.count(409) == 99
+    assert all(listing["id"] != "sale-3" for listing in api.get("/api/phones-for-sale").json())
+
+
+def test_api_reservations_need_a_buyer_and_are_capped(api):
+    import server
+
+    assert api.post("/api/phones-for-sale/sale-4/reservation", json={}).status_code == 422
+    buyer = {"reserved_by": "buyer-capped", "ttl_seconds": 10 ** 6}
+    first = api.post("/api/phones-for-sale/sale-4/reservation", json=buyer)
+    assert first.status_code == 200
+    for phone_id in ("sale-5", "sale-6")[:server.RESERVATION_MAX_PER_BUYER - 1]:
+        assert api.post(f"/api/phones-for-sale/{phone_id}/reservation", json=buyer).status_code == 200
+    assert api.post("/api/phones-for-sale/sale-2/reservation", json=buyer).status_code == 429
+
+    reservation = first.json()
+    reserved_until = datetime.fromisoformat(reservation["reserved_until"].replace("Z", "+00:00"))
+    assert (reserved_until - datetime.now(timezone.utc)).total_seconds() <= server.RESERVATION_MAX_TTL
+    released = api.delete(f"/api/phones-for-sale/sale-4/reservation/{reservation['reservation_id']}")
+    assert released.status_code == 204
+
+
+def test_holds_bump_their_own_version_only_when_polling(api, monkeypatch):
+    import server
+
+    def versions():
+        return tuple(api.portal.call(server.repository.catalog.read_version, key)
+                     for key in ("phones_for_sale", "listing_holds"))
+
+    before = versions()
+    held = api.post("/api/phones-for-sale/sale-4/reservation", json={"reserved_by": "buyer-quiet"}).json()
+    assert versions() == before
+
+    monkeypatch.setattr(server.coherence, "active_mode", "poll")
+    released = api.delete(f"/api/phones-for-sale/sale-4/reservation/{held['reservation_id']}")
+    assert released.status_code == 204
+    assert versions() == (before[0], before[1] + 1)
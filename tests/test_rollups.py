@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import AutoReconnect
+
+from repository import MemoryLeadStore, MemoryRollupStore
+from rollups import LeadRollups
+
+
+def lead(lead_id, day, area="Boring Road", lead_type="sell", phone_model="Galaxy S23", offered_price=None):
+    return {"id": lead_id, "created_at": f"{day}T10:00:00+00:00", "area": area, "lead_type": lead_type,
+            "phone_model": phone_model, "offered_price": offered_price}
+
+
+def recent_day(days_ago):
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).date().isoformat()
+
+
+LEADS = [
+    lead("1", recent_day(0), offered_price=30000),
+    lead("2", recent_day(0), area="Kankarbagh", offered_price=20000),
+    lead("3", recent_day(1), lead_type="buy", phone_model="Nord 3"),
+    lead("4", recent_day(40), phone_model=None),
+]
+
+
+def rollups_for(leads):
+    leads_store = MemoryLeadStore()
+    rollups = LeadRollups(MemoryRollupStore(), leads_store)
+
+    async def scenario():
+        await leads_store.insert_many(leads)
+        # Applied in two flushes, as the lead buffer would.
+        await rollups.apply(leads[:2])
+        await rollups.apply(leads[2:])
+        return rollups
+
+    return asyncio.run(scenario())
+
+
+def test_increments_fold_into_every_dimension():
+    summary = asyncio.run(rollups_for(LEADS).summary())
+    assert summary["total"] == 4
+    assert summary["by_area"] == {"Boring Road": 3, "Kankarbagh": 1}
+    assert summary["by_lead_type"] == {"sell": 3, "buy": 1}
+    assert list(summary["by_day"]) == sorted({recent_day(40), recent_day(1), recent_day(0)})
+    assert summary["by_phone_model"] == {
+        "Galaxy S23": {"count": 2, "average_offered_price": 25000.0},
+        "Nord 3": {"count": 1, "average_offered_price": None},
+    }
+
+
+def test_summary_window_only_trims_days():
+    summary = asyncio.run(rollups_for(LEADS).summary(days=7))
+    assert recent_day(40) not in summary["by_day"]
+    assert summary["total"] == 4
+
+
+def test_rebuild_matches_the_increments_and_repairs_drift():
+    rollups = rollups_for(LEADS)
+
+    async def scenario():
+        incremental = await rollups.summary()
+        # Drift: a lead written without its rollup, and a stray counter.
+        await rollups.leads.insert_one(lead("5", recent_day(0), area="Patliputra"))
+        await rollups.store.increment({("area", "Nowhere"): {"count": 1}})
+        await rollups.rebuild()
+        return incremental, await rollups.summary()
+
+    incremental, rebuilt = asyncio.run(scenario())
+    assert rebuilt["total"] == incremental["total"] + 1
+    assert rebuilt["by_area"] == {"Boring Road": 3, "Kankarbagh": 1, "Patliputra": 1}
+    assert rebuilt["by_phone_model"] == {
+        "Galaxy S23": {"count": 3, "average_offered_price": 25000.0},
+        "Nord 3": {"count": 1, "average_offered_price": None},
+    }
+
+
+def test_backfill_only_runs_when_there_are_leads_but_no_rollups():
+    leads_store = MemoryLeadStore()
+    rollups = LeadRollups(MemoryRollupStore(), leads_store)
+
+    async def scenario():
+        await rollups.backfill()
+        empty = await rollups.store.is_empty()
+        await leads_store.insert_many(LEADS)
+        await rollups.backfill()
+        return empty, (await rollups.summary())["total"]
+
+    assert asyncio.run(scenario()) == (True, 4)
+
+
+def test_failed_increments_are_counted_not_raised():
+    class DownStore(MemoryRollupStore):
+        async def increment(self, increments):
+            raise AutoReconnect("down")
+
+    rollups = LeadRollups(DownStore(), MemoryLeadStore())
+    asyncio.run(rollups.apply(LEADS))
+    assert rollups.stats() == {"applied": 0, "errors": 1}
+
+
+def test_submitted_leads_show_up_in_the_stats(api, admin_headers):
+    def total():
+        return api.get("/api/leads/stats", headers=admin_headers).json()["total"]
+
+    assert api.get("/api/leads/stats").status_code == 403
+    before = total()
+    response = api.post("/api/submit-lead", json={
+        "name": "Asha", "phone": "9999999999", "area": "Rollup Nagar", "preferred_time": "evening",
+        "phone_model": "Galaxy S23", "offered_price": 30000, "lead_type": "sell",
+    })
+    assert response.status_code == 200
+    stats = api.get("/api/leads/stats", headers=admin_headers).json()
+    assert stats["total"] == before + 1
+    assert stats["by_area"]["Rollup Nagar"] == 1
+
+    rebuilt = api.post("/api/admin/leads/rollups/rebuild", headers=admin_headers)
+    assert rebuilt.status_code == 200
+    assert total() == before + 1
@@ -0,0 +1,73 @@
+import pytest
+
+from search import SearchIndex, _within_one_edit, tokenize
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    for key, text in {
+        "model:sam-s23": "Samsung Galaxy S23",
+        "model:sam-s22": "Samsung Galaxy S22",
+        "model:xi-note12": "Xiaomi Redmi Note 12 Pro",
+        "listing:sale-1": "Samsung Galaxy S23 Good 8GB 128GB",
+    }.items():
+        kind = key.split(":")[0]
+        index.upsert(key, kind, text, {"id": key})
+    return index
+
+
+def ids(hits):
+    return [payload["id"] for _, _, payload in hits]
+
+
+def test_prefixes_match_every_token_that_starts_with_them(index):
+    assert set(ids(index.search("s2"))) == {"model:sam-s23", "model:sam-s22", "listing:sale-1"}
+    assert ids(index.search("redmi note")) == ["model:xi-note12"]
+    assert ids(index.search("s23", kind="model")) == ["model:sam-s23"]
+
+
+def test_exact_matches_rank_above_prefix_matches(index):
+    index.upsert("model:sam-s23u", "model", "Samsung Galaxy S23U", {"id": "model:sam-s23u"})
+    assert ids(index.search("s23", kind="model")) == ["model:sam-s23", "model:sam-s23u"]
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("redmu note", "model:xi-note12"),
+    ("galxy s22", "model:sam-s22"),
+    ("sasmung s22", "model:sam-s22"),
+    ("galaxyy s22", "model:sam-s22"),
+])
+def test_one_typo_is_tolerated(index, query, expected):
+    assert ids(index.search(query, kind="model")) == [expected]
+
+
+def test_short_tokens_and_two_typos_do_not_match_fuzzily(index):
+    assert index.search("s32") == []
+    assert index.search("glxy") == []
+
+
+def test_removed_and_replaced_documents_leave_no_trace(index):
+    index.upsert("model:sam-s22", "model", "Samsung Galaxy Fold", {"id": "model:sam-s22"})
+    assert "model:sam-s22" not in ids(index.search("s22"))
+    assert ids(index.search("fold")) == ["model:sam-s22"]
+    index.remove_kind("listing")
+    index.remove("model:sam-s22")
+    assert index.search("fold") == []
+    assert index.stats()["documents"] == {"model": 2}
+    assert "fold" not in index._postings and "fld" not in index._deletes
+
+
+def test_edit_distance_and_tokenizer():
+    assert _within_one_edit("galaxy", "galxay")
+    assert _within_one_edit("note", "notes")
+    assert not _within_one_edit("note", "nose12")
+    assert tokenize("Redmi Note-12 Pro+") == ["redmi", "note", "12", "pro"]
+
+
+def test_search_endpoint_covers_models_and_listings(api):
+    models = api.get("/api/search", params={"q": "s23", "type": "model"}).json()
+    assert models[0]["id"] == "sam-s23" and models[0]["model"]["name"] == "Galaxy S23"
+    hits = api.get("/api/search", params={"q": "redmu note"}).json()
+    assert "xi-note12" in [hit["id"] for hit in hits]
+    assert api.get("/api/search", params={"q": ""}).status_code == 422
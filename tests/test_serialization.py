@@ -0,0 +1,94 @@
+import gzip
+import json
+
+import pytest
+from starlette.requests import Request
+
+from http_cache import gzip_etag
+from serialization import GZIP_MIN_SIZE, Payload, accepts_gzip, dumps
+
+
+def request_with(accept_encoding=None):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, False),
+    ("gzip", True),
+    ("br, GZIP;q=0.5", True),
+    ("gzip;q=0", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("gzip;q=nonsense", False),
+    ("identity", False),
+])
+def test_accept_encoding_negotiation(header, expected):
+    assert accepts_gzip(request_with(header)) is expected
+
+
+def test_payload_serves_gzip_under_its_own_etag():
+    body = dumps([{"id": str(i), "name": "Phone"} for i in range(100)])
+    payload = Payload(body, {"ETag": '"abc"'})
+
+    zipped = payload.response(request_with("gzip"), {"X-Next-Cursor": "c"})
+    assert gzip.decompress(zipped.body) == body
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] == gzip_etag('"abc"') == '"abc-gz"'
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.headers["x-next-cursor"] == "c"
+
+    plain = payload.response(request_with())
+    assert plain.body == body
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == '"abc"'
+
+
+def test_small_payloads_are_never_gzipped():
+    payload = Payload(b"[]", {"ETag": '"abc"'})
+    assert payload.gzipped is None
+    assert payload.response(request_with("gzip")).headers["etag"] == '"abc"'
+    assert len(b"[]") < GZIP_MIN_SIZE
+
+
+@pytest.fixture
+def fast_json(monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "FAST_JSON", True)
+
+
+@pytest.mark.parametrize("path", ["/api/bootstrap", "/api/models/samsung", "/api/questions"])
+def test_fast_path_matches_the_validated_path(api, path, monkeypatch):
+    import server
+
+    slow = api.get(path)
+    monkeypatch.setattr(server, "FAST_JSON", True)
+    fast = api.get(path, headers={"Accept-Encoding": "identity"})
+    assert fast.json() == slow.json()
+    assert fast.headers["etag"] == slow.headers["etag"]
+
+
+def test_fast_path_negotiates_gzip_and_revalidates_either_etag(api, fast_json):
+    zipped = api.get("/api/bootstrap", headers={"Accept-Encoding": "gzip"})
+    plain = api.get("/api/bootstrap", headers={"Accept-Encoding": "identity"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] == gzip_etag(plain.headers["etag"])
+    assert zipped.json() == plain.json()
+
+    for etag in (zipped.headers["etag"], plain.headers["etag"]):
+        revalidated = api.get("/api/bootstrap", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+        assert revalidated.headers["vary"] == "Accept-Encoding"
+
+
+def test_fast_listing_pages_keep_their_cursor_headers(api, monkeypatch):
+    import server
+
+    slow = api.get("/api/phones-for-sale", params={"limit": 2})
+    monkeypatch.setattr(server, "FAST_JSON", True)
+    fast = api.get("/api/phones-for-sale", params={"limit": 2})
+    assert json.loads(fast.content) == slow.json()
+    assert fast.headers["x-next-cursor"] == slow.headers["x-next-cursor"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from startup import StartupPhases
+
+PHASES = ("connection_pool", "indexes", "fixtures", "catalog", "listing_search", "listing_index",
+          "lead_rollups", "query_plans", "lead_buffer", "coherence")
+
+
+def test_phases_are_timed_and_ready_waits_for_finish():
+    phases = StartupPhases()
+
+    async def scenario():
+        phases.begin()
+        assert await phases.run("first", lambda: asyncio.sleep(0.01, result="done")) == "done"
+        assert not phases.ready
+        started = asyncio.get_running_loop().time()
+        await phases.run_concurrently({"a": lambda: asyncio.sleep(0.05), "b": lambda: asyncio.sleep(0.05)})
+        elapsed = asyncio.get_running_loop().time() - started
+        phases.finish()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+    stats = phases.stats()
+    assert stats["ready"] is True
+    assert set(stats["phases"]) == {"first", "a", "b"}
+    assert stats["phases"]["a"] >= 0.04
+    # Concurrent phases overlap instead of adding up.
+    assert elapsed < 0.1
+    assert stats["startup_seconds"] >= elapsed
+
+
+def test_a_failing_phase_is_still_timed():
+    phases = StartupPhases()
+
+    async def broken():
+        raise RuntimeError("no database")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(phases.run("indexes", broken))
+    assert "indexes" in phases.timings
+    assert not phases.ready
+
+
+def test_ready_reports_every_startup_phase(api):
+    response = api.get("/api/ready")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["ready"] is True
+    assert set(stats["phases"]) == set(PHASES)
+    metrics = api.get("/api/metrics").text
+    assert 'startup_phase_seconds{phase="catalog"}' in metrics
+    assert "\nready 1\n" in metrics
+
+
+def test_not_ready_is_a_retryable_503(api, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server.startup, "ready", False)
+    response = api.get("/api/ready")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["ready"] is False